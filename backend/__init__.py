@@ -0,0 +1,12 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Load the project .env once for every backend entrypoint (API, worker,
+# scripts). Values already present in the environment take precedence.
+# Deployments that inject configuration directly (containers, serverless) can
+# set SKIP_DOTENV=1 to skip reading and parsing the file on cold start.
+ENV_PATH = Path(__file__).resolve().parent.parent / ".env"
+if os.environ.get("SKIP_DOTENV", "").strip().lower() not in {"1", "true", "yes", "on"}:
+    load_dotenv(dotenv_path=ENV_PATH)
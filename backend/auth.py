@@ -191,9 +191,9 @@ def enforce_rate_limit(request: Request, clerk_id: str) -> None:
     ip_key = f"rl:{bucket}:ip:{ip}:{window_bucket}"
 
     try:
-        from .redis_utils import get_redis_connection
+        from .redis_utils import get_shared_redis
 
-        redis_conn = get_redis_connection()
+        redis_conn = get_shared_redis()
         user_count = _consume_window_counter(redis_conn, user_key)
         ip_count = _consume_window_counter(redis_conn, ip_key)
     except Exception as exc:
@@ -1,11 +1,22 @@
 ﻿import argparse
 import asyncio
 import json
+import os
 import statistics
 import time
 from pathlib import Path
 from typing import Any, Dict, List
 
+# Every case must reach the model: cached plans, code or raw responses would
+# report cache latency and a previous run's quality. Set before the import,
+# which reads them (dotenv does not override variables already set).
+for _cache_flag in (
+    "MANIM_GENERATION_CACHE_ENABLED",
+    "MANIM_GENERATION_CACHE_SHARED_ENABLED",
+    "LLM_RESPONSE_CACHE_ENABLED",
+):
+    os.environ[_cache_flag] = "false"
+
 from backend.llm_service import generate_manim_code
 from backend.manim_service import run_visual_quality_check
 
@@ -4,30 +4,90 @@ MongoDB Database Connection Service
 This module handles the connection to MongoDB using motor (async driver).
 """
 
+import logging
 import os
+import bson
+import pymongo
 from motor.motor_asyncio import AsyncIOMotorClient
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 # MongoDB connection settings
 MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("MONGODB_DATABASE", "prompt_to_animate")
 
+
+def _int_env(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return default
+
+
+# Connection pool settings. Defaults recycle idle sockets and fail fast instead
+# of queueing forever under overload. Every process (each API worker and each
+# forked RQ job) builds its own client, so no idle sockets are held by default;
+# the API can keep a warm pool for request bursts via MONGODB_MIN_POOL_SIZE.
+MONGODB_MAX_POOL_SIZE = _int_env("MONGODB_MAX_POOL_SIZE", 200)
+MONGODB_MIN_POOL_SIZE = _int_env("MONGODB_MIN_POOL_SIZE", 0)
+MONGODB_MAX_IDLE_TIME_MS = _int_env("MONGODB_MAX_IDLE_TIME_MS", 300_000)
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = _int_env("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000)
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = _int_env("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 10_000)
+MONGODB_COMPRESSORS = os.getenv("MONGODB_COMPRESSORS", "zstd,zlib").strip()
+
 # Global client instance
 _client: AsyncIOMotorClient = None
 
 
+def _client_kwargs() -> dict:
+    """Build pool and wire options for AsyncIOMotorClient."""
+    kwargs = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS or None,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS or None,
+        "retryWrites": True,
+        # Plain dicts and naive datetimes keep BSON decoding on the C fast path.
+        "document_class": dict,
+        "tz_aware": False,
+    }
+    if MONGODB_COMPRESSORS:
+        kwargs["compressors"] = MONGODB_COMPRESSORS
+    return kwargs
+
+
+def _create_client() -> AsyncIOMotorClient:
+    if not (bson.has_c() and pymongo.has_c()):
+        logger.warning(
+            "⚠️ PyMongo C extensions unavailable; BSON encoding will use the slow pure-Python path"
+        )
+    return AsyncIOMotorClient(MONGODB_URI, **_client_kwargs())
+
+
+def _get_client() -> AsyncIOMotorClient:
+    """
+    Return the process-wide client, creating it on first use.
+
+    This is the only construction site. Client creation is synchronous, so no
+    await can interleave between the check and the assignment; concurrent
+    coroutines on one event loop therefore always share a single client.
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
 async def get_database():
     """
     Get the MongoDB database instance.
     Creates a connection if one doesn't exist.
     """
-    global _client
-    if _client is None:
-        _client = AsyncIOMotorClient(MONGODB_URI)
-    return _client[DATABASE_NAME]
+    return _get_client()[DATABASE_NAME]
 
 
 async def get_chats_collection():
@@ -47,20 +107,49 @@ async def close_database_connection():
 # Connection event handlers for FastAPI
 async def connect_to_mongo():
     """Called on application startup."""
-    global _client
-    _client = AsyncIOMotorClient(MONGODB_URI)
+    client = _get_client()
     # Verify connection
     try:
-        await _client.admin.command('ping')
-        print(f"✅ Connected to MongoDB: {DATABASE_NAME}")
+        await client.admin.command('ping')
+        logger.info("✅ Connected to MongoDB: %s", DATABASE_NAME)
     except Exception as e:
-        print(f"❌ Failed to connect to MongoDB: {e}")
+        logger.error("❌ Failed to connect to MongoDB: %s", e)
         raise
 
 
+async def ensure_indexes(db) -> None:
+    """Create indexes for hot queries (idempotent; existing indexes are kept)."""
+    # Chat history: filter by owner, newest first.
+    await db["chats"].create_index([("clerk_id", pymongo.ASCENDING), ("created_at", pymongo.DESCENDING)])
+    # Users: every entitlement check and usage charge looks up by clerk_id.
+    try:
+        await db["users"].create_index("clerk_id", unique=True)
+    except pymongo.errors.OperationFailure as e:
+        # Pre-existing duplicate users block the unique build; keep serving.
+        logger.warning("⚠️ Could not create unique users.clerk_id index: %s", e)
+
+
+async def warm_up_mongo():
+    """
+    Open pooled connections ahead of the first request.
+
+    Runs as a background task at startup: pings the server, ensures indexes
+    and touches the hot collections so server selection and socket setup are
+    already done. Failures are logged, not raised; requests will retry lazily.
+    """
+    try:
+        db = await get_database()
+        await db.command("ping")
+        await ensure_indexes(db)
+        await db["chats"].find_one({}, projection={"_id": 1})
+        await db["users"].find_one({}, projection={"_id": 1})
+        logger.info("✅ MongoDB pool warmed: %s", DATABASE_NAME)
+    except Exception as e:
+        logger.warning("⚠️ MongoDB warm-up failed: %s", e)
+
+
 async def close_mongo_connection():
     """Called on application shutdown."""
-    global _client
-    if _client:
-        _client.close()
-        print("🔌 MongoDB connection closed")
+    if _client is not None:
+        await close_database_connection()
+        logger.info("🔌 MongoDB connection closed")
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import copy
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+
+
+Embedder = Callable[[str], Sequence[float]]
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+
+# Filler words that rarely change what the user wants animated.  Dropping them
+# lets "animate bubble sort" and "a bubble sort animation" share an entry.
+_STOPWORDS = frozenset(
+    {
+        "a",
+        "an",
+        "and",
+        "animate",
+        "animation",
+        "can",
+        "explain",
+        "for",
+        "how",
+        "i",
+        "in",
+        "is",
+        "me",
+        "of",
+        "please",
+        "show",
+        "the",
+        "to",
+        "video",
+        "visualize",
+        "what",
+        "with",
+        "you",
+    }
+)
+
+
+def _normalize_token(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def prompt_tokens(prompt: str) -> Tuple[str, ...]:
+    tokens = (_normalize_token(item) for item in _TOKEN_SPLIT.split((prompt or "").lower()) if item)
+    return tuple(token for token in tokens if token not in _STOPWORDS)
+
+
+def prompt_signature(prompt: str) -> FrozenSet[str]:
+    return frozenset(prompt_tokens(prompt))
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join((prompt or "").casefold().split())
+
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _same_specifics(a: Tuple[str, ...], b: Tuple[str, ...]) -> bool:
+    # Overlap scores cannot tell "sin x to cos x" from "cos x to sin x" or
+    # "finding 7" from "finding 11"; numbers and shared-word order must agree.
+    if [token for token in a if token.isdigit()] != [token for token in b if token.isdigit()]:
+        return False
+    shared = set(a) & set(b)
+    return [token for token in a if token in shared] == [token for token in b if token in shared]
+
+
+def _normalize_vector(vector: Sequence[float]) -> Optional[Tuple[float, ...]]:
+    norm = math.sqrt(sum(float(x) * float(x) for x in vector))
+    if norm == 0.0:
+        return None
+    return tuple(float(x) / norm for x in vector)
+
+
+def _cosine(a: Tuple[float, ...], b: Tuple[float, ...]) -> float:
+    if len(a) != len(b):
+        return 0.0
+    return sum(x * y for x, y in zip(a, b))
+
+
+@dataclass
+class _CacheEntry:
+    signature: FrozenSet[str]
+    tokens: Tuple[str, ...]
+    value: Dict[str, Any]
+    created_at: float
+    vector: Optional[Tuple[float, ...]] = None
+
+
+class GenerationCache:
+    """Cache of finished generation bundles with an optional near-match tier.
+
+    Entries are partitioned by ``scope`` (length, style, voiceover mode) so a
+    prompt only ever matches results produced under the same settings.
+    Resubmitted prompts hit a bounded exact-key LRU. With ``near_match`` a miss
+    then scans for a similar prompt; candidates must share numbers and word
+    order. With an ``embedder`` the scan compares prompt embeddings (cosine)
+    instead of content-word overlap; embedding failures fall back to word overlap.
+    Lookup outcomes are counted in ``stats`` (exact hits, near hits, misses).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 86400.0,
+        similarity_threshold: float = 0.85,
+        exact_max_entries: int = 512,
+        embedder: Optional[Embedder] = None,
+        embedding_threshold: float = 0.92,
+        near_match: bool = False,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.similarity_threshold = float(similarity_threshold)
+        self.exact_max_entries = max(1, int(exact_max_entries))
+        self.embedder = embedder
+        self.embedding_threshold = float(embedding_threshold)
+        self.near_match = bool(near_match)
+        self._scopes: Dict[Hashable, List[_CacheEntry]] = {}
+        self._exact: "OrderedDict[Tuple[str, Hashable], _CacheEntry]" = OrderedDict()
+        self.stats: Dict[str, int] = {"exact_hits": 0, "near_hits": 0, "misses": 0}
+
+    def _is_expired(self, entry: _CacheEntry, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - entry.created_at >= self.ttl_seconds
+
+    def _live_entries(self, scope: Hashable, now: float) -> List[_CacheEntry]:
+        entries = self._scopes.get(scope, [])
+        if self.ttl_seconds > 0:
+            entries = [item for item in entries if not self._is_expired(item, now)]
+            self._scopes[scope] = entries
+        return entries
+
+    def _embed(self, prompt: str) -> Optional[Tuple[float, ...]]:
+        if self.embedder is None:
+            return None
+        try:
+            return _normalize_vector(self.embedder(prompt))
+        except Exception:
+            return None
+
+    def _lookup_exact(self, key: Tuple[str, Hashable], now: float) -> Optional[_CacheEntry]:
+        entry = self._exact.get(key)
+        if entry is None:
+            return None
+        if self._is_expired(entry, now):
+            self._exact.pop(key, None)
+            return None
+        self._exact.move_to_end(key)
+        return entry
+
+    def lookup(self, prompt: str, scope: Hashable) -> Optional[Tuple[Dict[str, Any], float]]:
+        now = time.time()
+        exact = self._lookup_exact((normalize_prompt(prompt), scope), now)
+        if exact is not None:
+            self.stats["exact_hits"] += 1
+            return copy.deepcopy(exact.value), 1.0
+        if not self.near_match:
+            self.stats["misses"] += 1
+            return None
+
+        tokens = prompt_tokens(prompt)
+        signature = frozenset(tokens)
+        vector = self._embed(prompt)
+        if not signature and vector is None:
+            self.stats["misses"] += 1
+            return None
+
+        threshold = self.similarity_threshold if vector is None else self.embedding_threshold
+        best: Optional[_CacheEntry] = None
+        best_score = 0.0
+        for entry in self._live_entries(scope, now):
+            if not _same_specifics(tokens, entry.tokens):
+                continue
+            if vector is not None and entry.vector is not None:
+                score = _cosine(vector, entry.vector)
+            elif vector is None:
+                score = _similarity(signature, entry.signature)
+            else:
+                continue
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None or best_score < threshold:
+            self.stats["misses"] += 1
+            return None
+        self.stats["near_hits"] += 1
+        return copy.deepcopy(best.value), best_score
+
+    def store(self, prompt: str, scope: Hashable, value: Dict[str, Any]) -> None:
+        now = time.time()
+        tokens = prompt_tokens(prompt)
+        signature = frozenset(tokens)
+        entry = _CacheEntry(
+            signature=signature,
+            tokens=tokens,
+            value=copy.deepcopy(value),
+            created_at=now,
+            vector=self._embed(prompt) if self.near_match else None,
+        )
+
+        key = (normalize_prompt(prompt), scope)
+        self._exact[key] = entry
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.exact_max_entries:
+            self._exact.popitem(last=False)
+
+        if not self.near_match or (not signature and entry.vector is None):
+            return
+        entries = [item for item in self._live_entries(scope, now) if item.signature != signature]
+        entries.append(entry)
+        if len(entries) > self.max_entries:
+            entries = entries[-self.max_entries:]
+        self._scopes[scope] = entries
+
+    def clear(self) -> None:
+        self._scopes.clear()
+        self._exact.clear()
+        for key in self.stats:
+            self.stats[key] = 0
@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the API container.
+
+Runs a few Uvicorn workers so concurrent requests are spread across cores
+instead of sharing one event loop. Usage:
+
+    gunicorn -c backend/gunicorn_conf.py backend.main:app
+
+Any setting can still be overridden on the command line (e.g. ``-w 4``).
+"""
+
+import os
+
+bind = os.getenv("API_BIND", "0.0.0.0:8000")
+
+# WEB_CONCURRENCY is the conventional knob. Generation runs in the RQ worker,
+# so the API is I/O-bound; each worker also imports LangChain and the job
+# modules, so keep the default small rather than scaling with cores.
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+
+# Uvicorn's worker picks uvloop + httptools when they are installed.
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Heartbeat files on tmpfs; a slow overlay filesystem can stall workers.
+worker_tmp_dir = "/dev/shm"
+
+# With UvicornWorker this only bounds the worker heartbeat (a blocked event
+# loop), not request duration; long /generate and SSE requests are unaffected.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 75
+
+accesslog = None
+errorlog = "-"
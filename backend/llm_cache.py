@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from redis import Redis
+
+
+# Set for the duration of a generation the user asked to run fresh; lookups
+# miss while fresh responses are still stored.
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+class RedisLLMCache(BaseCache):
+    """Exact-match LangChain response cache shared by every worker process.
+
+    Keys hash the rendered prompt together with LangChain's ``llm_string``
+    (model, temperature, bound kwargs), so a hit only happens for byte-identical
+    requests to the same model configuration. Only the response text is stored.
+    Redis errors are treated as cache misses so caching never fails a call.
+    """
+
+    def __init__(
+        self,
+        redis_factory: Callable[[], Redis],
+        ttl_seconds: int = 86400,
+        namespace: str = "llm_cache",
+    ) -> None:
+        self._redis_factory = redis_factory
+        self._redis: Optional[Redis] = None
+        self.ttl_seconds = int(ttl_seconds)
+        self.namespace = namespace
+
+    def _client(self) -> Redis:
+        if self._redis is None:
+            self._redis = self._redis_factory()
+        return self._redis
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        digest = hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        if llm_cache_bypass.get():
+            return None
+        try:
+            raw = self._client().get(self._key(prompt, llm_string))
+        except Exception:
+            return None
+        if not raw:
+            return None
+        try:
+            texts = json.loads(raw)["texts"]
+        except (ValueError, KeyError, TypeError):
+            return None
+        return [ChatGeneration(message=AIMessage(content=text)) for text in texts]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        payload = json.dumps({"texts": [generation.text for generation in return_val]})
+        try:
+            self._client().set(self._key(prompt, llm_string), payload, ex=self.ttl_seconds or None)
+        except Exception:
+            pass
+
+    def clear(self, **kwargs: Any) -> None:
+        try:
+            client = self._client()
+            keys: Sequence[Any] = list(client.scan_iter(match=f"{self.namespace}:*"))
+            if keys:
+                client.delete(*keys)
+        except Exception:
+            pass
+
+
+class RedisBundleCache:
+    """Exact-match cache of finished generation bundles shared across processes.
+
+    The in-process GenerationCache dies with each forked job process; this
+    tier lets a resubmitted prompt reuse a validated bundle from any worker.
+    Keys hash the normalized prompt with the cache scope; bundles that are not
+    JSON-serializable are skipped. Redis errors are treated as cache misses.
+    """
+
+    def __init__(
+        self,
+        redis_factory: Callable[[], Redis],
+        ttl_seconds: int = 86400,
+        namespace: str = "generation_cache",
+    ) -> None:
+        self._redis_factory = redis_factory
+        self._redis: Optional[Redis] = None
+        self.ttl_seconds = int(ttl_seconds)
+        self.namespace = namespace
+
+    def _client(self) -> Redis:
+        if self._redis is None:
+            self._redis = self._redis_factory()
+        return self._redis
+
+    def _key(self, prompt: str, scope: Sequence[Any]) -> str:
+        material = json.dumps([list(scope), prompt], ensure_ascii=False, default=str)
+        digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def lookup(self, prompt: str, scope: Sequence[Any]) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self._client().get(self._key(prompt, scope))
+        except Exception:
+            return None
+        if not raw:
+            return None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+    def store(self, prompt: str, scope: Sequence[Any], value: Dict[str, Any]) -> None:
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+        try:
+            self._client().set(self._key(prompt, scope), payload, ex=self.ttl_seconds or None)
+        except Exception:
+            pass
@@ -1,37 +1,46 @@
 import ast
 import asyncio
+import copy
+import hashlib
 import importlib.util
 import json
+import logging
+import math
 import os
 import random
 import re
+import textwrap
+import time
+import weakref
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Dict, List, Mapping, Optional, Set, Tuple
 
-from dotenv import load_dotenv
 import groq
 import httpx
-from langchain_core.messages import SystemMessage
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 import openai as openai_mod
+from . import ENV_PATH
 from .pacing import (
     build_scene_timeline,
     estimate_code_duration_seconds,
     pacing_error,
     rescale_code_timing,
 )
+from .generation_cache import GenerationCache, normalize_prompt
+from .llm_cache import RedisBundleCache, RedisLLMCache, llm_cache_bypass
+from .redis_utils import get_redis_connection
 from .reward_model import RewardFeatures, score_generation_candidate
 from .scene_memory import format_memory_context, retrieve_scene_memories
 from .style_service import resolve_style_pack
 from .voiceover_service import build_voiceover_script, script_to_voiceover_metadata
 
-# Load .env from project root
-env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
+logger = logging.getLogger(__name__)
 
 # Azure OpenAI (primary) – uses the v1 API (no api-version needed)
 azure_openai_api_key = os.environ.get("AZURE_OPENAI_API_KEY", "").strip()
@@ -39,17 +48,21 @@ azure_openai_endpoint = os.environ.get("AZURE_OPENAI_ENDPOINT", "").strip()
 azure_openai_deployment = os.environ.get("AZURE_OPENAI_DEPLOYMENT", "gpt-5.2-chat").strip()
 azure_openai_base_url = f"{azure_openai_endpoint.rstrip('/')}/openai/v1" if azure_openai_endpoint else ""
 if not azure_openai_api_key or not azure_openai_endpoint:
-    print(f"Warning: AZURE_OPENAI_API_KEY or AZURE_OPENAI_ENDPOINT not found in environment. Checked path: {env_path}")
+    logger.warning(
+        "AZURE_OPENAI_API_KEY or AZURE_OPENAI_ENDPOINT not found in environment. Checked path: %s",
+        ENV_PATH,
+    )
 
 # Groq (fallback)
 groq_api_key = os.environ.get("GROQ_API_KEY", "").strip()
 if not groq_api_key:
-    print(f"Warning: GROQ_API_KEY not found in environment. Checked path: {env_path}")
+    logger.warning("GROQ_API_KEY not found in environment. Checked path: %s", ENV_PATH)
 DEFAULT_GROQ_MODEL = "moonshotai/kimi-k2-instruct-0905"
 
 # Cerebras (fallback)
 cerebras_api_key = os.environ.get("CEREBRAS_API_KEY", "").strip()
 CEREBRAS_BASE_URL = os.environ.get("CEREBRAS_BASE_URL", "https://api.cerebras.ai/v1").strip()
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
 DEFAULT_CEREBRAS_MODEL = "qwen-3-235b-a22b-instruct-2507"
 
 PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
@@ -122,6 +135,8 @@ FORBIDDEN_TEX_MACROS = {
 }
 
 ProgressCallback = Optional[Callable[[str, str], None]]
+# Receives (candidate_index, raw_text) for each streamed code chunk.
+ChunkCallback = Optional[Callable[[int, str], None]]
 
 RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
 
@@ -149,7 +164,7 @@ def _load_int_env(name: str, default: int, minimum: int) -> int:
     try:
         value = int(raw_value)
     except ValueError:
-        print(f"Warning: invalid integer for {name}='{raw_value}', using default {default}")
+        logger.warning("Invalid integer for %s=%r, using default %s", name, raw_value, default)
         return default
     return max(minimum, value)
 
@@ -161,7 +176,7 @@ def _load_float_env(name: str, default: float, minimum: float) -> float:
     try:
         value = float(raw_value)
     except ValueError:
-        print(f"Warning: invalid float for {name}='{raw_value}', using default {default}")
+        logger.warning("Invalid float for %s=%r, using default %s", name, raw_value, default)
         return default
     return max(minimum, value)
 
@@ -177,7 +192,7 @@ def _load_bool_env(name: str, default: bool) -> bool:
     if normalized in {"0", "false", "no", "off"}:
         return False
 
-    print(f"Warning: invalid boolean for {name}='{raw_value}', using default {default}")
+    logger.warning("Invalid boolean for %s=%r, using default %s", name, raw_value, default)
     return default
 
 
@@ -208,15 +223,48 @@ LLM_TEMPERATURE = _load_float_env("LLM_TEMPERATURE", default=0.2, minimum=0.0)
 LLM_RETRY_ATTEMPTS = _load_int_env("LLM_RETRY_ATTEMPTS", default=3, minimum=1)
 LLM_RETRY_BASE_SECONDS = _load_float_env("LLM_RETRY_BASE_SECONDS", default=1.0, minimum=0.1)
 LLM_RETRY_MAX_SECONDS = _load_float_env("LLM_RETRY_MAX_SECONDS", default=12.0, minimum=0.1)
+# Consecutive transient failures before a model is skipped for LLM_CIRCUIT_RESET_SECONDS.
+LLM_CIRCUIT_FAILURE_THRESHOLD = _load_int_env("LLM_CIRCUIT_FAILURE_THRESHOLD", default=5, minimum=1)
+LLM_CIRCUIT_RESET_SECONDS = _load_float_env("LLM_CIRCUIT_RESET_SECONDS", default=30.0, minimum=0.0)
+LLM_CONNECTION_WARMUP_ENABLED = _load_bool_env("LLM_CONNECTION_WARMUP_ENABLED", default=True)
+# Request provider JSON mode for structured (scene plan) responses.
+LLM_JSON_MODE_ENABLED = _load_bool_env("LLM_JSON_MODE_ENABLED", default=True)
+# Refuse to import (so the API/worker refuse to start) when no provider key is set.
+LLM_REQUIRE_PROVIDER = _load_bool_env("LLM_REQUIRE_PROVIDER", default=False)
+LLM_MAX_CONCURRENCY = _load_int_env("LLM_MAX_CONCURRENCY", default=8, minimum=1)
+# Per-process cap on provider calls in flight, so bursts queue locally instead
+# of tripping provider RPM/TPM limits that stall every request. RQ forks a
+# process per job, so in the worker this only bounds one job's own fan-out
+# (candidates, sections, generate_many/generate_manim_code_batch); it is not a
+# cap across jobs or workers.
+LLM_MAX_INFLIGHT_REQUESTS = _load_int_env("LLM_MAX_INFLIGHT_REQUESTS", default=8, minimum=1)
+LLM_HTTP_MAX_CONNECTIONS = _load_int_env("LLM_HTTP_MAX_CONNECTIONS", default=100, minimum=1)
+LLM_HTTP_MAX_KEEPALIVE = _load_int_env("LLM_HTTP_MAX_KEEPALIVE", default=50, minimum=0)
+LLM_HTTP_KEEPALIVE_SECONDS = _load_float_env("LLM_HTTP_KEEPALIVE_SECONDS", default=60.0, minimum=0.0)
+LLM_HTTP_TIMEOUT_SECONDS = _load_float_env("LLM_HTTP_TIMEOUT_SECONDS", default=300.0, minimum=1.0)
+# Wall-clock cap per provider attempt. The HTTP read timeout only bounds the gap
+# between bytes, so a slowly trickling stream could otherwise hold a slot forever.
+# Kept well under the 600s RQ job timeout so a stalled attempt still leaves
+# time for a retry or the fallback model (the largest code budget, 16k tokens,
+# streams in about a minute on the default Groq model).
+LLM_CALL_TIMEOUT_SECONDS = _load_float_env("LLM_CALL_TIMEOUT_SECONDS", default=90.0, minimum=1.0)
+LLM_HTTP_CONNECT_TIMEOUT_SECONDS = _load_float_env(
+    "LLM_HTTP_CONNECT_TIMEOUT_SECONDS",
+    default=5.0,
+    minimum=0.1,
+)
+STREAM_PROGRESS_INTERVAL_SECONDS = _load_float_env(
+    "LLM_STREAM_PROGRESS_INTERVAL_SECONDS",
+    default=1.0,
+    minimum=0.0,
+)
 if LLM_RETRY_MAX_SECONDS < LLM_RETRY_BASE_SECONDS:
     LLM_RETRY_MAX_SECONDS = LLM_RETRY_BASE_SECONDS
 
 MANIM_VISUAL_QA_ENABLED = _load_bool_env("MANIM_VISUAL_QA_ENABLED", default=False)
 _visual_qa_mode_raw = (os.environ.get("MANIM_VISUAL_QA_MODE", "balanced") or "").strip().lower()
 if _visual_qa_mode_raw not in {"balanced", "max"}:
-    print(
-        f"Warning: invalid MANIM_VISUAL_QA_MODE='{_visual_qa_mode_raw}', defaulting to 'balanced'"
-    )
+    logger.warning("Invalid MANIM_VISUAL_QA_MODE=%r, defaulting to 'balanced'", _visual_qa_mode_raw)
     _visual_qa_mode_raw = "balanced"
 MANIM_VISUAL_QA_MODE = _visual_qa_mode_raw
 _default_visual_repairs = 1 if MANIM_VISUAL_QA_MODE == "balanced" else 2
@@ -238,29 +286,266 @@ MANIM_MULTI_CANDIDATE_VISUAL_QA = _load_bool_env("MANIM_MULTI_CANDIDATE_VISUAL_Q
 MANIM_SCENE_MEMORY_ENABLED = _load_bool_env("MANIM_SCENE_MEMORY_ENABLED", default=True)
 MANIM_SCENE_MEMORY_TOP_K = _load_int_env("MANIM_SCENE_MEMORY_TOP_K", default=3, minimum=0)
 MANIM_VOICEOVER_REQUIRE_PLUGIN = _load_bool_env("MANIM_VOICEOVER_REQUIRE_PLUGIN", default=False)
+MANIM_GENERATION_CACHE_ENABLED = _load_bool_env("MANIM_GENERATION_CACHE_ENABLED", default=True)
+MANIM_GENERATION_CACHE_MAX_ENTRIES = _load_int_env(
+    "MANIM_GENERATION_CACHE_MAX_ENTRIES",
+    default=256,
+    minimum=1,
+)
+MANIM_GENERATION_CACHE_TTL_SECONDS = _load_int_env(
+    "MANIM_GENERATION_CACHE_TTL_SECONDS",
+    default=86400,
+    minimum=0,
+)
+# Exact-match tier in Redis, so resubmitted prompts hit across forked job processes.
+MANIM_GENERATION_CACHE_SHARED_ENABLED = _load_bool_env("MANIM_GENERATION_CACHE_SHARED_ENABLED", default=True)
+MANIM_GENERATION_CACHE_EXACT_MAX_ENTRIES = _load_int_env(
+    "MANIM_GENERATION_CACHE_EXACT_MAX_ENTRIES",
+    default=512,
+    minimum=1,
+)
+# Sampling above this temperature is too varied to serve one answer for every request.
+MANIM_GENERATION_CACHE_MAX_TEMPERATURE = _load_float_env(
+    "MANIM_GENERATION_CACHE_MAX_TEMPERATURE",
+    default=0.5,
+    minimum=0.0,
+)
+# Serving a similar (not identical) prompt's animation is opt-in: word overlap
+# cannot always tell two different requests apart.
+MANIM_GENERATION_CACHE_NEAR_MATCH = _load_bool_env("MANIM_GENERATION_CACHE_NEAR_MATCH", default=False)
+MANIM_GENERATION_CACHE_SIMILARITY = _load_float_env(
+    "MANIM_GENERATION_CACHE_SIMILARITY",
+    default=0.85,
+    minimum=0.0,
+)
+
+# Optional fast tier: lengths listed in LLM_FAST_TIER_LENGTHS (comma-separated,
+# e.g. "Medium (15s)") plan and generate with LLM_FAST_MODEL on Groq first, keeping
+# the regular chain as fallback. Repairs always use the regular chain.
+LLM_FAST_MODEL = (os.environ.get("LLM_FAST_MODEL") or "").strip() or "llama-3.1-8b-instant"
+LLM_FAST_TIER_LENGTHS = frozenset(_parse_fallback_models(os.environ.get("LLM_FAST_TIER_LENGTHS", "")))
+
+# Redis-backed exact-match cache of raw LLM responses, shared across worker
+# processes. Only non-streamed calls (scene plans, repairs) consult it. Opt-in:
+# it makes a resubmitted prompt replay the same plan for the whole TTL.
+LLM_RESPONSE_CACHE_ENABLED = _load_bool_env("LLM_RESPONSE_CACHE_ENABLED", default=False)
+LLM_RESPONSE_CACHE_TTL_SECONDS = _load_int_env("LLM_RESPONSE_CACHE_TTL_SECONDS", default=86400, minimum=0)
+
+# Optional draft-then-verify codegen: a small fast Groq model drafts the code and
+# the draft is used as-is when it passes validation; otherwise the regular model
+# chain generates it. Off by default.
+MANIM_DRAFT_MODEL_ENABLED = _load_bool_env("MANIM_DRAFT_MODEL_ENABLED", default=False)
+MANIM_DRAFT_MODEL = (os.environ.get("MANIM_DRAFT_MODEL") or "").strip() or "llama-3.1-8b-instant"
+
+# Optional: generate long plans one scene per LLM call, concurrently, and stitch
+# the fragments into a single GenScene. Off by default.
+MANIM_PARALLEL_SECTIONS_ENABLED = _load_bool_env("MANIM_PARALLEL_SECTIONS_ENABLED", default=False)
+MANIM_PARALLEL_SECTIONS_MIN_SCENES = _load_int_env("MANIM_PARALLEL_SECTIONS_MIN_SCENES", default=6, minimum=2)
+
+# Optional: a sentence-transformers model (e.g. all-MiniLM-L6-v2) for embedding-based
+# near-match lookups. Empty keeps the dependency-free word-overlap matcher.
+MANIM_GENERATION_CACHE_EMBEDDING_MODEL = os.environ.get("MANIM_GENERATION_CACHE_EMBEDDING_MODEL", "").strip()
+MANIM_GENERATION_CACHE_EMBEDDING_SIMILARITY = _load_float_env(
+    "MANIM_GENERATION_CACHE_EMBEDDING_SIMILARITY",
+    default=0.92,
+    minimum=0.0,
+)
+
+
+def _build_prompt_embedder(model_name: str) -> Optional[Callable[[str], List[float]]]:
+    if not model_name:
+        return None
+    if importlib.util.find_spec("sentence_transformers") is None:
+        logger.warning(
+            "MANIM_GENERATION_CACHE_EMBEDDING_MODEL is set but sentence-transformers "
+            "is not installed; using word-overlap cache matching."
+        )
+        return None
+
+    model = None
+
+    def _embed(text: str) -> List[float]:
+        # Loaded on first use so importing this module stays cheap.
+        nonlocal model
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+        return model.encode(text, normalize_embeddings=True).tolist()
+
+    return _embed
+
+
+# Cache of validated generations, keyed by prompt wording and scoped
+# by length/style/voiceover so a hit never crosses generation settings.
+GENERATION_CACHE = GenerationCache(
+    max_entries=MANIM_GENERATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=MANIM_GENERATION_CACHE_TTL_SECONDS,
+    similarity_threshold=MANIM_GENERATION_CACHE_SIMILARITY,
+    exact_max_entries=MANIM_GENERATION_CACHE_EXACT_MAX_ENTRIES,
+    embedder=_build_prompt_embedder(MANIM_GENERATION_CACHE_EMBEDDING_MODEL),
+    embedding_threshold=MANIM_GENERATION_CACHE_EMBEDDING_SIMILARITY,
+    near_match=MANIM_GENERATION_CACHE_NEAR_MATCH,
+)
+GENERATION_SHARED_CACHE = (
+    RedisBundleCache(get_redis_connection, ttl_seconds=MANIM_GENERATION_CACHE_TTL_SECONDS)
+    if MANIM_GENERATION_CACHE_SHARED_ENABLED
+    else None
+)
+
+# Same sampling gate as the generation cache: above it, one stored answer
+# should not stand in for a fresh sample.
+LLM_RESPONSE_CACHE = (
+    RedisLLMCache(get_redis_connection, ttl_seconds=LLM_RESPONSE_CACHE_TTL_SECONDS)
+    if LLM_RESPONSE_CACHE_ENABLED and LLM_TEMPERATURE <= MANIM_GENERATION_CACHE_MAX_TEMPERATURE
+    else None
+)
+
+# Single-flight registry: identical concurrent generations await the leader's
+# future instead of issuing their own LLM calls. The registry is in-process
+# only: it coalesces within one process (generate_many,
+# generate_manim_code_batch, the API process), never across RQ jobs, since
+# each job runs in its own forked process.
+_INFLIGHT_GENERATIONS: Dict[Tuple[str, Any], "asyncio.Future[Dict[str, Any]]"] = {}
+
+# One semaphore per event loop: asyncio primitives must not be shared across loops.
+_LLM_CALL_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _llm_call_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _LLM_CALL_SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(LLM_MAX_INFLIGHT_REQUESTS)
+        _LLM_CALL_SEMAPHORES[loop] = semaphore
+    return semaphore
+
 
 # Unified candidate list: Azure OpenAI first, then Groq, then Cerebras as fallback
 MODEL_CANDIDATES: List[Tuple[str, str]] = []
 if azure_openai_api_key and azure_openai_endpoint:
     MODEL_CANDIDATES.append(("azure", azure_openai_deployment))
 else:
-    print("Info: Azure OpenAI not configured \u2013 Azure fallback disabled.")
-MODEL_CANDIDATES.extend(("groq", m) for m in [PRIMARY_GROQ_MODEL, *FALLBACK_GROQ_MODELS])
+    logger.info("Azure OpenAI not configured \u2013 Azure fallback disabled.")
+# Providers without a key are left out: their calls fail with a non-retryable
+# auth error, which would abort the chain before later fallbacks get a turn.
+if groq_api_key:
+    MODEL_CANDIDATES.extend(("groq", m) for m in [PRIMARY_GROQ_MODEL, *FALLBACK_GROQ_MODELS])
 if cerebras_api_key:
     MODEL_CANDIDATES.append(("cerebras", CEREBRAS_MODEL))
 else:
-    print("Info: CEREBRAS_API_KEY not set \u2013 Cerebras fallback disabled.")
+    logger.info("CEREBRAS_API_KEY not set \u2013 Cerebras fallback disabled.")
+if not MODEL_CANDIDATES:
+    if LLM_REQUIRE_PROVIDER:
+        raise RuntimeError(
+            "No LLM provider is configured (set AZURE_OPENAI_*, GROQ_API_KEY or CEREBRAS_API_KEY; "
+            f"checked {ENV_PATH})"
+        )
+    logger.error("No LLM provider is configured; code generation requests will fail.")
+
+
+@lru_cache(maxsize=1)
+def _get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Shared, pooled HTTP clients for every provider client.
+
+    Reusing one pool keeps TLS sessions warm across candidates, repairs and
+    fallbacks instead of each chat model opening its own small pool. HTTP/2 is
+    used when the optional ``h2`` package is installed.
+    """
+    limits = httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_SECONDS,
+    )
+    timeout = httpx.Timeout(LLM_HTTP_TIMEOUT_SECONDS, connect=LLM_HTTP_CONNECT_TIMEOUT_SECONDS)
+    http2 = importlib.util.find_spec("h2") is not None
+    return (
+        httpx.Client(http2=http2, limits=limits, timeout=timeout),
+        httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout),
+    )
+
+
+async def close_http_clients() -> None:
+    """Close the shared HTTP pool if it was ever created."""
+    if _get_http_clients.cache_info().currsize == 0:
+        return
+    sync_client, async_client = _get_http_clients()
+    _get_http_clients.cache_clear()
+    _get_llm_client.cache_clear()
+    _CHAIN_CACHE.clear()
+    sync_client.close()
+    await async_client.aclose()
+
+
+async def warm_up_llm_connection() -> bool:
+    """
+    Open a pooled connection to the first configured provider ahead of the
+    first LLM call, so the TLS handshake overlaps other job setup.
+
+    Any HTTP response (even 401) leaves a warm keep-alive connection; failures
+    are ignored because the real call retries on its own.
+    """
+    if not LLM_CONNECTION_WARMUP_ENABLED or not MODEL_CANDIDATES:
+        return False
+    provider = MODEL_CANDIDATES[0][0]
+    base_url, api_key = {
+        "azure": (azure_openai_base_url, azure_openai_api_key),
+        "cerebras": (CEREBRAS_BASE_URL, cerebras_api_key),
+    }.get(provider, (GROQ_BASE_URL, groq_api_key))
+    _, http_async_client = _get_http_clients()
+    try:
+        await http_async_client.get(
+            f"{base_url.rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=LLM_HTTP_CONNECT_TIMEOUT_SECONDS,
+        )
+    except Exception as exc:
+        logger.debug("LLM connection warm-up to %s failed: %s", provider, exc)
+        return False
+    return True
+
+
+def prebuild_llm_clients() -> int:
+    """
+    Construct the provider clients for every configured model up front.
+
+    The RQ worker calls this in its parent process so forked job processes
+    inherit ready clients (and their still-unconnected HTTP pool) instead of
+    building them on the first LLM call of every job.
+    """
+    built = 0
+    for provider, model_name in MODEL_CANDIDATES:
+        try:
+            _get_llm_client(provider, model_name)
+            built += 1
+        except Exception as exc:
+            logger.warning("Could not prebuild LLM client %s/%s: %s", provider, model_name, exc)
+    return built
 
 
 @lru_cache(maxsize=16)
 def _get_llm_client(provider: str, model_name: str):
-    """Return a LangChain chat model for the given provider."""
+    """
+    Return a LangChain chat model for the given provider.
+
+    SDK-level retries are disabled: _invoke_with_resilience owns retry, backoff
+    and fallback, and nested SDK retries would multiply attempts before the
+    next provider gets a turn.
+    """
+    http_client, http_async_client = _get_http_clients()
     if provider == "azure":
         return ChatOpenAI(
             model=model_name,
             api_key=azure_openai_api_key,
             base_url=azure_openai_base_url,
             max_completion_tokens=16384,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=0,
+            cache=LLM_RESPONSE_CACHE,
         )
     if provider == "cerebras":
         return ChatOpenAI(
@@ -268,12 +553,20 @@ def _get_llm_client(provider: str, model_name: str):
             api_key=cerebras_api_key,
             base_url=CEREBRAS_BASE_URL,
             temperature=LLM_TEMPERATURE,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=0,
+            cache=LLM_RESPONSE_CACHE,
         )
     # Default: Groq
     return ChatGroq(
         model=model_name,
         api_key=groq_api_key,
         temperature=LLM_TEMPERATURE,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        max_retries=0,
+        cache=LLM_RESPONSE_CACHE,
     )
 
 
@@ -285,7 +578,14 @@ def _is_voiceover_plugin_available() -> bool:
 # Backward compatibility for any direct imports/tests.
 _default_provider = "azure" if (azure_openai_api_key and azure_openai_endpoint) else "groq"
 _default_model = azure_openai_deployment if _default_provider == "azure" else PRIMARY_GROQ_MODEL
-llm = _get_llm_client(_default_provider, _default_model)
+
+
+def __getattr__(name: str) -> Any:
+    # `llm` is resolved on first access (and shared via _get_llm_client's cache)
+    # so importing this module does not construct a client.
+    if name == "llm":
+        return _get_llm_client(_default_provider, _default_model)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def _is_retryable_llm_error(exc: Exception) -> bool:
@@ -303,6 +603,7 @@ def _is_retryable_llm_error(exc: Exception) -> bool:
             openai_mod.NotFoundError,
             httpx.TimeoutException,
             httpx.TransportError,
+            asyncio.TimeoutError,
         ),
     ):
         return True
@@ -322,6 +623,21 @@ def _is_retryable_llm_error(exc: Exception) -> bool:
     return any(marker in message for marker in transient_markers)
 
 
+def _retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Provider Retry-After hint (seconds, capped at LLM_RETRY_MAX_SECONDS), if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    try:
+        value = float(headers.get("retry-after", ""))
+    except (TypeError, ValueError):
+        return None
+    if value < 0:
+        return None
+    return min(LLM_RETRY_MAX_SECONDS, value)
+
+
 def _compute_retry_delay_seconds(attempt: int) -> float:
     # Full-jitter backoff to avoid synchronized retries under provider load.
     upper_bound = min(
@@ -331,24 +647,147 @@ def _compute_retry_delay_seconds(attempt: int) -> float:
     return random.uniform(0.0, upper_bound)
 
 
+# Per-model circuit breaker: (provider, model) -> {"failures", "open_until"}.
+# A model that keeps failing transiently is skipped until open_until, so calls
+# go straight to the next candidate instead of burning retries on it.
+_CIRCUIT_STATE: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+
+def _circuit_is_open(key: Tuple[str, str]) -> bool:
+    state = _CIRCUIT_STATE.get(key)
+    return bool(state) and time.monotonic() < state["open_until"]
+
+
+def _record_llm_success(key: Tuple[str, str]) -> None:
+    _CIRCUIT_STATE.pop(key, None)
+
+
+def _record_llm_failure(key: Tuple[str, str]) -> None:
+    state = _CIRCUIT_STATE.setdefault(key, {"failures": 0.0, "open_until": 0.0})
+    state["failures"] += 1
+    if state["failures"] >= LLM_CIRCUIT_FAILURE_THRESHOLD:
+        state["open_until"] = time.monotonic() + LLM_CIRCUIT_RESET_SECONDS
+
+
+def _static_prompt(system_text: str, human_template: str) -> Runnable:
+    """
+    Build the prompt step of a chain: a fixed system message plus a human turn
+    rendered with str.format, skipping ChatPromptTemplate's per-call render.
+    """
+    system_message = SystemMessage(content=system_text)
+
+    def _to_messages(payload: Dict[str, Any]) -> List[BaseMessage]:
+        return [system_message, HumanMessage(content=human_template.format(**payload))]
+
+    async def _ato_messages(payload: Dict[str, Any]) -> List[BaseMessage]:
+        return _to_messages(payload)
+
+    return RunnableLambda(_to_messages, afunc=_ato_messages)
+
+
+# (id(template), provider, model, json_mode, max_tokens, stop) -> (template, client,
+# runnable). Holding the template and client keeps their ids from being recycled.
+_CHAIN_CACHE: Dict[Tuple[Any, ...], Tuple[Any, Any, Any]] = {}
+
+
+def _get_chain(
+    prompt_template: Runnable,
+    provider: str,
+    model_name: str,
+    json_mode: bool = False,
+    max_tokens: Optional[int] = None,
+    stop: Optional[Tuple[str, ...]] = None,
+) -> Any:
+    llm_client = _get_llm_client(provider, model_name)
+    key = (id(prompt_template), provider, model_name, json_mode, max_tokens, stop)
+    cached = _CHAIN_CACHE.get(key)
+    if cached is not None and cached[0] is prompt_template and cached[1] is llm_client:
+        return cached[2]
+
+    bind_kwargs: Dict[str, Any] = {}
+    if json_mode:
+        # JSON mode constrains decoding to a single JSON object (no prose or fences).
+        bind_kwargs["response_format"] = {"type": "json_object"}
+    # Azure deployments are reasoning models that reject stop sequences and share
+    # the token budget with reasoning, so they keep their client-level ceiling.
+    if provider != "azure":
+        if max_tokens is not None:
+            bind_kwargs["max_tokens"] = max_tokens
+        if stop:
+            bind_kwargs["stop"] = list(stop)
+    model_step = llm_client.bind(**bind_kwargs) if bind_kwargs else llm_client
+    chain = prompt_template | model_step | StrOutputParser()
+    _CHAIN_CACHE[key] = (prompt_template, llm_client, chain)
+    return chain
+
+
+async def _stream_chain(chain: Any, payload: Dict[str, Any], on_chunk: Callable[[str], None]) -> str:
+    parts: List[str] = []
+    async for chunk in chain.astream(payload):
+        if not chunk:
+            continue
+        parts.append(chunk)
+        on_chunk(chunk)
+    return "".join(parts)
+
+
 async def _invoke_with_resilience(
-    prompt_template: ChatPromptTemplate,
+    prompt_template: Runnable,
     payload: Dict[str, Any],
     operation: str,
+    on_chunk: Optional[Callable[[str], None]] = None,
+    models: Optional[List[Tuple[str, str]]] = None,
+    json_mode: bool = False,
+    max_tokens: Optional[int] = None,
+    stop: Optional[Tuple[str, ...]] = None,
 ) -> str:
+    candidates = MODEL_CANDIDATES if models is None else models
+    if not candidates:
+        raise RuntimeError(
+            f"LLM {operation} failed: no LLM provider is configured "
+            "(set AZURE_OPENAI_*, GROQ_API_KEY or CEREBRAS_API_KEY)"
+        )
     last_error: Optional[Exception] = None
-    total_candidates = len(MODEL_CANDIDATES)
+    total_candidates = len(candidates)
 
-    for cand_index, (provider, model_name) in enumerate(MODEL_CANDIDATES, start=1):
-        chain = prompt_template | _get_llm_client(provider, model_name) | StrOutputParser()
+    for cand_index, (provider, model_name) in enumerate(candidates, start=1):
+        circuit_key = (provider, model_name)
+        if _circuit_is_open(circuit_key):
+            logger.warning(
+                "LLM %s: skipping %s/%s (circuit open after repeated failures).", operation, provider, model_name
+            )
+            continue
+        chain = _get_chain(
+            prompt_template,
+            provider,
+            model_name,
+            json_mode=json_mode and LLM_JSON_MODE_ENABLED,
+            max_tokens=max_tokens,
+            stop=stop,
+        )
 
         for attempt in range(1, LLM_RETRY_ATTEMPTS + 1):
             try:
-                return await chain.ainvoke(payload)
+                # Held for the provider call only, never across retry backoff.
+                async with _llm_call_semaphore():
+                    if on_chunk is None:
+                        call = chain.ainvoke(payload)
+                    else:
+                        # A retried stream restarts from scratch; partial output is discarded.
+                        call = _stream_chain(chain, payload, on_chunk)
+                    result = await asyncio.wait_for(call, timeout=LLM_CALL_TIMEOUT_SECONDS)
+                _record_llm_success(circuit_key)
+                return result
             except Exception as exc:
                 last_error = exc
                 if not _is_retryable_llm_error(exc):
                     raise
+                _record_llm_failure(circuit_key)
+                if _circuit_is_open(circuit_key) and cand_index < total_candidates:
+                    logger.warning(
+                        "LLM %s: circuit opened for %s/%s. Trying next model.", operation, provider, model_name
+                    )
+                    break
 
                 on_last_attempt = attempt == LLM_RETRY_ATTEMPTS
                 on_last_candidate = cand_index == total_candidates
@@ -356,21 +795,36 @@ async def _invoke_with_resilience(
                     break
 
                 if on_last_attempt:
-                    print(
-                        f"LLM {operation}: {provider}/{model_name} unavailable after "
-                        f"{LLM_RETRY_ATTEMPTS} attempts. Trying next model."
+                    logger.warning(
+                        "LLM %s: %s/%s unavailable after %s attempts. Trying next model.",
+                        operation,
+                        provider,
+                        model_name,
+                        LLM_RETRY_ATTEMPTS,
                     )
                     break
 
-                delay = _compute_retry_delay_seconds(attempt)
-                print(
-                    f"LLM {operation}: transient error on {provider}/{model_name} "
-                    f"(attempt {attempt}/{LLM_RETRY_ATTEMPTS}): {exc}. "
-                    f"Retrying in {delay:.2f}s."
+                delay = _retry_after_seconds(exc)
+                if delay is None:
+                    delay = _compute_retry_delay_seconds(attempt)
+                logger.warning(
+                    "LLM %s: transient error on %s/%s (attempt %s/%s): %s. Retrying in %.2fs.",
+                    operation,
+                    provider,
+                    model_name,
+                    attempt,
+                    LLM_RETRY_ATTEMPTS,
+                    exc,
+                    delay,
                 )
                 await asyncio.sleep(delay)
 
-    model_list = ", ".join(f"{p}/{m}" for p, m in MODEL_CANDIDATES)
+    model_list = ", ".join(f"{p}/{m}" for p, m in candidates)
+    if last_error is None:
+        raise RuntimeError(
+            f"LLM {operation}: all configured models ({model_list}) are temporarily disabled "
+            "after repeated failures"
+        )
     raise RuntimeError(
         f"LLM {operation} failed across all configured models ({model_list}): {last_error}"
     ) from last_error
@@ -393,7 +847,7 @@ def _load_prompt_assets() -> Dict[str, Any]:
             except json.JSONDecodeError as exc:
                 raise RuntimeError(f"Invalid JSON in prompt asset {file_path}: {exc}") from exc
         else:
-            assets[key] = raw_text
+            assets[key] = re.sub(r"\n{3,}", "\n\n", raw_text)
 
     length_profiles = assets["length_profiles"]
     if not isinstance(length_profiles, dict):
@@ -429,15 +883,82 @@ def _load_prompt_assets() -> Dict[str, Any]:
 PROMPT_ASSETS = _load_prompt_assets()
 
 
-def get_length_profile(length: str) -> Dict[str, Any]:
+def _compute_generation_cache_version() -> str:
+    # Cached bundles are only valid for the prompts, models and sampling that
+    # produced them; any change here starts a fresh cache namespace.
+    fingerprint = json.dumps(
+        {
+            "prompt_assets": PROMPT_ASSETS,
+            "models": MODEL_CANDIDATES,
+            "draft_model": MANIM_DRAFT_MODEL if MANIM_DRAFT_MODEL_ENABLED else None,
+            "fast_tier": [LLM_FAST_MODEL, sorted(LLM_FAST_TIER_LENGTHS)] if LLM_FAST_TIER_LENGTHS else None,
+            "temperature": LLM_TEMPERATURE,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+
+GENERATION_CACHE_VERSION = _compute_generation_cache_version()
+
+
+def _resolve_length_profiles() -> Dict[str, Dict[str, Any]]:
     profiles = PROMPT_ASSETS["length_profiles"]["profiles"]
-    default_length = PROMPT_ASSETS["length_profiles"]["default_length"]
-    if length in profiles:
-        profile = dict(profiles[length])
-    else:
-        profile = dict(profiles[default_length])
-    profile["length_name"] = length if length in profiles else default_length
-    return profile
+    return {name: {**profile, "length_name": name} for name, profile in profiles.items()}
+
+
+# Resolved once at import; only a handful of lengths exist. Frozen so a caller
+# can't swap an entry out from under every other request in the process.
+_LENGTH_PROFILES: Mapping[str, Dict[str, Any]] = MappingProxyType(_resolve_length_profiles())
+_DEFAULT_LENGTH_PROFILE = _LENGTH_PROFILES[PROMPT_ASSETS["length_profiles"]["default_length"]]
+
+
+def _models_for_length(length_name: str) -> Optional[List[Tuple[str, str]]]:
+    """Model chain for planning/codegen at this length; None means MODEL_CANDIDATES."""
+    if length_name not in LLM_FAST_TIER_LENGTHS or not groq_api_key:
+        return None
+    fast = ("groq", LLM_FAST_MODEL)
+    return [fast, *(candidate for candidate in MODEL_CANDIDATES if candidate != fast)]
+
+
+def get_length_profile(length: str) -> Dict[str, Any]:
+    """Return the shared profile for ``length`` (default profile if unknown). Treat as read-only."""
+    return _LENGTH_PROFILES.get(length, _DEFAULT_LENGTH_PROFILE)
+
+
+def _prompt_json(value: Any) -> str:
+    # Compact separators: indentation is pure token overhead for the model.
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+@lru_cache(maxsize=16)
+def _length_profile_json(length_name: str) -> str:
+    # Serialized once per canonical length so the prompt prefix stays byte-identical
+    # across requests and provider-side prefix caching can reuse it. length_name is
+    # dropped: every prompt already states it on the "Length selection" line.
+    profile = get_length_profile(length_name)
+    return _prompt_json({key: value for key, value in profile.items() if key != "length_name"})
+
+
+# Output-token ceilings for code-producing calls, sized per video length with
+# generous headroom: they only cut off runaway generations, never normal code.
+CODE_MAX_OUTPUT_TOKENS = {
+    "Medium (15s)": 4000,
+    "Long (1m)": 8000,
+    "Deep Dive (2m)": 12000,
+    "Extended (5m)": 16000,
+}
+# Generated scenes never contain a __main__ block; seeing one means the model
+# has wandered past the class body.
+_CODE_STOP_SEQUENCES = ("\nif __name__",)
+
+
+def _code_output_limits(length_name: str) -> Dict[str, Any]:
+    return {
+        "max_tokens": CODE_MAX_OUTPUT_TOKENS.get(length_name, 16000),
+        "stop": _CODE_STOP_SEQUENCES,
+    }
 
 
 def _emit_progress(progress_callback: ProgressCallback, status: str, message: str) -> None:
@@ -450,33 +971,152 @@ def _emit_progress(progress_callback: ProgressCallback, status: str, message: st
         return
 
 
+def _make_stream_progress(
+    progress_callback: ProgressCallback,
+    label: str,
+    chunk_callback: ChunkCallback = None,
+    candidate_index: int = 1,
+) -> Optional[Callable[[str], None]]:
+    """Forward streamed chunks and turn them into throttled "streaming_code" progress."""
+    if not progress_callback and not chunk_callback:
+        return None
+
+    state = {"chars": 0, "last_emit": 0.0}
+
+    def _on_chunk(chunk: str) -> None:
+        if chunk_callback:
+            try:
+                chunk_callback(candidate_index, chunk)
+            except Exception:
+                pass
+        if not progress_callback:
+            return
+        state["chars"] += len(chunk)
+        now = time.monotonic()
+        if now - state["last_emit"] < STREAM_PROGRESS_INTERVAL_SECONDS:
+            return
+        state["last_emit"] = now
+        _emit_progress(
+            progress_callback,
+            "streaming_code",
+            f"{label}: received {state['chars']} characters of code...",
+        )
+
+    return _on_chunk
+
+
+_THINK_BLOCK_RE = re.compile(r"<think>.*?</think>", re.IGNORECASE | re.DOTALL)
+_THINK_OPEN_RE = re.compile(r"<think>", re.IGNORECASE)
+# One pass covers opening (```python / ```py) and bare closing fence lines.
+_FENCE_LINE_RE = re.compile(r"^\s*```(?:python|py)?\s*$", re.IGNORECASE | re.MULTILINE)
+# Closing fence glued to the last line of code (``self.wait(1)```).
+_TRAILING_FENCE_RE = re.compile(r"```\s*\Z")
+_MANIM_IMPORT_LINE_RE = re.compile(r"^\s*from\s+manim\s+import\s+\*\s*$", re.MULTILINE)
+_GENSCENE_CLASS_RE = re.compile(r"^\s*class\s+GenScene\b", re.MULTILINE)
+_GENSCENE_CLASS_LINE_RE = re.compile(r"^(\s*class\s+GenScene\s*\([^\)]*\)\s*:)")
+_GENSCENE_BASES_RE = re.compile(r"^(\s*class\s+GenScene\s*\()([^\)]*)(\)\s*:)")
+_CONSTRUCT_DEF_RE = re.compile(r"^(\s*)def\s+construct\s*\(\s*self\s*\)\s*:")
+_PLAY_CALL_START_RE = re.compile(r"self\.play\(")
+_REPEATED_BACKSLASH_RE = re.compile(r"\\{2,}")
+# Methods where `opacity=` is a legitimate keyword argument
+_OPACITY_EXEMPT_METHODS_RE = re.compile(r"\.\s*(?:set_fill|set_stroke|set_style|set_opacity)\s*\(")
+_BARE_OPACITY_KWARG_RE = re.compile(r"(?<!fill_)(?<!stroke_)\bopacity\s*=")
+_SHOWCREATION_RE = re.compile(r"\bShowCreation\b")
+# Standalone `Group(` that is NOT part of AnimationGroup, VGroup, etc.
+_BARE_GROUP_CALL_RE = re.compile(r"(?<!Animation)(?<!V)(?<!Sub)\bGroup\s*\(")
+# np.array([...]) with exactly 2 comma-separated items (no nested brackets)
+_NP_ARRAY_2D_RE = re.compile(r"np\.array\(\[\s*([^,\[\]]+),\s*([^,\[\]]+)\s*\]\)")
+
+
 def _strip_think_blocks(text: str) -> str:
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.IGNORECASE | re.DOTALL)
+    return _THINK_BLOCK_RE.sub("", text)
 
 
 def _remove_markdown_fences(text: str) -> str:
-    text = re.sub(r"^\s*```(?:python|py)?\s*$", "", text, flags=re.IGNORECASE | re.MULTILINE)
-    text = re.sub(r"^\s*```\s*$", "", text, flags=re.MULTILINE)
-    return text
+    return _TRAILING_FENCE_RE.sub("", _FENCE_LINE_RE.sub("", text))
 
 
 def sanitize_generated_code(raw_code: str) -> str:
     """Strip chain-of-thought tags and markdown wrappers from model output."""
+    # re.sub/str.replace hand back the same object when nothing matches, so a
+    # clean response passes through without copies; strip once at the end.
     text = (raw_code or "").replace("\r\n", "\n")
-    text = _strip_think_blocks(text)
-    text = _remove_markdown_fences(text).strip()
-
-    manim_import_match = re.search(r"(?m)^\s*from\s+manim\s+import\s+\*\s*$", text)
-    class_match = re.search(r"(?m)^\s*class\s+GenScene\b", text)
+    text = _remove_markdown_fences(_strip_think_blocks(text))
 
-    if manim_import_match:
-        text = text[manim_import_match.start():]
-    elif class_match:
-        text = text[class_match.start():]
+    # Usual case: the code already starts at the import, no anchor scan needed.
+    if not text.lstrip().startswith("from manim import"):
+        start_match = _MANIM_IMPORT_LINE_RE.search(text) or _GENSCENE_CLASS_RE.search(text)
+        if start_match:
+            text = text[start_match.start():]
 
     return text.strip()
 
 
+class StreamingCodeCleaner:
+    """
+    Incremental counterpart of sanitize_generated_code for streamed output.
+
+    Text before the ``from manim import *`` / ``class GenScene`` anchor
+    (reasoning blocks, prose, an opening fence) is buffered and dropped, then
+    complete lines pass through until a closing fence ends the code. Each chunk
+    is scanned once, so a live preview never re-cleans the whole response.
+    """
+
+    def __init__(self) -> None:
+        self._pending = ""
+        self._started = False
+        self._closed = False
+        self.text = ""
+
+    def feed(self, chunk: str) -> str:
+        """Add a streamed chunk; return the newly cleaned text (may be empty)."""
+        if self._closed or not chunk:
+            return ""
+        self._pending += chunk.replace("\r\n", "\n")
+        if not self._started and not self._find_start():
+            return ""
+        head, sep, tail = self._pending.rpartition("\n")
+        if not sep:
+            return ""
+        self._pending = tail
+        return self._emit_lines(head + sep)
+
+    def flush(self) -> str:
+        """Emit the trailing partial line once the stream has ended."""
+        if self._closed or not self._started or not self._pending:
+            return ""
+        pending, self._pending = self._pending, ""
+        return self._emit_lines(pending)
+
+    def _find_start(self) -> bool:
+        text = _strip_think_blocks(self._pending)
+        # An unterminated reasoning block may still mention the anchor text.
+        if _THINK_OPEN_RE.search(text):
+            return False
+        match = _MANIM_IMPORT_LINE_RE.search(text) or _GENSCENE_CLASS_RE.search(text)
+        if match is None or "\n" not in text[match.start():]:
+            return False
+        self._pending = text[match.start():].lstrip()
+        self._started = True
+        return True
+
+    def _emit_lines(self, text: str) -> str:
+        out: List[str] = []
+        for line in text.splitlines(keepends=True):
+            if _FENCE_LINE_RE.fullmatch(line.rstrip("\n")):
+                self._closed = True
+                break
+            stripped = line.rstrip()
+            if stripped.endswith("```"):
+                out.append(stripped[:-3].rstrip() + "\n")
+                self._closed = True
+                break
+            out.append(line)
+        emitted = "".join(out)
+        self.text += emitted
+        return emitted
+
+
 def _extract_json_object(text: str) -> str:
     cleaned = _strip_think_blocks(_remove_markdown_fences(text)).strip()
     if not cleaned:
@@ -631,18 +1271,6 @@ def _normalize_scene_plan(scene_plan: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def _format_scene_plan_schema_hint() -> str:
-    return (
-        '{"title":"string","hook":"string","narrative_arc":"string",'
-        '"scenes":[{"name":"string","purpose":"string",'
-        '"duration_seconds":10,"visuals":["string"],'
-        '"technical_notes":["string"],'
-        '"layout_zone":"golden","camera_strategy":"static",'
-        '"max_concurrent_text_blocks":3,"clear_policy":"fade_out",'
-        '"focus_targets":["string"]}]}'
-    )
-
-
 def _enrich_scene_plan_with_timeline(scene_plan: Dict[str, Any], length: str) -> Dict[str, Any]:
     enriched = dict(scene_plan)
     timeline = build_scene_timeline(scene_plan)
@@ -655,6 +1283,23 @@ def _enrich_scene_plan_with_timeline(scene_plan: Dict[str, Any], length: str) ->
     return enriched
 
 
+# Request-invariant instructions live in the system message so every call
+# shares the longest possible identical prefix (provider-side prefix caching);
+# the human turn carries only per-request values.
+_COMPOSE_SCENE_PLAN_PROMPT = _static_prompt(
+    PROMPT_ASSETS["composer_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "Style pack JSON:\n{style_pack_json}\n\n"
+    "Voiceover mode: {voiceover_mode}\n\n"
+    "Historical high-quality scene memory:\n{memory_context}\n\n"
+    "User prompt:\n{prompt}\n\n"
+    "Candidate index: {candidate_index}/{candidate_total}\n"
+    "Produce a scene plan with strong educational flow and concrete visual steps.\n"
+    "Return JSON only using the output schema from the instructions.",
+)
+
+
 async def compose_scene_plan(
     prompt: str,
     length: str,
@@ -666,38 +1311,21 @@ async def compose_scene_plan(
 ) -> Dict[str, Any]:
     profile = get_length_profile(length)
     style_payload = style_pack or {"style_id": "classic_clean", "tokens": {}}
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["composer_system"]),
-            (
-                "human",
-                "User prompt:\n{prompt}\n\n"
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Style pack JSON:\n{style_pack_json}\n\n"
-                "Historical high-quality scene memory:\n{memory_context}\n\n"
-                "Voiceover mode: {voiceover_mode}\n\n"
-                "Candidate index: {candidate_index}/{candidate_total}\n"
-                "Produce a scene plan with strong educational flow and concrete visual steps.\n"
-                "Return JSON only using this schema:\n{schema_hint}",
-            ),
-        ]
-    )
-
     raw_response = await _invoke_with_resilience(
-        prompt_template,
+        _COMPOSE_SCENE_PLAN_PROMPT,
         {
             "prompt": prompt,
             "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
-            "style_pack_json": json.dumps(style_payload, indent=2),
+            "length_profile_json": _length_profile_json(profile["length_name"]),
+            "style_pack_json": _prompt_json(style_payload),
             "memory_context": memory_context or "No relevant historical scenes.",
             "voiceover_mode": voiceover_mode,
             "candidate_index": int(candidate_index),
             "candidate_total": int(candidate_total),
-            "schema_hint": _format_scene_plan_schema_hint(),
         },
         operation="compose_scene_plan",
+        json_mode=True,
+        models=_models_for_length(profile["length_name"]),
     )
 
     parsed = json.loads(_extract_json_object(raw_response))
@@ -705,6 +1333,225 @@ async def compose_scene_plan(
     return _enrich_scene_plan_with_timeline(normalized, length)
 
 
+_GENERATE_CODE_PROMPT = _static_prompt(
+    PROMPT_ASSETS["codegen_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "Style pack JSON:\n{style_pack_json}\n\n"
+    "Voiceover enabled: {voiceover_enabled}\n\n"
+    "Historical scene memory:\n{memory_context}\n\n"
+    "User prompt:\n{prompt}\n\n"
+    "Scene plan JSON:\n{scene_plan_json}\n\n"
+    "Scope: {section_scope}\n\n"
+    "Voiceover script JSON:\n{voiceover_script_json}\n\n"
+    "Candidate index: {candidate_index}/{candidate_total}\n"
+    "Generate executable Python code for ManimCE.\n"
+    "Return code only.",
+)
+
+
+def prebuild_generation_chains() -> int:
+    """
+    Build the scene-plan and per-length codegen chains for every model the
+    length would try, so the first request at each length is a cache lookup.
+    """
+    built = 0
+    for length_name in _LENGTH_PROFILES:
+        models = _models_for_length(length_name) or MODEL_CANDIDATES
+        limits = _code_output_limits(length_name)
+        for provider, model_name in models:
+            try:
+                _get_chain(_GENERATE_CODE_PROMPT, provider, model_name, **limits)
+                _get_chain(
+                    _COMPOSE_SCENE_PLAN_PROMPT,
+                    provider,
+                    model_name,
+                    json_mode=LLM_JSON_MODE_ENABLED,
+                )
+                built += 1
+            except Exception as exc:
+                logger.warning("Could not prebuild chains for %s/%s: %s", provider, model_name, exc)
+    return built
+
+
+async def _draft_code_from_plan(
+    payload: Dict[str, Any],
+    length: str,
+    scene_plan: Dict[str, Any],
+) -> Optional[str]:
+    """Return draft-model code when it validates cleanly, else None."""
+    if not MANIM_DRAFT_MODEL_ENABLED or not groq_api_key:
+        return None
+    try:
+        raw_draft = await _invoke_with_resilience(
+            _GENERATE_CODE_PROMPT,
+            payload,
+            operation="draft_code_from_plan",
+            models=[("groq", MANIM_DRAFT_MODEL)],
+            **_code_output_limits(payload["length_name"]),
+        )
+    except Exception as exc:
+        logger.info("LLM draft_code_from_plan: draft model failed, using main models: %s", exc)
+        return None
+
+    draft_code = sanitize_generated_code(raw_draft)
+    errors = validate_code(draft_code, length, scene_plan)
+    if errors:
+        logger.info("LLM draft_code_from_plan: draft rejected (%s validation errors)", len(errors))
+        return None
+    return draft_code
+
+
+def _should_generate_in_sections(scene_plan: Dict[str, Any], voiceover_enabled: bool) -> bool:
+    # Voiceover scenes initialise a speech service in construct(), which does
+    # not survive stitching several construct bodies together.
+    return (
+        MANIM_PARALLEL_SECTIONS_ENABLED
+        and not voiceover_enabled
+        and len(scene_plan.get("scenes", [])) >= MANIM_PARALLEL_SECTIONS_MIN_SCENES
+    )
+
+
+def stitch_section_code(fragments: List[str]) -> Optional[str]:
+    """
+    Merge per-section GenScene fragments into one scene, clearing the screen
+    between sections.
+
+    Returns None when a fragment is not a plain ``imports + GenScene.construct``
+    module (helpers, extra methods, mismatched base classes), since those cannot
+    be merged safely; callers then fall back to whole-video generation.
+    """
+    imports: List[str] = []
+    bodies: List[List[str]] = []
+    scene_bases: Optional[Tuple[str, ...]] = None
+
+    for code in fragments:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+
+        scene_class: Optional[ast.ClassDef] = None
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                statement = ast.get_source_segment(code, node) or ""
+                if statement not in imports:
+                    imports.append(statement)
+            elif isinstance(node, ast.ClassDef) and node.name == "GenScene" and scene_class is None:
+                scene_class = node
+            else:
+                return None
+
+        if scene_class is None or len(scene_class.body) != 1:
+            return None
+        construct = scene_class.body[0]
+        if not isinstance(construct, ast.FunctionDef) or construct.name != "construct":
+            return None
+        if construct.body[0].lineno == construct.lineno:
+            return None
+
+        bases = tuple(ast.get_source_segment(code, base) or "" for base in scene_class.bases)
+        if scene_bases is None:
+            scene_bases = bases
+        elif bases != scene_bases:
+            return None
+
+        lines = code.split("\n")
+        body = textwrap.dedent("\n".join(lines[construct.body[0].lineno - 1:construct.end_lineno]))
+        bodies.append(body.split("\n"))
+
+    if not bodies:
+        return None
+
+    out = [*imports, "", "", f"class GenScene({', '.join(scene_bases or ('Scene',))}):", "    def construct(self):"]
+    for index, body in enumerate(bodies):
+        if index:
+            out.extend(
+                [
+                    "",
+                    "        if self.mobjects:",
+                    "            self.play(*[FadeOut(mob) for mob in self.mobjects])",
+                    "",
+                ]
+            )
+        out.extend(f"        {line}" if line.strip() else "" for line in body)
+    return "\n".join(out) + "\n"
+
+
+async def _generate_code_in_sections(
+    prompt: str,
+    length: str,
+    scene_plan: Dict[str, Any],
+    style_pack: Dict[str, Any] | None,
+    memory_context: str,
+    candidate_index: int,
+    candidate_total: int,
+    progress_callback: ProgressCallback,
+) -> Optional[str]:
+    """Generate each planned scene concurrently and stitch the results.
+
+    Returns None when any section fails or the fragments cannot be stitched,
+    so the caller falls back to whole-video generation.
+    """
+    profile = get_length_profile(length)
+    scenes = list(scene_plan.get("scenes", []))
+    total_seconds = sum(float(scene.get("duration_seconds", 0) or 0) for scene in scenes) or float(len(scenes))
+    min_wait_calls = int(profile.get("minimum_wait_calls", 0))
+    semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    section_plan_base = {
+        key: value for key, value in scene_plan.items() if key not in {"scenes", "timeline", "duration_budget"}
+    }
+
+    async def _generate_section(index: int, scene: Dict[str, Any]) -> str:
+        seconds = float(scene.get("duration_seconds", 0) or 0) or total_seconds / len(scenes)
+        section_profile = {
+            "target_seconds_min": int(seconds),
+            "target_seconds_max": int(math.ceil(seconds * 1.15)),
+            "minimum_wait_calls": max(1, math.ceil(min_wait_calls * seconds / total_seconds)),
+            "sections_hint": 1,
+            "summary": f"Section {index} of {len(scenes)} in a {profile['length_name']} video.",
+        }
+        async with semaphore:
+            return await generate_code_from_plan(
+                prompt=prompt,
+                length=length,
+                scene_plan={**section_plan_base, "scenes": [scene]},
+                style_pack=style_pack,
+                memory_context=memory_context,
+                candidate_index=candidate_index,
+                candidate_total=candidate_total,
+                section_scope=(
+                    f"Section {index} of {len(scenes)} only. Implement just this scene as a complete "
+                    "GenScene with all code inside construct(); the screen is cleared before it starts."
+                ),
+                section_profile=section_profile,
+            )
+
+    _emit_progress(
+        progress_callback,
+        "generating",
+        f"Candidate {candidate_index}/{candidate_total}: generating {len(scenes)} sections in parallel...",
+    )
+    tasks = [
+        asyncio.ensure_future(_generate_section(index, scene)) for index, scene in enumerate(scenes, start=1)
+    ]
+    try:
+        # One failed section makes stitching impossible, so stop the others early.
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    if failures:
+        logger.warning("Section generation failed (%s); generating the full video in one call.", failures[0])
+        return None
+    stitched = stitch_section_code(list(outcomes))
+    if stitched is None:
+        logger.info("Section fragments could not be stitched; generating the full video in one call.")
+    return stitched
+
+
 async def generate_code_from_plan(
     prompt: str,
     length: str,
@@ -714,51 +1561,65 @@ async def generate_code_from_plan(
     voiceover_script: Dict[str, Any] | None = None,
     candidate_index: int = 1,
     candidate_total: int = 1,
+    progress_callback: ProgressCallback = None,
+    chunk_callback: ChunkCallback = None,
+    section_scope: str = "",
+    section_profile: Dict[str, Any] | None = None,
 ) -> str:
     profile = get_length_profile(length)
     style_payload = style_pack or {"style_id": "classic_clean", "tokens": {}}
     voiceover_payload = voiceover_script or {"enabled": False, "chunks": []}
     voiceover_enabled = bool(voiceover_payload.get("enabled", False))
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["codegen_system"]),
-            (
-                "human",
-                "User prompt:\n{prompt}\n\n"
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Scene plan JSON:\n{scene_plan_json}\n\n"
-                "Style pack JSON:\n{style_pack_json}\n\n"
-                "Historical scene memory:\n{memory_context}\n\n"
-                "Voiceover script JSON:\n{voiceover_script_json}\n\n"
-                "Voiceover enabled: {voiceover_enabled}\n"
-                "Candidate index: {candidate_index}/{candidate_total}\n"
-                "If voiceover_enabled=true:\n"
-                "- import `VoiceoverScene` from `manim_voiceover`\n"
-                "- use `class GenScene(VoiceoverScene)` or combined camera+voiceover scene base\n"
-                "- use `with self.voiceover(text=...) as tracker:` blocks and align animation timing to tracker.duration\n"
-                "- keep generated subtitles aligned with voiceover chunks\n"
-                "Generate executable Python code for ManimCE.\n"
-                "Return code only.",
-            ),
-        ]
-    )
+
+    if not section_scope and _should_generate_in_sections(scene_plan, voiceover_enabled):
+        stitched = await _generate_code_in_sections(
+            prompt=prompt,
+            length=length,
+            scene_plan=scene_plan,
+            style_pack=style_pack,
+            memory_context=memory_context,
+            candidate_index=candidate_index,
+            candidate_total=candidate_total,
+            progress_callback=progress_callback,
+        )
+        if stitched is not None:
+            return stitched
+
+    payload = {
+        "prompt": prompt,
+        "length_name": profile["length_name"],
+        "length_profile_json": (
+            _prompt_json(section_profile) if section_profile else _length_profile_json(profile["length_name"])
+        ),
+        "scene_plan_json": _prompt_json(scene_plan),
+        "section_scope": section_scope or "Full video: implement every scene in the plan.",
+        "style_pack_json": _prompt_json(style_payload),
+        "memory_context": memory_context or "No relevant historical scenes.",
+        "voiceover_script_json": _prompt_json(voiceover_payload),
+        "voiceover_enabled": voiceover_enabled,
+        "candidate_index": int(candidate_index),
+        "candidate_total": int(candidate_total),
+    }
+
+    # The draft is validated against the whole video's pacing, so it only
+    # applies to full-video generation.
+    if not section_scope:
+        draft_code = await _draft_code_from_plan(payload, length, scene_plan)
+        if draft_code is not None:
+            return draft_code
 
     raw_response = await _invoke_with_resilience(
-        prompt_template,
-        {
-            "prompt": prompt,
-            "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
-            "scene_plan_json": json.dumps(scene_plan, indent=2),
-            "style_pack_json": json.dumps(style_payload, indent=2),
-            "memory_context": memory_context or "No relevant historical scenes.",
-            "voiceover_script_json": json.dumps(voiceover_payload, indent=2),
-            "voiceover_enabled": voiceover_enabled,
-            "candidate_index": int(candidate_index),
-            "candidate_total": int(candidate_total),
-        },
+        _GENERATE_CODE_PROMPT,
+        payload,
         operation="generate_code_from_plan",
+        models=_models_for_length(profile["length_name"]),
+        **_code_output_limits(profile["length_name"]),
+        on_chunk=_make_stream_progress(
+            progress_callback,
+            f"Candidate {candidate_index}/{candidate_total}",
+            chunk_callback=chunk_callback,
+            candidate_index=int(candidate_index),
+        ),
     )
 
     return sanitize_generated_code(raw_response)
@@ -976,7 +1837,7 @@ def _detect_forbidden_unicode_math(tree: ast.AST) -> List[str]:
 def _detect_forbidden_tex_macros(tree: ast.AST) -> List[str]:
     errors: List[str] = []
     for lineno, tex_literal in _iter_tex_string_literals(tree):
-        normalized_tex = re.sub(r"\\{2,}", r"\\", tex_literal)
+        normalized_tex = _REPEATED_BACKSLASH_RE.sub(r"\\", tex_literal)
         for macro, replacement in FORBIDDEN_TEX_MACROS.items():
             if macro in tex_literal or macro in normalized_tex:
                 errors.append(
@@ -1442,6 +2303,18 @@ def validate_code(code: str, length: str, scene_plan: Dict[str, Any] | None = No
     return deduped
 
 
+_REPAIR_CODE_PROMPT = _static_prompt(
+    PROMPT_ASSETS["repair_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "User prompt:\n{prompt}\n\n"
+    "Scene plan JSON:\n{scene_plan_json}\n\n"
+    "Validation errors (must all be fixed):\n{errors}\n\n"
+    "Current code:\n{bad_code}\n\n"
+    "Return corrected executable code only.",
+)
+
+
 async def repair_code(
     prompt: str,
     length: str,
@@ -1450,38 +2323,35 @@ async def repair_code(
     errors: List[str],
 ) -> str:
     profile = get_length_profile(length)
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["repair_system"]),
-            (
-                "human",
-                "User prompt:\n{prompt}\n\n"
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Scene plan JSON:\n{scene_plan_json}\n\n"
-                "Validation errors (must all be fixed):\n{errors}\n\n"
-                "Current code:\n{bad_code}\n\n"
-                "Return corrected executable code only.",
-            ),
-        ]
-    )
-
     raw_response = await _invoke_with_resilience(
-        prompt_template,
+        _REPAIR_CODE_PROMPT,
         {
             "prompt": prompt,
             "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
-            "scene_plan_json": json.dumps(scene_plan, indent=2),
+            "length_profile_json": _length_profile_json(profile["length_name"]),
+            "scene_plan_json": _prompt_json(scene_plan),
             "errors": "\n".join(f"- {item}" for item in errors),
             "bad_code": bad_code,
         },
         operation="repair_code",
+        **_code_output_limits(profile["length_name"]),
     )
 
     return sanitize_generated_code(raw_response)
 
 
+_RUNTIME_REPAIR_PROMPT = _static_prompt(
+    PROMPT_ASSETS["runtime_repair_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "User prompt:\n{prompt}\n\n"
+    "Render-time error:\n{runtime_error}\n\n"
+    "Current code:\n{bad_code}\n\n"
+    "Fix all runtime issues while keeping pacing constraints and ManimCE compatibility.\n"
+    "Return corrected executable code only.",
+)
+
+
 async def repair_code_from_runtime_error(
     prompt: str,
     length: str,
@@ -1489,32 +2359,17 @@ async def repair_code_from_runtime_error(
     runtime_error: str,
 ) -> str:
     profile = get_length_profile(length)
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["runtime_repair_system"]),
-            (
-                "human",
-                "User prompt:\n{prompt}\n\n"
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Render-time error:\n{runtime_error}\n\n"
-                "Current code:\n{bad_code}\n\n"
-                "Fix all runtime issues while keeping pacing constraints and ManimCE compatibility.\n"
-                "Return corrected executable code only.",
-            ),
-        ]
-    )
-
     raw_response = await _invoke_with_resilience(
-        prompt_template,
+        _RUNTIME_REPAIR_PROMPT,
         {
             "prompt": prompt,
             "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
+            "length_profile_json": _length_profile_json(profile["length_name"]),
             "runtime_error": runtime_error,
             "bad_code": bad_code,
         },
         operation="repair_code_from_runtime_error",
+        **_code_output_limits(profile["length_name"]),
     )
 
     repaired_code = sanitize_generated_code(raw_response)
@@ -1698,6 +2553,21 @@ def _infer_problem_scene_names(
     return selected
 
 
+_VISUAL_REPAIR_PROMPT = _static_prompt(
+    PROMPT_ASSETS["visual_repair_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "User prompt:\n{prompt}\n\n"
+    "Scene plan JSON:\n{scene_plan_json}\n\n"
+    "Visual QA report JSON:\n{quality_report_json}\n\n"
+    "Targeted scene names inferred from QA issues:\n{targeted_scene_names_json}\n\n"
+    "Current code:\n{bad_code}\n\n"
+    "Fix all visual quality issues while preserving narrative flow.\n"
+    "Prefer patching only targeted scenes; keep unaffected scenes unchanged except for shared helpers/imports.\n"
+    "Return corrected executable code only.",
+)
+
+
 async def repair_code_from_visual_issues(
     prompt: str,
     length: str,
@@ -1707,37 +2577,19 @@ async def repair_code_from_visual_issues(
 ) -> str:
     profile = get_length_profile(length)
     targeted_scene_names = _infer_problem_scene_names(scene_plan, quality_report)
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["visual_repair_system"]),
-            (
-                "human",
-                "User prompt:\n{prompt}\n\n"
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Scene plan JSON:\n{scene_plan_json}\n\n"
-                "Visual QA report JSON:\n{quality_report_json}\n\n"
-                "Targeted scene names inferred from QA issues:\n{targeted_scene_names_json}\n\n"
-                "Current code:\n{bad_code}\n\n"
-                "Fix all visual quality issues while preserving narrative flow.\n"
-                "Prefer patching only targeted scenes; keep unaffected scenes unchanged except for shared helpers/imports.\n"
-                "Return corrected executable code only.",
-            ),
-        ]
-    )
-
     raw_response = await _invoke_with_resilience(
-        prompt_template,
+        _VISUAL_REPAIR_PROMPT,
         {
             "prompt": prompt,
             "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
-            "scene_plan_json": json.dumps(scene_plan, indent=2),
-            "quality_report_json": json.dumps(_normalize_quality_report(quality_report), indent=2),
-            "targeted_scene_names_json": json.dumps(targeted_scene_names, indent=2),
+            "length_profile_json": _length_profile_json(profile["length_name"]),
+            "scene_plan_json": _prompt_json(scene_plan),
+            "quality_report_json": _prompt_json(_normalize_quality_report(quality_report)),
+            "targeted_scene_names_json": _prompt_json(targeted_scene_names),
             "bad_code": bad_code,
         },
         operation="repair_code_from_visual_issues",
+        **_code_output_limits(profile["length_name"]),
     )
 
     repaired_code = sanitize_generated_code(raw_response)
@@ -1750,35 +2602,32 @@ async def repair_code_from_visual_issues(
     return repaired_code
 
 
+_SCENE_EDITOR_PROMPT = _static_prompt(
+    PROMPT_ASSETS["scene_editor_system"],
+    "Length selection: {length_name}\n"
+    "Length profile JSON:\n{length_profile_json}\n\n"
+    "Layout edits JSON:\n{edits_json}\n\n"
+    "Current code:\n{bad_code}\n\n"
+    "Return corrected executable code only.",
+)
+
+
 async def apply_scene_editor_layout_edits(
     length: str,
     bad_code: str,
     edits: List[Dict[str, Any]],
 ) -> str:
     profile = get_length_profile(length)
-    prompt_template = ChatPromptTemplate.from_messages(
-        [
-            SystemMessage(content=PROMPT_ASSETS["scene_editor_system"]),
-            (
-                "human",
-                "Length selection: {length_name}\n"
-                "Length profile JSON:\n{length_profile_json}\n\n"
-                "Layout edits JSON:\n{edits_json}\n\n"
-                "Current code:\n{bad_code}\n\n"
-                "Return corrected executable code only.",
-            ),
-        ]
-    )
-
     raw_response = await _invoke_with_resilience(
-        prompt_template,
+        _SCENE_EDITOR_PROMPT,
         {
             "length_name": profile["length_name"],
-            "length_profile_json": json.dumps(profile, indent=2),
-            "edits_json": json.dumps(edits, indent=2),
+            "length_profile_json": _length_profile_json(profile["length_name"]),
+            "edits_json": _prompt_json(edits),
             "bad_code": bad_code,
         },
         operation="apply_scene_editor_layout_edits",
+        **_code_output_limits(profile["length_name"]),
     )
 
     repaired_code = sanitize_generated_code(raw_response)
@@ -1807,8 +2656,6 @@ def _auto_pad_wait_calls(code: str, length: str) -> str:
     any that isn't already followed by a ``self.wait``.  It stops once the
     minimum threshold is satisfied.
     """
-    import re as _re
-
     if MANIM_TIMELINE_PACING_ENABLED:
         return code
 
@@ -1831,7 +2678,7 @@ def _auto_pad_wait_calls(code: str, length: str) -> str:
     insert_positions: List[int] = []
     for i, line in enumerate(lines):
         stripped = line.strip()
-        if _re.match(r"self\.play\(", stripped):
+        if _PLAY_CALL_START_RE.match(stripped):
             # Check if next non-blank line is already a wait
             for j in range(i + 1, min(i + 3, len(lines))):
                 next_stripped = lines[j].strip()
@@ -1943,21 +2790,14 @@ def _auto_fix_bare_opacity(code: str) -> str:
     Strategy: process line-by-line; skip lines whose call context is an exempt
     method, then apply the substitution on the remainder.
     """
-    import re as _re
-
-    # Methods where `opacity=` is a legitimate keyword argument
-    _EXEMPT_METHODS = _re.compile(
-        r'\.\s*(?:set_fill|set_stroke|set_style|set_opacity)\s*\('
-    )
-
     out_lines: list[str] = []
     for line in code.split("\n"):
-        if _EXEMPT_METHODS.search(line):
+        if _OPACITY_EXEMPT_METHODS_RE.search(line):
             # This line calls an exempt method — leave it untouched
             out_lines.append(line)
         else:
             out_lines.append(
-                _re.sub(r'(?<!fill_)(?<!stroke_)\bopacity\s*=', 'fill_opacity=', line)
+                _BARE_OPACITY_KWARG_RE.sub('fill_opacity=', line)
             )
     return "\n".join(out_lines)
 
@@ -1968,8 +2808,7 @@ def _auto_fix_showcreation(code: str) -> str:
     ``ShowCreation`` was renamed to ``Create`` in ManimCE 0.16.  The LLM
     occasionally produces the old name because older tutorials still use it.
     """
-    import re as _re
-    return _re.sub(r'\bShowCreation\b', 'Create', code)
+    return _SHOWCREATION_RE.sub('Create', code)
 
 
 def _auto_fix_group_to_vgroup(code: str) -> str:
@@ -1980,13 +2819,7 @@ def _auto_fix_group_to_vgroup(code: str) -> str:
     instead of ``VGroup`` causes rendering issues.  Since virtually all
     user-generated Manim code works with VMobjects, this swap is safe.
     """
-    import re as _re
-    # Match standalone `Group(` that is NOT part of AnimationGroup, VGroup, etc.
-    return _re.sub(
-        r'(?<!Animation)(?<!V)(?<!Sub)\bGroup\s*\(',
-        'VGroup(',
-        code,
-    )
+    return _BARE_GROUP_CALL_RE.sub('VGroup(', code)
 
 
 def _auto_fix_2d_numpy_arrays(code: str) -> str:
@@ -1996,13 +2829,7 @@ def _auto_fix_2d_numpy_arrays(code: str) -> str:
     arrays they crash with broadcast shape errors.  This fix targets the
     most common pattern: ``np.array([<expr>, <expr>])`` without a third element.
     """
-    import re as _re
-    # Match np.array([...]) with exactly 2 comma-separated items (no nested brackets)
-    return _re.sub(
-        r'np\.array\(\[\s*([^,\[\]]+),\s*([^,\[\]]+)\s*\]\)',
-        r'np.array([\1, \2, 0])',
-        code,
-    )
+    return _NP_ARRAY_2D_RE.sub(r'np.array([\1, \2, 0])', code)
 
 
 def _auto_fix_voiceover_bootstrap(code: str) -> str:
@@ -2034,12 +2861,10 @@ def _auto_fix_voiceover_bootstrap(code: str) -> str:
         return code
 
     lines = code.split("\n")
-    class_line_re = re.compile(r"^(\s*class\s+GenScene\s*\([^\)]*\)\s*:)")
-    construct_re = re.compile(r"^(\s*)def\s+construct\s*\(\s*self\s*\)\s*:")
 
     class_index = -1
     for i, line in enumerate(lines):
-        if class_line_re.match(line):
+        if _GENSCENE_CLASS_LINE_RE.match(line):
             class_index = i
             break
     if class_index < 0:
@@ -2085,7 +2910,7 @@ def _auto_fix_voiceover_bootstrap(code: str) -> str:
     construct_index = -1
     construct_indent = 0
     for j in range(class_index + 1, len(lines)):
-        match = construct_re.match(lines[j])
+        match = _CONSTRUCT_DEF_RE.match(lines[j])
         if match:
             construct_index = j
             construct_indent = len(match.group(1))
@@ -2151,9 +2976,8 @@ def _neutralize_voiceover_dependency(code: str) -> str:
 
     class_idx = -1
     class_indent = 0
-    class_line_re = re.compile(r"^(\s*class\s+GenScene\s*\()([^\)]*)(\)\s*:)")
     for i, line in enumerate(lines):
-        match = class_line_re.match(line)
+        match = _GENSCENE_BASES_RE.match(line)
         if not match:
             continue
         class_idx = i
@@ -2324,6 +3148,8 @@ async def _generate_and_score_candidate(
     candidate_index: int,
     candidate_total: int,
     memory_similarity: float,
+    progress_callback: ProgressCallback = None,
+    chunk_callback: ChunkCallback = None,
 ) -> Dict[str, Any]:
     try:
         code = await generate_code_from_plan(
@@ -2335,6 +3161,8 @@ async def _generate_and_score_candidate(
             voiceover_script=voiceover_script,
             candidate_index=candidate_index,
             candidate_total=candidate_total,
+            progress_callback=progress_callback,
+            chunk_callback=chunk_callback,
         )
     except Exception as exc:
         return {
@@ -2395,6 +3223,98 @@ async def generate_manim_code(
     )
 
 
+async def generate_manim_code_batch(
+    items: List[Tuple[str, str]],
+    max_concurrency: Optional[int] = None,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """
+    Generate code for several (prompt, length) pairs concurrently.
+
+    Results keep input order. Concurrency is capped (LLM_MAX_CONCURRENCY by
+    default) so a large batch cannot trip provider rate limits; each item still
+    goes through the usual retry/fallback path. With ``return_exceptions`` a
+    failed item is returned as its exception instead of failing the batch.
+    """
+    limit = LLM_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    semaphore = asyncio.Semaphore(max(1, int(limit)))
+
+    async def _generate(prompt: str, length: str) -> str:
+        async with semaphore:
+            return await generate_manim_code(prompt, length)
+
+    return list(
+        await asyncio.gather(
+            *(_generate(prompt, length) for prompt, length in items),
+            return_exceptions=return_exceptions,
+        )
+    )
+
+
+async def generate_many(
+    prompt: str,
+    lengths: List[str],
+    max_concurrency: Optional[int] = None,
+) -> List[str]:
+    """Generate one animation per length concurrently, preserving input order."""
+    return await generate_manim_code_batch(
+        [(prompt, length) for length in lengths],
+        max_concurrency=max_concurrency,
+    )
+
+
+async def stream_manim_code(
+    prompt: str,
+    length: str,
+    style_pack_name: str | None = None,
+    voiceover_mode: str = "none",
+    voiceover_text: str = "",
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the generation pipeline and yield its events as they happen.
+
+    Yields ``{"type": "progress", "status", "message"}`` for pipeline phases,
+    ``{"type": "code_chunk", "candidate_index", "text"}`` for raw LLM output as
+    it streams, and finally ``{"type": "result", "bundle"}`` with the validated
+    metadata bundle. Raw chunks are unvalidated; only the result is renderable.
+    """
+    events: "asyncio.Queue[Any]" = asyncio.Queue()
+    finished = object()
+
+    def _on_progress(status: str, message: str) -> None:
+        events.put_nowait({"type": "progress", "status": status, "message": message})
+
+    def _on_chunk(candidate_index: int, text: str) -> None:
+        events.put_nowait({"type": "code_chunk", "candidate_index": candidate_index, "text": text})
+
+    async def _run() -> Dict[str, Any]:
+        try:
+            return await generate_manim_code_with_options(
+                prompt=prompt,
+                length=length,
+                progress_callback=_on_progress,
+                style_pack_name=style_pack_name,
+                voiceover_mode=voiceover_mode,
+                voiceover_text=voiceover_text,
+                return_metadata=True,
+                chunk_callback=_on_chunk,
+            )
+        finally:
+            events.put_nowait(finished)
+
+    task = asyncio.create_task(_run())
+    try:
+        while True:
+            event = await events.get()
+            if event is finished:
+                break
+            yield event
+        yield {"type": "result", "bundle": await task}
+    finally:
+        if not task.done():
+            task.cancel()
+
+
 async def generate_manim_code_with_options(
     prompt: str,
     length: str,
@@ -2403,7 +3323,15 @@ async def generate_manim_code_with_options(
     voiceover_mode: str = "none",
     voiceover_text: str = "",
     return_metadata: bool = False,
+    chunk_callback: ChunkCallback = None,
+    use_cache: bool = True,
 ) -> str | Dict[str, Any]:
+    """
+    Generate a bundle (code, plan, quality report, ...) for one prompt.
+
+    With ``use_cache=False`` (a user-requested regeneration) cached bundles and
+    cached LLM responses are skipped; the fresh result still refreshes them.
+    """
     requested_voiceover_mode = (voiceover_mode or "none").strip().lower() or "none"
     effective_voiceover_mode = requested_voiceover_mode
     voiceover_fallback_reason = ""
@@ -2417,11 +3345,109 @@ async def generate_manim_code_with_options(
         effective_voiceover_mode = "none"
         voiceover_text = ""
         _emit_progress(progress_callback, "voiceover_fallback", voiceover_fallback_reason)
-    voiceover_runtime_enabled = effective_voiceover_mode in {"scripted", "auto", "aligned"}
 
     _emit_progress(progress_callback, "selecting_style", "Selecting visual style pack...")
     resolved_style = resolve_style_pack(style_pack_name)
 
+    # Caller-supplied narration makes the output prompt-specific; never share it.
+    cache_scope = (
+        GENERATION_CACHE_VERSION,
+        length,
+        resolved_style.get("style_id", "classic_clean"),
+        effective_voiceover_mode,
+    )
+    cache_enabled = (
+        MANIM_GENERATION_CACHE_ENABLED
+        and LLM_TEMPERATURE <= MANIM_GENERATION_CACHE_MAX_TEMPERATURE
+        and not (voiceover_text or "").strip()
+    )
+    if cache_enabled and use_cache:
+        cached = GENERATION_CACHE.lookup(prompt, cache_scope)
+        logger.debug("Generation cache stats: %s", GENERATION_CACHE.stats)
+        if cached is None and GENERATION_SHARED_CACHE is not None:
+            shared = GENERATION_SHARED_CACHE.lookup(normalize_prompt(prompt), cache_scope)
+            if shared is not None:
+                GENERATION_CACHE.store(prompt, cache_scope, shared)
+                cached = (shared, 1.0)
+        if cached is not None:
+            cached_metadata, _similarity = cached
+            _emit_progress(progress_callback, "cache_hit", "Reusing a validated animation for a matching prompt...")
+            cached_metadata["voiceover_requested_mode"] = requested_voiceover_mode
+            cached_metadata["voiceover_fallback_reason"] = voiceover_fallback_reason
+            if return_metadata:
+                return cached_metadata
+            return str(cached_metadata["code"])
+
+    inflight_key = (normalize_prompt(prompt), cache_scope) if cache_enabled and use_cache else None
+    pending = _INFLIGHT_GENERATIONS.get(inflight_key) if inflight_key is not None else None
+    if pending is not None:
+        _emit_progress(
+            progress_callback,
+            "inflight_join",
+            "An identical animation is already being generated; waiting for it...",
+        )
+        metadata = copy.deepcopy(await asyncio.shield(pending))
+        metadata["voiceover_requested_mode"] = requested_voiceover_mode
+        metadata["voiceover_fallback_reason"] = voiceover_fallback_reason
+    else:
+        leader: asyncio.Future | None = None
+        if inflight_key is not None:
+            leader = asyncio.get_running_loop().create_future()
+            # Mark the outcome retrieved so a failure with no followers is not reported as unhandled.
+            leader.add_done_callback(lambda fut: fut.cancelled() or fut.exception())
+            _INFLIGHT_GENERATIONS[inflight_key] = leader
+        bypass_token = llm_cache_bypass.set(True) if not use_cache else None
+        try:
+            metadata = await _generate_bundle(
+                prompt=prompt,
+                length=length,
+                progress_callback=progress_callback,
+                resolved_style=resolved_style,
+                requested_voiceover_mode=requested_voiceover_mode,
+                effective_voiceover_mode=effective_voiceover_mode,
+                voiceover_fallback_reason=voiceover_fallback_reason,
+                voiceover_text=voiceover_text,
+                chunk_callback=chunk_callback,
+            )
+        except asyncio.CancelledError:
+            if leader is not None:
+                leader.cancel()
+            raise
+        except BaseException as exc:
+            if leader is not None:
+                leader.set_exception(exc)
+            raise
+        else:
+            if cache_enabled:
+                GENERATION_CACHE.store(prompt, cache_scope, metadata)
+                if GENERATION_SHARED_CACHE is not None:
+                    GENERATION_SHARED_CACHE.store(normalize_prompt(prompt), cache_scope, metadata)
+            if leader is not None:
+                leader.set_result(copy.deepcopy(metadata))
+        finally:
+            if bypass_token is not None:
+                llm_cache_bypass.reset(bypass_token)
+            if inflight_key is not None and _INFLIGHT_GENERATIONS.get(inflight_key) is leader:
+                del _INFLIGHT_GENERATIONS[inflight_key]
+
+    if return_metadata:
+        return metadata
+    return str(metadata["code"])
+
+
+async def _generate_bundle(
+    prompt: str,
+    length: str,
+    progress_callback: ProgressCallback,
+    resolved_style: Dict[str, Any],
+    requested_voiceover_mode: str,
+    effective_voiceover_mode: str,
+    voiceover_fallback_reason: str,
+    voiceover_text: str,
+    chunk_callback: ChunkCallback = None,
+) -> Dict[str, Any]:
+    voiceover_runtime_enabled = effective_voiceover_mode in {"scripted", "auto", "aligned"}
+
     memories: List[Dict[str, Any]] = []
     memory_context = "No relevant historical scenes."
     if MANIM_SCENE_MEMORY_ENABLED and MANIM_SCENE_MEMORY_TOP_K > 0:
@@ -2489,6 +3515,8 @@ async def generate_manim_code_with_options(
             candidate_index=idx + 1,
             candidate_total=candidate_total,
             memory_similarity=memory_similarity,
+            progress_callback=progress_callback,
+            chunk_callback=chunk_callback,
         )
         candidate_results.append(candidate)
 
@@ -2624,7 +3652,5 @@ async def generate_manim_code_with_options(
         "voiceover_effective_mode": effective_voiceover_mode,
         "voiceover_fallback_reason": voiceover_fallback_reason,
     }
-    if return_metadata:
-        return metadata
-    return code
+    return metadata
 
@@ -1,6 +1,6 @@
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
@@ -8,17 +8,27 @@ from typing import Any, Dict, Optional, Tuple
 from datetime import datetime
 from bson import ObjectId
 from uuid import uuid4
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
 import os
-import json
+import re
+import hashlib
 import asyncio
+import logging
+import orjson
 import uvicorn
 
 # Redis and job queue
 from .redis_utils import (
-    get_redis_connection,
-    get_queue,
+    close_shared_async_redis,
+    get_shared_async_redis,
+    get_shared_queue,
+    get_dedupe_key,
+    get_webhook_seen_key,
     get_progress_key,
-    get_result_key,
+    get_progress_channel,
     get_owner_key,
 )
 from .tasks import process_video_generation
@@ -29,9 +39,9 @@ from .auth import (
 )
 
 # Keep these for non-worker endpoints
-from .s3_service import generate_cloudfront_signed_url
-from .database import connect_to_mongo, close_mongo_connection, get_chats_collection
-from .models import ChatResponse, ChatListResponse
+from .s3_service import get_cached_signed_url
+from .database import warm_up_mongo, close_mongo_connection, get_chats_collection
+from .models import ChatResponse, ChatListResponse, VideoLength
 from .user_service import (
     check_can_generate_with_constraints,
     get_user_usage,
@@ -56,17 +66,49 @@ from .collab_service import (
 )
 
 
+def _configure_logging() -> QueueListener:
+    """
+    Route backend logs through a queue so request handlers never block on
+    stdout; a listener thread owns the actual stream handler.
+    """
+    log_queue: SimpleQueue = SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").strip().upper() or "INFO",
+        handlers=[QueueHandler(log_queue)],
+    )
+    return QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+
+log_listener = _configure_logging()
+logger = logging.getLogger(__name__)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown events."""
-    # Startup
-    await connect_to_mongo()
-    yield
-    # Shutdown
-    await close_mongo_connection()
-
-
-app = FastAPI(title="Prompt to Animate API", lifespan=lifespan)
+    log_listener.start()
+    try:
+        # Startup: warm the Mongo pool without delaying readiness.
+        warmup_task = asyncio.create_task(warm_up_mongo())
+        yield
+        # Shutdown
+        if not warmup_task.done():
+            warmup_task.cancel()
+        await close_mongo_connection()
+        await close_shared_async_redis()
+    finally:
+        # Flushes queued records, including a failed startup's error.
+        log_listener.stop()
+
+
+app = FastAPI(
+    title="Prompt to Animate API",
+    lifespan=lifespan,
+)
 
 app.add_middleware(ClerkAuthMiddleware)
 
@@ -109,10 +151,14 @@ app.mount("/videos", StaticFiles(directory="generated_animations"), name="videos
 
 
 class AnimationRequest(BaseModel):
+    # Unknown lengths are rejected with 422; handlers receive the canonical string.
+    model_config = ConfigDict(use_enum_values=True)
+
     prompt: str
-    length: str = "Medium (15s)"  # Default
+    length: VideoLength = VideoLength.MEDIUM
     resolution: str = "720p"  # 720p, 1080p, 4k
     clerk_id: Optional[str] = None  # Clerk user ID for authenticated users
+    regenerate: bool = False  # Skip cached plans, code and renders for a fresh result
 
 
 class AnimationResponse(BaseModel):
@@ -121,8 +167,10 @@ class AnimationResponse(BaseModel):
 
 
 class InteractiveExportRequest(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+
     code: str
-    length: str = "Medium (15s)"
+    length: VideoLength = VideoLength.MEDIUM
     title: str = "Interactive Export"
     scene_plan: Optional[Dict[str, Any]] = None
 
@@ -186,14 +234,168 @@ def should_emit_progress(
     return signature != last_signature, signature
 
 
+def sse_frame(payload: dict) -> bytes:
+    """Encode one Server-Sent Events data frame (orjson emits UTF-8 bytes directly)."""
+    return b"data: " + orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS) + b"\n\n"
+
+
+# SSE comment line: ignored by EventSource, but keeps idle proxies from
+# closing the connection during long renders.
+SSE_KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+
+def is_terminal_progress(progress: dict) -> bool:
+    """A job's stream ends once it reports completion or an error."""
+    return progress.get("status") == "complete" or progress.get("step") == -1
+
+
+JOB_TIMEOUT_MESSAGE = "Job timed out. Please try again."
+JOB_EXPIRED_MESSAGE = "Job is no longer available. Please try again."
+_JOB_ENDED_STATUSES = frozenset(
+    {JobStatus.FINISHED, JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED}
+)
+
+# Without a published update for this long, re-read the progress key and
+# check the RQ job, so a dropped message or a crashed worker is still noticed.
+PROGRESS_IDLE_CHECK_SECONDS = 5.0
+
+
+def submission_fingerprint(request: AnimationRequest) -> str:
+    """Short hash identifying identical submissions (not security sensitive)."""
+    material = "\x00".join((request.prompt, request.length, request.resolution, str(request.regenerate)))
+    return hashlib.blake2b(material.encode("utf-8"), digest_size=8).hexdigest()
+
+
+async def enqueue_generation_job(redis_conn, pubsub, request: AnimationRequest, clerk_id: str):
+    """
+    Enqueue a video generation job, or join an identical in-flight one.
+
+    A repeated submission (same user, prompt, length and resolution) within
+    JOB_DEDUPE_TTL_SECONDS reuses the job already queued for it instead of
+    rendering twice. ``pubsub`` is subscribed to the returned job's progress
+    channel before anything is enqueued.
+
+    Returns:
+        (job, job_id, joined_existing)
+    """
+    queue = get_shared_queue()
+    dedupe_key = get_dedupe_key(clerk_id, submission_fingerprint(request))
+    dedupe_ttl = _int_env("JOB_DEDUPE_TTL_SECONDS", 30)
+    job_id = str(uuid4())
+
+    if not await redis_conn.set(dedupe_key, job_id, nx=True, ex=dedupe_ttl):
+        existing_id = await redis_conn.get(dedupe_key)
+        if existing_id:
+            try:
+                job = await asyncio.to_thread(Job.fetch, existing_id, connection=queue.connection)
+            except NoSuchJobError:
+                job = None
+            if job is not None:
+                await pubsub.subscribe(get_progress_channel(existing_id))
+                return job, existing_id, True
+        # The recorded job is gone; take the slot over.
+        await redis_conn.set(dedupe_key, job_id, ex=dedupe_ttl)
+
+    # Subscribe before enqueueing so no progress update can be missed.
+    await pubsub.subscribe(get_progress_channel(job_id))
+
+    # Enqueue the video generation task (RQ is sync-only; keep it off the loop)
+    try:
+        job = await asyncio.to_thread(
+            queue.enqueue,
+            process_video_generation,
+            args=(
+                request.prompt,
+                request.length,
+                clerk_id,
+                job_id,
+                request.resolution,
+            ),
+            kwargs={"options": {"regenerate": True}} if request.regenerate else None,
+            job_id=job_id,
+            job_timeout=600,  # 10 minute timeout for long videos
+            # The "complete" progress update carries the result; keep it 5 minutes
+            result_ttl=_int_env("JOB_RESULT_TTL_SECONDS", 300),
+            failure_ttl=3600  # Keep failed job info for 1 hour
+        )
+    except Exception:
+        await redis_conn.delete(dedupe_key)
+        raise
+
+    job_owner_ttl = _int_env("JOB_OWNER_TTL_SECONDS", 3600, minimum=600)
+    await redis_conn.set(get_owner_key(job_id), clerk_id, ex=job_owner_ttl)
+    return job, job_id, False
+
+
+async def iter_job_progress(redis_conn, pubsub, job, job_id: str, timeout_seconds: float = 600.0):
+    """
+    Yield each distinct progress update for a job until it completes or fails.
+
+    Updates are pushed by the worker over the job's Pub/Sub channel, which
+    ``pubsub`` must already be subscribed to (subscribe before enqueueing so
+    the first update cannot be missed). Redis is only polled on idle ticks;
+    an idle tick with nothing new yields ``None`` so callers can send a
+    keep-alive.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout_seconds
+    progress_key = get_progress_key(job_id)
+    last_signature: Optional[Tuple[int, str, str]] = None
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            yield {"step": -1, "status": "error", "message": JOB_TIMEOUT_MESSAGE}
+            return
+
+        message = await pubsub.get_message(
+            ignore_subscribe_messages=True,
+            timeout=min(PROGRESS_IDLE_CHECK_SECONDS, remaining),
+        )
+        if message is not None:
+            raw = message.get("data")
+        else:
+            raw = await redis_conn.get(progress_key)
+            try:
+                await asyncio.to_thread(job.refresh)
+            except NoSuchJobError:
+                # The job record expired or was deleted; nothing more will arrive.
+                if raw:
+                    progress = orjson.loads(raw)
+                    if is_terminal_progress(progress):
+                        yield progress
+                        return
+                yield {"step": -1, "status": "error", "message": JOB_EXPIRED_MESSAGE}
+                return
+            if job.is_failed:
+                error_msg = str(job.exc_info) if job.exc_info else "Job failed unexpectedly"
+                yield {"step": -1, "status": "error", "message": error_msg}
+                return
+        if not raw:
+            if message is None:
+                yield None
+            continue
+
+        progress = orjson.loads(raw)
+        should_emit, signature = should_emit_progress(last_signature, progress)
+        if should_emit:
+            last_signature = signature
+            yield progress
+            if is_terminal_progress(progress):
+                return
+        elif message is None:
+            yield None
+
+
 @app.post("/generate", response_model=AnimationResponse)
 async def generate_animation(request: AnimationRequest, http_request: Request):
     """
     Original endpoint - kept for backward compatibility.
     Uses the job queue for consistency with the async architecture.
     """
-    print(f"Received request: {request}")
+    logger.debug("Received request: %s", request)
     
+    pubsub = None
     try:
         clerk_id = resolve_authenticated_clerk_id(http_request, request.clerk_id)
 
@@ -205,66 +407,37 @@ async def generate_animation(request: AnimationRequest, http_request: Request):
         if not usage_check["allowed"]:
             raise HTTPException(status_code=403, detail=usage_check["reason"])
 
-        # Get Redis connection and queue
-        redis_conn = get_redis_connection()
-        queue = get_queue()
+        redis_conn = get_shared_async_redis()
+        pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+        job, job_id, joined = await enqueue_generation_job(redis_conn, pubsub, request, clerk_id)
         
-        # Generate unique job ID
-        job_id = str(uuid4())
-        
-        # Enqueue the video generation task
-        job = queue.enqueue(
-            process_video_generation,
-            args=(
-                request.prompt,
-                request.length,
-                clerk_id,
-                job_id,
-                request.resolution,
-            ),
-            job_id=job_id,
-            job_timeout=600,
-            result_ttl=3600,
-            failure_ttl=3600
-        )
-
-        job_owner_ttl = _int_env("JOB_OWNER_TTL_SECONDS", 3600, minimum=600)
-        redis_conn.set(get_owner_key(job_id), clerk_id, ex=job_owner_ttl)
-        
-        print(f"📤 Enqueued job {job_id}")
-        
-        # Poll for completion (blocking for this endpoint)
-        max_wait = 600  # 10 minutes
-        poll_interval = 1
-        elapsed = 0
-        
-        while elapsed < max_wait:
-            job.refresh()
-            
-            if job.is_finished:
-                result = job.result
-                if result and result.get("status") == "complete":
-                    return AnimationResponse(
-                        video_url=result.get("video_url", ""),
-                        code=result.get("code", "")
-                    )
-                else:
-                    raise HTTPException(status_code=500, detail="Job completed but no result")
-            
-            if job.is_failed:
-                error_msg = str(job.exc_info) if job.exc_info else "Job failed"
-                raise HTTPException(status_code=500, detail=error_msg)
-            
-            await asyncio.sleep(poll_interval)
-            elapsed += poll_interval
+        logger.info("📤 %s job %s", "Joined in-flight" if joined else "Enqueued", job_id)
         
-        raise HTTPException(status_code=504, detail="Job timed out")
+        # Wait for the terminal progress update (blocking for this endpoint, 10 minutes max).
+        # The "complete" update carries the video URL and code, so the RQ job
+        # record is never polled on the happy path.
+        async for progress in iter_job_progress(redis_conn, pubsub, job, job_id, timeout_seconds=600):
+            if progress is None or not is_terminal_progress(progress):
+                continue
+            if progress.get("status") == "complete":
+                return AnimationResponse(
+                    video_url=progress.get("video_url", ""),
+                    code=progress.get("code", "")
+                )
+            if progress.get("message") == JOB_TIMEOUT_MESSAGE:
+                raise HTTPException(status_code=504, detail="Job timed out")
+            raise HTTPException(status_code=500, detail=progress.get("message") or "Job failed")
+
+        raise HTTPException(status_code=500, detail="Job completed but no result")
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if pubsub is not None:
+            await pubsub.aclose()
 
 
 @app.post("/generate-stream")
@@ -281,8 +454,7 @@ async def generate_animation_stream(request: AnimationRequest, http_request: Req
     clerk_id = resolve_authenticated_clerk_id(http_request, request.clerk_id)
     
     async def event_generator():
-        redis_conn = None
-        job = None
+        pubsub = None
         
         try:
             # Step 0: Check usage limits
@@ -292,81 +464,30 @@ async def generate_animation_stream(request: AnimationRequest, http_request: Req
                 length=request.length,
             )
             if not usage_check["allowed"]:
-                yield f"data: {json.dumps({'step': -1, 'status': 'error', 'message': usage_check['reason']})}\n\n"
+                yield sse_frame({'step': -1, 'status': 'error', 'message': usage_check['reason']})
                 return
             
-            # Get Redis connection and queue
-            redis_conn = get_redis_connection()
-            queue = get_queue()
-            
-            # Generate unique job ID
-            job_id = str(uuid4())
+            redis_conn = get_shared_async_redis()
+            pubsub = redis_conn.pubsub(ignore_subscribe_messages=True)
+            job, job_id, joined = await enqueue_generation_job(redis_conn, pubsub, request, clerk_id)
             
-            # Enqueue the video generation task
-            job = queue.enqueue(
-                process_video_generation,
-                args=(
-                    request.prompt,
-                    request.length,
-                    clerk_id,
-                    job_id,
-                    request.resolution,
-                ),
-                job_id=job_id,
-                job_timeout=600,  # 10 minute timeout for long videos
-                result_ttl=3600,  # Keep result for 1 hour
-                failure_ttl=3600  # Keep failed job info for 1 hour
+            logger.info(
+                "📤 %s job %s for user %s",
+                "Joined in-flight" if joined else "Enqueued",
+                job_id,
+                clerk_id,
             )
-
-            job_owner_ttl = _int_env("JOB_OWNER_TTL_SECONDS", 3600, minimum=600)
-            redis_conn.set(get_owner_key(job_id), clerk_id, ex=job_owner_ttl)
             
-            print(f"📤 Enqueued job {job_id} for user {clerk_id}")
-            
-            # Poll for progress updates
-            last_signature: Optional[Tuple[int, str, str]] = None
-            max_polls = 1200  # 10 minutes max (1200 * 0.5s = 600s)
-            poll_count = 0
-            
-            while poll_count < max_polls:
-                poll_count += 1
-                
-                # Check for progress update in Redis
-                progress_key = get_progress_key(job_id)
-                progress_data = redis_conn.get(progress_key)
-                
-                if progress_data:
-                    progress = json.loads(progress_data)
-                    current_step = progress.get("step", 0)
-                    current_status = progress.get("status", "")
-                    
-                    # Emit if step/status/message changed
-                    should_emit, signature = should_emit_progress(last_signature, progress)
-                    if should_emit:
-                        yield f"data: {json.dumps(progress)}\n\n"
-                        last_signature = signature
-                        
-                        # Check if job is complete or failed
-                        if current_status == "complete" or current_step == -1:
-                            break
-                
-                # Check job status directly
-                job.refresh()
-                if job.is_failed:
-                    error_msg = str(job.exc_info) if job.exc_info else "Job failed unexpectedly"
-                    yield f"data: {json.dumps({'step': -1, 'status': 'error', 'message': error_msg})}\n\n"
-                    break
-                
-                # Wait before next poll
-                await asyncio.sleep(0.5)
-            
-            # Timeout check
-            if poll_count >= max_polls:
-                yield f"data: {json.dumps({'step': -1, 'status': 'error', 'message': 'Job timed out. Please try again.'})}\n\n"
+            # Stream progress as the worker publishes it (10 minutes max)
+            async for progress in iter_job_progress(redis_conn, pubsub, job, job_id, timeout_seconds=600):
+                yield SSE_KEEPALIVE_FRAME if progress is None else sse_frame(progress)
                 
         except Exception as e:
-            print(f"❌ SSE Error: {e}")
-            yield f"data: {json.dumps({'step': -1, 'status': 'error', 'message': str(e)})}\n\n"
+            logger.error("❌ SSE Error: %s", e)
+            yield sse_frame({'step': -1, 'status': 'error', 'message': str(e)})
+        finally:
+            if pubsub is not None:
+                await pubsub.aclose()
     
     return StreamingResponse(
         event_generator(),
@@ -388,27 +509,38 @@ async def get_job_status(job_id: str, request: Request):
     Useful for polling the job status directly without SSE.
     """
     try:
-        redis_conn = get_redis_connection()
+        redis_conn = get_shared_async_redis()
 
         caller_clerk_id = resolve_authenticated_clerk_id(request, None)
-        owner_clerk_id = redis_conn.get(get_owner_key(job_id))
+        # One round trip for owner and progress; the terminal update is the final result.
+        owner_clerk_id, progress_data = await redis_conn.mget(
+            get_owner_key(job_id),
+            get_progress_key(job_id),
+        )
         if not owner_clerk_id:
             raise HTTPException(status_code=404, detail="Job not found")
         if owner_clerk_id != caller_clerk_id:
             raise HTTPException(status_code=403, detail="Forbidden: job does not belong to user")
         
         # Check for progress
-        progress_data = redis_conn.get(get_progress_key(job_id))
         if progress_data:
-            return json.loads(progress_data)
-        
-        # Check for final result
-        result_data = redis_conn.get(get_result_key(job_id))
-        if result_data:
-            return json.loads(result_data)
-        
-        return {"step": 0, "status": "pending", "message": "Job is queued or not found"}
+            return orjson.loads(progress_data)
+
+        # No snapshot yet means queued; once the job has finished, it means the
+        # terminal snapshot (kept JOB_RESULT_TTL_SECONDS) has already expired.
+        queue = get_shared_queue()
+        try:
+            job = await asyncio.to_thread(Job.fetch, job_id, connection=queue.connection)
+            job_status = await asyncio.to_thread(job.get_status)
+        except NoSuchJobError:
+            job_status = None
+        if job_status is None or job_status in _JOB_ENDED_STATUSES:
+            raise HTTPException(status_code=410, detail=JOB_EXPIRED_MESSAGE)
+
+        return {"step": 0, "status": "pending", "message": "Job is queued"}
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -421,25 +553,29 @@ async def health_check():
     Health check endpoint for container orchestration.
     Returns the status of Redis and MongoDB connections.
     """
-    health = {"status": "healthy", "services": {}}
-    
-    # Check Redis
-    try:
-        redis_conn = get_redis_connection()
-        redis_conn.ping()
-        health["services"]["redis"] = "connected"
-    except Exception as e:
-        health["services"]["redis"] = f"error: {str(e)}"
-        health["status"] = "degraded"
-    
-    # Check MongoDB
-    try:
-        from .database import get_database
-        db = await get_database()
-        await db.command("ping")
-        health["services"]["mongodb"] = "connected"
-    except Exception as e:
-        health["services"]["mongodb"] = f"error: {str(e)}"
+    async def check_redis() -> str:
+        try:
+            await get_shared_async_redis().ping()
+            return "connected"
+        except Exception as e:
+            return f"error: {str(e)}"
+
+    async def check_mongo() -> str:
+        try:
+            from .database import get_database
+            db = await get_database()
+            await db.command("ping")
+            return "connected"
+        except Exception as e:
+            return f"error: {str(e)}"
+
+    # Independent round-trips; run them concurrently.
+    redis_status, mongo_status = await asyncio.gather(check_redis(), check_mongo())
+    health = {
+        "status": "healthy",
+        "services": {"redis": redis_status, "mongodb": mongo_status},
+    }
+    if redis_status != "connected" or mongo_status != "connected":
         health["status"] = "degraded"
     
     return health
@@ -447,42 +583,98 @@ async def health_check():
 
 # ============== Chat History Endpoints ==============
 
+# 24-hex ObjectId; checked up front so malformed ids are a 400, not a 500.
+_OID_RE = re.compile(r"[0-9a-fA-F]{24}")
+
+# Only the fields ChatResponse needs; skips large scene plans and reports.
+CHAT_RESPONSE_PROJECTION = {
+    "prompt": 1,
+    "length": 1,
+    "video_url": 1,
+    "s3_key": 1,
+    "code": 1,
+    "created_at": 1,
+}
+
+
+def _chat_video_url(chat: dict) -> str:
+    """Fresh signed URL when the chat has an s3_key, else the stored URL."""
+    video_url = chat.get("video_url", "")
+    if chat.get("s3_key"):
+        try:
+            video_url = get_cached_signed_url(chat["s3_key"])
+        except Exception:
+            pass  # Keep existing URL if regeneration fails
+    return video_url
+
+
+def _chat_response_line(chat: dict, video_url: str) -> bytes:
+    """One chat as an NDJSON line."""
+    return orjson.dumps({
+        "id": str(chat["_id"]),
+        "prompt": chat.get("prompt", ""),
+        "length": chat.get("length", "Medium (15s)"),
+        "video_url": video_url,
+        "code": chat.get("code", ""),
+        "created_at": chat.get("created_at", datetime.utcnow()).isoformat(),
+    }) + b"\n"
+
+
 @app.get("/chats/{clerk_id}", response_model=ChatListResponse)
-async def get_user_chats(clerk_id: str, request: Request):
+async def get_user_chats(clerk_id: str, request: Request, stream: bool = False):
     """
     Get all chats for a specific user by their Clerk ID.
     Returns chats sorted by creation date (newest first).
+
+    With ``?stream=1`` the chats are sent as NDJSON (one chat per line) as
+    they come off the cursor, so large histories are never held in memory.
     """
     try:
         ensure_clerk_path_access(request, clerk_id)
         chats_collection = await get_chats_collection()
-        cursor = chats_collection.find({"clerk_id": clerk_id}).sort("created_at", -1)
-        chats = await cursor.to_list(length=100)  # Limit to 100 chats
+        cursor = (
+            chats_collection.find({"clerk_id": clerk_id}, projection=CHAT_RESPONSE_PROJECTION)
+            .sort("created_at", -1)
+            .limit(100)  # Limit to 100 chats
+            .batch_size(100)  # One round-trip for the whole page
+        )
+        if stream:
+            async def ndjson_lines():
+                async for chat in cursor:
+                    video_url = await asyncio.to_thread(_chat_video_url, chat)
+                    yield _chat_response_line(chat, video_url)
+
+            return StreamingResponse(
+                ndjson_lines(),
+                media_type="application/x-ndjson",
+                headers={"X-Accel-Buffering": "no"},
+            )
+
+        chats = [chat async for chat in cursor]
+
+        # RSA signing is CPU-bound; sign off the event loop, concurrently.
+        video_urls = await asyncio.gather(
+            *(asyncio.to_thread(_chat_video_url, chat) for chat in chats)
+        )
         
-        # Transform to response format
-        chat_responses = []
-        for chat in chats:
-            # Regenerate signed URL if s3_key exists
-            video_url = chat.get("video_url", "")
-            if chat.get("s3_key"):
-                try:
-                    video_url = generate_cloudfront_signed_url(chat["s3_key"])
-                except Exception:
-                    pass  # Keep existing URL if regeneration fails
-            
-            chat_responses.append(ChatResponse(
+        # Transform to response format. Fields come from our own documents,
+        # so skip per-field validation; FastAPI serializes the model directly.
+        chat_responses = [
+            ChatResponse.model_construct(
                 id=str(chat["_id"]),
                 prompt=chat.get("prompt", ""),
                 length=chat.get("length", "Medium (15s)"),
                 video_url=video_url,
                 code=chat.get("code", ""),
                 created_at=chat.get("created_at", datetime.utcnow()).isoformat()
-            ))
+            )
+            for chat, video_url in zip(chats, video_urls)
+        ]
         
-        return ChatListResponse(chats=chat_responses, total=len(chat_responses))
+        return ChatListResponse.model_construct(chats=chat_responses, total=len(chat_responses))
     
     except Exception as e:
-        print(f"Error fetching chats: {e}")
+        logger.error("Error fetching chats: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -493,24 +685,22 @@ async def get_chat_detail(clerk_id: str, chat_id: str, request: Request):
     """
     try:
         ensure_clerk_path_access(request, clerk_id)
+        if not _OID_RE.fullmatch(chat_id):
+            raise HTTPException(status_code=400, detail="Invalid chat id")
         chats_collection = await get_chats_collection()
-        chat = await chats_collection.find_one({
-            "_id": ObjectId(chat_id),
-            "clerk_id": clerk_id
-        })
+        chat = await chats_collection.find_one(
+            {"_id": ObjectId(chat_id), "clerk_id": clerk_id},
+            projection=CHAT_RESPONSE_PROJECTION,
+        )
         
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
         
         # Regenerate signed URL
-        video_url = chat.get("video_url", "")
-        if chat.get("s3_key"):
-            try:
-                video_url = generate_cloudfront_signed_url(chat["s3_key"])
-            except Exception:
-                pass
+        video_url = await asyncio.to_thread(_chat_video_url, chat)
         
-        return ChatResponse(
+        # Trusted stored fields: skip validation.
+        return ChatResponse.model_construct(
             id=str(chat["_id"]),
             prompt=chat.get("prompt", ""),
             length=chat.get("length", "Medium (15s)"),
@@ -522,7 +712,7 @@ async def get_chat_detail(clerk_id: str, chat_id: str, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching chat: {e}")
+        logger.error("Error fetching chat: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -534,6 +724,8 @@ async def delete_chat(clerk_id: str, chat_id: str, request: Request):
     """
     try:
         ensure_clerk_path_access(request, clerk_id)
+        if not _OID_RE.fullmatch(chat_id):
+            raise HTTPException(status_code=400, detail="Invalid chat id")
         chats_collection = await get_chats_collection()
         result = await chats_collection.delete_one({
             "_id": ObjectId(chat_id),
@@ -548,7 +740,7 @@ async def delete_chat(clerk_id: str, chat_id: str, request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting chat: {e}")
+        logger.error("Error deleting chat: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -562,7 +754,7 @@ async def get_usage(clerk_id: str, request: Request):
         usage = await get_user_usage(clerk_id)
         return usage
     except Exception as e:
-        print(f"Error getting usage: {e}")
+        logger.error("Error getting usage: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -571,6 +763,38 @@ class WebhookPayload(BaseModel):
     event_type: str
     clerk_id: str
     product_id: Optional[str] = None
+    event_id: Optional[str] = None  # Provider payment/subscription id, for idempotency
+
+
+# Payment providers may redeliver an event for days.
+WEBHOOK_DEDUPE_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _payment_webhook_message(payload: WebhookPayload) -> str:
+    if payload.event_type == "payment_succeeded":
+        if payload.product_id and "basic" in payload.product_id.lower():
+            return "Added 5 Basic credits"
+    elif payload.event_type == "subscription_active":
+        return "Pro subscription activated"
+    elif payload.event_type == "subscription_cancelled":
+        return "Pro subscription cancelled"
+    return "Webhook processed"
+
+
+async def _apply_payment_event(payload: WebhookPayload) -> None:
+    """Apply a payment webhook's credit or subscription change."""
+    if payload.event_type == "payment_succeeded":
+        # Basic pack - add 5 credits
+        if payload.product_id and "basic" in payload.product_id.lower():
+            await add_basic_credits(payload.clerk_id, credits=5)
+    
+    elif payload.event_type == "subscription_active":
+        # Pro subscription activated
+        await set_pro_subscription(payload.clerk_id, active=True)
+    
+    elif payload.event_type == "subscription_cancelled":
+        # Pro subscription cancelled
+        await set_pro_subscription(payload.clerk_id, active=False)
 
 
 @app.post("/webhook/payment")
@@ -578,31 +802,41 @@ async def payment_webhook(payload: WebhookPayload):
     """
     Handle payment webhook from frontend.
     Called when Dodo Payments webhook is received.
+
+    The change is applied before responding: a 2xx means it is stored, and a
+    failure returns 500 so the provider redelivers the event. Events carrying
+    an ``event_id`` are applied at most once.
     """
+    logger.info("🔔 Payment webhook: %s for %s", payload.event_type, payload.clerk_id)
+
+    seen_key = None
+    if payload.event_id:
+        seen_key = get_webhook_seen_key(payload.event_type, payload.event_id)
+        try:
+            first_delivery = await get_shared_async_redis().set(
+                seen_key, payload.clerk_id, nx=True, ex=WEBHOOK_DEDUPE_TTL_SECONDS
+            )
+        except Exception as e:
+            # Fail open: applying twice is better than dropping a payment.
+            logger.warning("Webhook idempotency check unavailable: %s", e)
+            seen_key, first_delivery = None, True
+        if not first_delivery:
+            return {"success": True, "message": "Duplicate webhook ignored"}
+
     try:
-        print(f"🔔 Payment webhook: {payload.event_type} for {payload.clerk_id}")
-        
-        if payload.event_type == "payment_succeeded":
-            # Basic pack - add 5 credits
-            if payload.product_id and "basic" in payload.product_id.lower():
-                await add_basic_credits(payload.clerk_id, credits=5)
-                return {"success": True, "message": "Added 5 Basic credits"}
-        
-        elif payload.event_type == "subscription_active":
-            # Pro subscription activated
-            await set_pro_subscription(payload.clerk_id, active=True)
-            return {"success": True, "message": "Pro subscription activated"}
-        
-        elif payload.event_type == "subscription_cancelled":
-            # Pro subscription cancelled
-            await set_pro_subscription(payload.clerk_id, active=False)
-            return {"success": True, "message": "Pro subscription cancelled"}
-        
-        return {"success": True, "message": "Webhook processed"}
-    
+        await _apply_payment_event(payload)
     except Exception as e:
-        print(f"Error processing payment webhook: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error processing payment webhook: %s", e)
+        # Release the idempotency key so the provider's redelivery, triggered
+        # by the 500 below, applies the event.
+        if seen_key:
+            try:
+                await get_shared_async_redis().delete(seen_key)
+            except Exception as redis_error:
+                logger.warning("Could not release webhook key %s: %s", seen_key, redis_error)
+        raise HTTPException(status_code=500, detail="Failed to apply payment event")
+
+    return {"success": True, "message": _payment_webhook_message(payload)}
 
 
 # ============== Advanced Feature Endpoints ==============
@@ -783,4 +1017,15 @@ async def get_variant_diff(clerk_id: str, chat_id: str, variant_id: str, request
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Local development only; production runs Gunicorn (backend/gunicorn_conf.py).
+    # uvloop + httptools ship with uvicorn[standard]; pin them explicitly so a
+    # missing extra fails loudly instead of silently falling back to asyncio/h11.
+    config = uvicorn.Config(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+    )
+    uvicorn.Server(config).run()
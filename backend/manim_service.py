@@ -6,6 +6,7 @@ import subprocess
 import sys
 import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
@@ -19,6 +20,18 @@ QUALITY_FLAGS = {
     "4k": "-qk",     # 4K @ 60fps (production quality)
 }
 
+# Folder Manim writes each quality preset to (videos/<script>/<folder>/<Scene>.mp4)
+QUALITY_OUTPUT_DIRS = {
+    "-ql": "480p15",
+    "-qm": "720p30",
+    "-qh": "1080p60",
+    "-qk": "2160p60",
+}
+
+# Filesystem cleanup (partial movies, frame caches) runs here so it overlaps the
+# S3 upload instead of delaying it.
+_CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="manim-cleanup")
+
 QA_SCENE_CLASS = "GenSceneVisualQA"
 QA_QUALITY_FLAG = "-ql"
 RENDER_TIMEOUT_SECONDS = 180
@@ -154,9 +167,19 @@ def _run_manim(
     )
 
 
-def _find_scene_outputs(output_root: Path, script_name: str) -> Tuple[Path, list[Path]]:
+def _find_scene_outputs(
+    output_root: Path,
+    script_name: str,
+    quality_flag: str | None = None,
+) -> Tuple[Path, list[Path]]:
     scene_folder_name = script_name.replace(".py", "")
     search_path = output_root / "videos" / scene_folder_name
+    # Known preset: check the one path Manim writes to before scanning the tree.
+    quality_dir = QUALITY_OUTPUT_DIRS.get(quality_flag or "")
+    if quality_dir:
+        expected = search_path / quality_dir / "GenScene.mp4"
+        if expected.is_file():
+            return search_path, [expected]
     found_videos = list(search_path.rglob("GenScene.mp4"))
     if not found_videos:
         found_videos = list(search_path.rglob("*.mp4"))
@@ -285,7 +308,7 @@ def execute_manim_code(
     except FileNotFoundError:
         raise Exception("Manim command not found. Please ensure manim is installed and in your PATH.")
 
-    search_path, found_videos = _find_scene_outputs(output_root, filename)
+    search_path, found_videos = _find_scene_outputs(output_root, filename, quality_flag)
 
     if result.returncode != 0:
         _cleanup_script_and_scene(filepath, search_path)
@@ -300,8 +323,15 @@ def execute_manim_code(
     final_path = output_root / final_filename
     shutil.move(str(expected_path), str(final_path))
 
-    _cleanup_script_and_scene(filepath, search_path)
+    cleanup = _CLEANUP_EXECUTOR.submit(_cleanup_script_and_scene, filepath, search_path)
+    try:
+        return _publish_render(final_path, final_filename, upload_to_s3)
+    finally:
+        cleanup.result()
+
 
+def _publish_render(final_path: Path, final_filename: str, upload_to_s3: bool) -> tuple[str, str]:
+    """Upload the final mp4 when requested; return (s3_key, local filename)."""
     s3_key = None
     if upload_to_s3:
         try:
@@ -4,28 +4,38 @@ Pydantic Models for MongoDB Documents
 Defines data schemas for chat history and related entities.
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, PlainSerializer, PlainValidator, WithJsonSchema
+from typing import Annotated, Optional
 from datetime import datetime
+from enum import Enum
 from bson import ObjectId
 
 
-class PyObjectId(ObjectId):
-    """Custom ObjectId type for Pydantic compatibility."""
-    
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-    
-    @classmethod
-    def validate(cls, v, handler=None):
-        if not ObjectId.is_valid(v):
-            raise ValueError("Invalid ObjectId")
+class VideoLength(str, Enum):
+    """Supported video lengths, in entitlement order (shortest first)."""
+
+    MEDIUM = "Medium (15s)"
+    LONG = "Long (1m)"
+    DEEP_DIVE = "Deep Dive (2m)"
+    EXTENDED = "Extended (5m)"
+
+
+def _to_object_id(v) -> ObjectId:
+    # ObjectIds straight from Mongo are returned as-is, without re-parsing.
+    if isinstance(v, ObjectId):
+        return v
+    if isinstance(v, (str, bytes)) and ObjectId.is_valid(v):
         return ObjectId(v)
-    
-    @classmethod
-    def __get_pydantic_json_schema__(cls, core_schema, handler):
-        return {"type": "string"}
+    raise ValueError("Invalid ObjectId")
+
+
+# ObjectId field type for Pydantic v2: validated in one call, serialized to str in JSON.
+PyObjectId = Annotated[
+    ObjectId,
+    PlainValidator(_to_object_id),
+    PlainSerializer(str, return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string"}),
+]
 
 
 class ChatCreate(BaseModel):
@@ -40,6 +50,9 @@ class ChatCreate(BaseModel):
 
 class ChatInDB(BaseModel):
     """Schema for chat stored in MongoDB."""
+    # datetime serializes to ISO 8601 natively; no per-field Python encoders.
+    model_config = ConfigDict(populate_by_name=True)
+
     id: str = Field(alias="_id")
     clerk_id: str
     prompt: str
@@ -48,13 +61,6 @@ class ChatInDB(BaseModel):
     s3_key: str
     code: str
     created_at: datetime
-    
-    class Config:
-        populate_by_name = True
-        json_encoders = {
-            ObjectId: str,
-            datetime: lambda dt: dt.isoformat()
-        }
 
 
 class ChatResponse(BaseModel):
@@ -66,8 +72,7 @@ class ChatResponse(BaseModel):
     code: str
     created_at: str  # ISO format string
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ChatListResponse(BaseModel):
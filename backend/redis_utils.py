@@ -12,11 +12,9 @@ while our progress tracking uses string connections (decode_responses=True).
 
 import os
 from typing import Optional
-from redis import Redis
+from redis import BlockingConnectionPool, ConnectionPool, Redis, SSLConnection
+from redis.asyncio import Redis as AsyncRedis
 from rq import Queue
-from dotenv import load_dotenv
-
-load_dotenv()
 
 
 def _get_redis_params():
@@ -33,19 +31,60 @@ def _get_redis_params():
     }
 
 
+def _build_pool(decode_responses: bool, pool_cls=ConnectionPool, **pool_kwargs) -> ConnectionPool:
+    """Create a connection pool from the environment's Redis settings."""
+    params = _get_redis_params()
+    if "url" in params:
+        return pool_cls.from_url(params["url"], decode_responses=decode_responses, **pool_kwargs)
+    if params["ssl"]:
+        pool_kwargs["connection_class"] = SSLConnection
+    return pool_cls(
+        host=params["host"],
+        port=params["port"],
+        password=params["password"],
+        decode_responses=decode_responses,
+        **pool_kwargs,
+    )
+
+
+# Process-wide pools, keyed by decode_responses. Redis() objects are cheap;
+# the pool (and its open sockets) is what gets reused. redis-py resets a pool
+# after fork, so RQ's forked job processes open their own connections.
+_pools: dict[bool, ConnectionPool] = {}
+
+
+def _get_pool(decode_responses: bool) -> ConnectionPool:
+    pool = _pools.get(decode_responses)
+    if pool is None:
+        pool = _pools[decode_responses] = _build_pool(decode_responses)
+    return pool
+
+
 def get_redis_connection() -> Redis:
     """
     Get a Redis connection WITH decode_responses=True for string operations.
     Use this for reading/writing progress updates (JSON strings).
     
     Returns:
-        Redis connection instance with string decoding
+        Redis connection instance with string decoding (shared pool)
+    """
+    return Redis(connection_pool=_get_pool(True))
+
+
+def get_async_redis_connection() -> AsyncRedis:
+    """
+    Get an asyncio Redis connection WITH decode_responses=True.
+    Use this inside request handlers (e.g. progress Pub/Sub subscriptions)
+    so waiting on Redis never blocks the event loop.
+
+    Returns:
+        redis.asyncio connection instance with string decoding
     """
     params = _get_redis_params()
     if "url" in params:
-        return Redis.from_url(params["url"], decode_responses=True)
-    
-    return Redis(
+        return AsyncRedis.from_url(params["url"], decode_responses=True)
+
+    return AsyncRedis(
         host=params["host"],
         port=params["port"],
         password=params["password"],
@@ -54,25 +93,59 @@ def get_redis_connection() -> Redis:
     )
 
 
+# Upper bound for the shared sync pool; callers wait for a free connection
+# instead of opening unbounded sockets under load.
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+
+_shared_redis: Optional[Redis] = None
+_shared_async_redis: Optional[AsyncRedis] = None
+_shared_queues: dict[str, Queue] = {}
+
+
+def get_shared_redis() -> Redis:
+    """
+    Process-wide sync Redis client (decode_responses=True) for API request paths.
+
+    Backed by a bounded BlockingConnectionPool so per-request helpers (rate
+    limiting, etc.) reuse connections instead of reconnecting each time.
+    """
+    global _shared_redis
+    if _shared_redis is None:
+        pool = _build_pool(True, BlockingConnectionPool, max_connections=REDIS_MAX_CONNECTIONS)
+        _shared_redis = Redis(connection_pool=pool)
+    return _shared_redis
+
+
+def get_shared_async_redis() -> AsyncRedis:
+    """
+    Process-wide asyncio Redis client for API handlers.
+
+    Handlers share its connection pool instead of opening a new connection
+    per request. Must only be used from the API's event loop.
+    """
+    global _shared_async_redis
+    if _shared_async_redis is None:
+        _shared_async_redis = get_async_redis_connection()
+    return _shared_async_redis
+
+
+async def close_shared_async_redis() -> None:
+    """Close the shared asyncio client (call on application shutdown)."""
+    global _shared_async_redis
+    if _shared_async_redis is not None:
+        client, _shared_async_redis = _shared_async_redis, None
+        await client.aclose()
+
+
 def get_raw_redis_connection() -> Redis:
     """
     Get a Redis connection WITHOUT decode_responses for binary data.
     Use this for RQ (Redis Queue) which stores pickled Python objects.
     
     Returns:
-        Redis connection instance without decoding (binary mode)
+        Redis connection instance without decoding (binary mode, shared pool)
     """
-    params = _get_redis_params()
-    if "url" in params:
-        return Redis.from_url(params["url"], decode_responses=False)
-    
-    return Redis(
-        host=params["host"],
-        port=params["port"],
-        password=params["password"],
-        ssl=params["ssl"],
-        decode_responses=False
-    )
+    return Redis(connection_pool=_get_pool(False))
 
 
 def get_queue(name: str = "default") -> Queue:
@@ -93,18 +166,41 @@ def get_queue(name: str = "default") -> Queue:
     return Queue(name, connection=redis_conn)
 
 
+def get_shared_queue(name: str = "default") -> Queue:
+    """
+    Get a process-wide RQ Queue for enqueueing from API handlers.
+
+    Reuses one raw connection pool (redis-py pools are thread-safe, so the
+    queue can be used from ``asyncio.to_thread``).
+    """
+    queue = _shared_queues.get(name)
+    if queue is None:
+        queue = _shared_queues[name] = get_queue(name)
+    return queue
+
+
 # Progress key helpers
 def get_progress_key(job_id: str) -> str:
     """Get the Redis key for job progress."""
     return f"job:{job_id}:progress"
 
 
-def get_result_key(job_id: str) -> str:
-    """Get the Redis key for job result."""
-    return f"job:{job_id}:result"
+def get_progress_channel(job_id: str) -> str:
+    """Get the Pub/Sub channel that progress updates are published on."""
+    return f"job:{job_id}:progress:events"
 
 
 def get_owner_key(job_id: str) -> str:
     """Get the Redis key storing owner clerk_id for a job."""
     return f"job:{job_id}:owner"
 
+
+def get_webhook_seen_key(event_type: str, event_id: str) -> str:
+    """Get the Redis key marking a payment webhook event as already applied."""
+    return f"webhook_seen:{event_type}:{event_id}"
+
+
+def get_dedupe_key(clerk_id: str, fingerprint: str) -> str:
+    """Get the Redis key mapping a user's recent submission to its job_id."""
+    return f"job:recent:{clerk_id}:{fingerprint}"
+
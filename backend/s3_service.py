@@ -2,18 +2,20 @@
 AWS S3 and CloudFront service for video storage and signed URL generation.
 """
 import os
+import threading
+import time
+from functools import lru_cache
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config as BotoConfig
 from botocore.exceptions import ClientError
-from datetime import datetime, timedelta
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.backends import default_backend
 import base64
+import orjson
 from pathlib import Path
-from dotenv import load_dotenv
-
-load_dotenv()
 
 # AWS Configuration
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -25,13 +27,33 @@ S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 CLOUDFRONT_DOMAIN = os.getenv("CLOUDFRONT_DOMAIN")
 CLOUDFRONT_KEY_PAIR_ID = os.getenv("CLOUDFRONT_KEY_PAIR_ID")
 CLOUDFRONT_PRIVATE_KEY_PATH = os.getenv("CLOUDFRONT_PRIVATE_KEY_PATH", "./private_key.pem")
+CLOUDFRONT_URL_PREFIX = f"https://{CLOUDFRONT_DOMAIN}/"
+
+# Signed URLs are reused within a time bucket; keep it far below the URL expiry
+# so a cached URL always has most of its lifetime left.
+SIGNED_URL_CACHE_TTL_SECONDS = int(os.getenv("SIGNED_URL_CACHE_TTL_SECONDS", "300"))
+SIGNED_URL_CACHE_MAX_SIZE = int(os.getenv("SIGNED_URL_CACHE_MAX_SIZE", "10000"))
 
-# Initialize S3 client
+# Initialize S3 client. The pool must cover the multipart upload threads below;
+# botocore's default of 10 connections would make them queue.
 s3_client = boto3.client(
     "s3",
     aws_access_key_id=AWS_ACCESS_KEY_ID,
     aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
+    region_name=AWS_REGION,
+    config=BotoConfig(
+        max_pool_connections=50,
+        retries={"max_attempts": 3, "mode": "adaptive"},
+        tcp_keepalive=True,
+    ),
+)
+
+# Rendered mp4s are often tens of MB: upload them as parallel 8 MB parts.
+VIDEO_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
 )
 
 
@@ -59,7 +81,8 @@ def upload_video_to_s3(local_path: str, s3_key: str = None) -> str:
             s3_key,
             ExtraArgs={
                 "ContentType": "video/mp4",
-            }
+            },
+            Config=VIDEO_TRANSFER_CONFIG,
         )
         print(f"Uploaded {local_path} to s3://{S3_BUCKET_NAME}/{s3_key}")
         return s3_key
@@ -67,9 +90,15 @@ def upload_video_to_s3(local_path: str, s3_key: str = None) -> str:
         raise Exception(f"Failed to upload video to S3: {e}")
 
 
-def _rsa_sign(message: bytes, private_key_path: str) -> bytes:
+# CloudFront signed URLs always use RSA PKCS#1 v1.5 with SHA-1.
+_SIGNATURE_PADDING = padding.PKCS1v15()
+_SIGNATURE_HASH = hashes.SHA1()
+
+
+@lru_cache(maxsize=4)
+def _load_private_key(private_key_path: str):
     """
-    Sign a message using RSA private key for CloudFront signed URLs.
+    Load and parse the CloudFront RSA private key (cached per path).
     
     Supports two methods:
     1. CLOUDFRONT_PRIVATE_KEY_BASE64 env var (for cloud deployment)
@@ -103,46 +132,30 @@ def _rsa_sign(message: bytes, private_key_path: str) -> bytes:
                 backend=default_backend()
             )
     
-    signature = private_key.sign(
-        message,
-        padding.PKCS1v15(),
-        hashes.SHA1()  # CloudFront requires SHA1 for signed URLs
-    )
-    
-    return signature
+    return private_key
 
 
-def _create_cloudfront_policy(resource_url: str, expiry_time: datetime) -> str:
+def _rsa_sign(message: bytes, private_key_path: str) -> bytes:
     """
-    Create a CloudFront policy JSON string.
+    Sign a message using RSA private key for CloudFront signed URLs.
     """
-    # Convert to epoch timestamp
-    expiry_epoch = int(expiry_time.timestamp())
-    
-    policy = {
-        "Statement": [
-            {
-                "Resource": resource_url,
-                "Condition": {
-                    "DateLessThan": {
-                        "AWS:EpochTime": expiry_epoch
-                    }
-                }
-            }
-        ]
-    }
-    
-    import json
-    return json.dumps(policy, separators=(",", ":"))
+    return _load_private_key(private_key_path).sign(message, _SIGNATURE_PADDING, _SIGNATURE_HASH)
+
+
+# Canned-policy JSON, filled per URL (cheaper than building and dumping a dict).
+_CLOUDFRONT_POLICY_TEMPLATE = (
+    '{"Statement":[{"Resource":%s,"Condition":{"DateLessThan":{"AWS:EpochTime":%d}}}]}'
+)
+
+# CloudFront's URL-safe base64 alphabet: "+" -> "-", "=" -> "_", "/" -> "~".
+_CLOUDFRONT_B64_TABLE = bytes.maketrans(b"+=/", b"-_~")
 
 
 def _safe_base64_encode(data: bytes) -> str:
     """
     Create URL-safe base64 encoding for CloudFront.
     """
-    encoded = base64.b64encode(data).decode("utf-8")
-    # Replace characters that are not URL-safe
-    return encoded.replace("+", "-").replace("=", "_").replace("/", "~")
+    return base64.b64encode(data).translate(_CLOUDFRONT_B64_TABLE).decode("ascii")
 
 
 def generate_cloudfront_signed_url(s3_key: str, expiration_minutes: int = 1440) -> str:
@@ -160,14 +173,15 @@ def generate_cloudfront_signed_url(s3_key: str, expiration_minutes: int = 1440)
         raise Exception("CloudFront configuration missing. Check CLOUDFRONT_DOMAIN and CLOUDFRONT_KEY_PAIR_ID in .env")
     
     # Build the resource URL
-    resource_url = f"https://{CLOUDFRONT_DOMAIN}/{s3_key}"
+    resource_url = CLOUDFRONT_URL_PREFIX + s3_key
     
     # Calculate expiry time
-    expiry_time = datetime.utcnow() + timedelta(minutes=expiration_minutes)
+    expiry_epoch = int(time.time()) + expiration_minutes * 60
     
     # Create policy
-    policy = _create_cloudfront_policy(resource_url, expiry_time)
-    policy_bytes = policy.encode("utf-8")
+    policy_bytes = (
+        _CLOUDFRONT_POLICY_TEMPLATE % (orjson.dumps(resource_url).decode("utf-8"), expiry_epoch)
+    ).encode("utf-8")
     
     # Sign the policy
     signature = _rsa_sign(policy_bytes, CLOUDFRONT_PRIVATE_KEY_PATH)
@@ -187,6 +201,35 @@ def generate_cloudfront_signed_url(s3_key: str, expiration_minutes: int = 1440)
     return signed_url
 
 
+_signed_url_cache: dict[tuple[str, int], str] = {}
+_signed_url_cache_lock = threading.Lock()
+_signed_url_cache_bucket = -1
+
+
+def get_cached_signed_url(s3_key: str) -> str:
+    """
+    Return a CloudFront signed URL for s3_key, reused within the current time bucket.
+    
+    Avoids one RSA signature per chat per request when the same history is
+    listed repeatedly. Entries from older buckets are dropped on rollover.
+    """
+    global _signed_url_cache_bucket
+    bucket = int(time.time() // SIGNED_URL_CACHE_TTL_SECONDS)
+    cache_key = (s3_key, bucket)
+    with _signed_url_cache_lock:
+        cached = _signed_url_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    signed_url = generate_cloudfront_signed_url(s3_key)
+    with _signed_url_cache_lock:
+        if bucket != _signed_url_cache_bucket or len(_signed_url_cache) >= SIGNED_URL_CACHE_MAX_SIZE:
+            _signed_url_cache.clear()
+            _signed_url_cache_bucket = bucket
+        _signed_url_cache[cache_key] = signed_url
+    return signed_url
+
+
 def delete_video_from_s3(s3_key: str) -> bool:
     """
     Delete a video file from S3 bucket.
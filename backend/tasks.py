@@ -6,17 +6,61 @@ asynchronously in an RQ worker. Progress is reported via Redis for
 real-time SSE streaming to the frontend.
 """
 
-import json
 import asyncio
+import logging
 import os
-from datetime import datetime
 from typing import Any, Dict, Optional
+
+import orjson
 from redis import Redis
 
-from .redis_utils import get_redis_connection, get_progress_key, get_result_key
+from .export_service import build_interactive_manifest, build_manim_slides_outline
+from .llm_cache import RedisBundleCache
+from .llm_service import (
+    StreamingCodeCleaner,
+    generate_manim_code_with_options,
+    repair_code_from_runtime_error,
+    warm_up_llm_connection,
+)
+from .manim_service import execute_manim_code
+from .redis_utils import get_redis_connection, get_progress_channel, get_progress_key
+from .s3_service import get_cached_signed_url
+from .scene_memory import store_scene_memory
+from .user_service import evaluate_generation_entitlements, increment_usage, load_user_for_generation, utc_now
+
+logger = logging.getLogger(__name__)
+
+# In-flight progress snapshots outlive the longest job; once a job finishes,
+# the terminal snapshot only needs to serve late joiners and status polls.
+PROGRESS_TTL_SECONDS = 3600
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", "300"))
 
+# Include a preview of the code being streamed from the LLM in progress updates.
+STREAM_PARTIAL_CODE = os.getenv("STREAM_PARTIAL_CODE", "true").strip().lower() not in {"0", "false", "no", "off"}
+
+# Rendered videos keyed by (final code, resolution). A repeated prompt that hits
+# the generation cache yields identical code, so the Manim render is skipped too.
+RENDER_CACHE_ENABLED = os.getenv("MANIM_RENDER_CACHE_ENABLED", "true").strip().lower() not in {"0", "false", "no", "off"}
+RENDER_CACHE = (
+    RedisBundleCache(
+        get_redis_connection,
+        ttl_seconds=int(os.getenv("MANIM_RENDER_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+        namespace="render_cache",
+    )
+    if RENDER_CACHE_ENABLED
+    else None
+)
 
-def report_progress(redis_conn: Redis, job_id: str, step: int, status: str, message: str, **extra):
+
+def report_progress(
+    redis_conn: Redis,
+    job_id: str,
+    step: int,
+    status: str,
+    message: str,
+    ttl: int = PROGRESS_TTL_SECONDS,
+    **extra,
+):
     """
     Report job progress to Redis for SSE streaming.
     
@@ -26,6 +70,7 @@ def report_progress(redis_conn: Redis, job_id: str, step: int, status: str, mess
         step: Progress step number (1-6, or -1 for error)
         status: Status string (analyzing, generating, rendering, etc.)
         message: Human-readable message
+        ttl: Seconds to keep the snapshot key
         **extra: Additional data (video_url, code, chat_id, etc.)
     """
     progress_data = {
@@ -34,11 +79,13 @@ def report_progress(redis_conn: Redis, job_id: str, step: int, status: str, mess
         "message": message,
         **extra
     }
-    redis_conn.set(
-        get_progress_key(job_id),
-        json.dumps(progress_data),
-        ex=3600  # Expire after 1 hour
-    )
+    payload = orjson.dumps(progress_data, option=orjson.OPT_NON_STR_KEYS)
+    # The key holds the latest state for late subscribers and status polling;
+    # the publish pushes the update to live SSE streams. One round trip for both.
+    pipe = redis_conn.pipeline(transaction=False)
+    pipe.set(get_progress_key(job_id), payload, ex=ttl)
+    pipe.publish(get_progress_channel(job_id), payload)
+    pipe.execute()
 
 
 # Persistent event loop for the entire worker process.  Motor's
@@ -79,25 +126,28 @@ def process_video_generation(
         clerk_id: Clerk user ID
         job_id: Unique job identifier for progress tracking
         resolution: Video resolution (720p, 1080p, 4k)
+        options: Optional settings (style_pack, voiceover_mode, export_mode,
+            regenerate to bypass cached results)
     
     Returns:
-        dict with video_url, code, chat_id on success
-        or error information on failure
+        dict with video_url and chat_id on success; the full result
+        (code, plan, quality report, ...) is in the "complete" progress update
     """
     redis_conn = get_redis_connection()
     
     try:
         # Re-check entitlements in worker to avoid running expensive jobs
         # that were queued earlier but are no longer allowed.
-        from .user_service import check_can_generate_with_constraints
-
-        usage_check = _run_async(
-            check_can_generate_with_constraints(
-                clerk_id=clerk_id,
-                resolution=resolution,
-                length=length,
+        async def _load_user_and_warm_up():
+            # The LLM connection handshake overlaps the user lookup.
+            user, _ = await asyncio.gather(
+                load_user_for_generation(clerk_id),
+                warm_up_llm_connection(),
             )
-        )
+            return user
+
+        user = _run_async(_load_user_and_warm_up())
+        usage_check = evaluate_generation_entitlements(user, resolution=resolution, length=length)
         if not usage_check.get("allowed", False):
             denial = str(usage_check.get("reason", "Generation not allowed"))
             report_progress(redis_conn, job_id, -1, "error", denial)
@@ -114,11 +164,20 @@ def process_video_generation(
         voiceover_mode = str(opts.get("voiceover_mode", "none"))
         voiceover_text = str(opts.get("voiceover_text", ""))
         export_mode = str(opts.get("export_mode", "video")).strip().lower()
+        # A regeneration skips every cache layer: bundles, LLM responses, renders.
+        use_cache = not bool(opts.get("regenerate", False))
 
-        from .llm_service import (
-            generate_manim_code_with_options,
-            repair_code_from_runtime_error,
-        )
+        # Streamed code per candidate, cleaned as it arrives; the latest one is
+        # attached to the (already throttled) "streaming_code" updates as a live preview.
+        partial_code: Dict[int, StreamingCodeCleaner] = {}
+        latest_candidate = {"index": 0}
+
+        def llm_code_chunk(candidate_index: int, text: str) -> None:
+            cleaner = partial_code.get(candidate_index)
+            if cleaner is None:
+                cleaner = partial_code[candidate_index] = StreamingCodeCleaner()
+            cleaner.feed(text)
+            latest_candidate["index"] = candidate_index
 
         def llm_progress(status: str, message: str) -> None:
             step_map = {
@@ -134,9 +193,15 @@ def process_video_generation(
                 "candidate_generating": 3,
                 "candidate_scoring": 4,
                 "voiceover_fallback": 2,
+                "cache_hit": 3,
+                "streaming_code": 3,
+                "inflight_join": 3,
             }
             step = step_map.get(status, 4)
-            report_progress(redis_conn, job_id, step, status, message)
+            extra: Dict[str, Any] = {}
+            if status == "streaming_code" and STREAM_PARTIAL_CODE and latest_candidate["index"]:
+                extra["partial_code"] = partial_code[latest_candidate["index"]].text
+            report_progress(redis_conn, job_id, step, status, message, **extra)
 
         generation_bundle = _run_async(
             generate_manim_code_with_options(
@@ -147,6 +212,8 @@ def process_video_generation(
                 voiceover_mode=voiceover_mode,
                 voiceover_text=voiceover_text,
                 return_metadata=True,
+                chunk_callback=llm_code_chunk if STREAM_PARTIAL_CODE else None,
+                use_cache=use_cache,
             )
         )
         code = str(generation_bundle.get("code", ""))
@@ -158,7 +225,6 @@ def process_video_generation(
         voiceover_effective_mode = str(generation_bundle.get("voiceover_effective_mode", voiceover_requested_mode))
         voiceover_fallback_reason = str(generation_bundle.get("voiceover_fallback_reason", "") or "")
         
-        from .manim_service import execute_manim_code
         max_render_repairs_raw = os.environ.get("MANIM_RENDER_REPAIR_ATTEMPTS", "2")
         try:
             max_render_repairs = max(0, int(max_render_repairs_raw))
@@ -180,12 +246,23 @@ def process_video_generation(
                 f"Rendering at {resolution}{attempt_label}...",
             )
 
+            cached_render = (
+                RENDER_CACHE.lookup(code, [resolution]) if RENDER_CACHE is not None and use_cache else None
+            )
+            if cached_render and cached_render.get("s3_key"):
+                report_progress(redis_conn, job_id, 5, "rendering", "Reusing a previous render of this animation...")
+                s3_key, local_filename = str(cached_render["s3_key"]), ""
+                break
+
             try:
                 s3_key, local_filename = execute_manim_code(
                     code,
                     resolution=resolution,
                     length=length,
                 )
+                # Only S3 renders are shareable; local files are per-container.
+                if s3_key and RENDER_CACHE is not None:
+                    RENDER_CACHE.store(code, [resolution], {"s3_key": s3_key})
                 break
             except Exception as render_error:
                 render_error_text = str(render_error)
@@ -219,22 +296,17 @@ def process_video_generation(
         report_progress(redis_conn, job_id, 5, "finalizing", "Uploading to cloud storage...")
         
         # Generate signed URL
-        from .s3_service import generate_cloudfront_signed_url
         if s3_key:
-            video_url = generate_cloudfront_signed_url(s3_key)
+            video_url = get_cached_signed_url(s3_key)
         else:
             # Fallback - this shouldn't happen in production
             video_url = f"http://localhost:8000/videos/{local_filename}"
             s3_key = ""
         
-        # Save to MongoDB
-        chat_id = None
         interactive_manifest = None
         interactive_outline = None
         if export_mode in {"interactive", "slides", "manim-slides"}:
             try:
-                from .export_service import build_interactive_manifest, build_manim_slides_outline
-
                 interactive_manifest = build_interactive_manifest(
                     code=code,
                     title=scene_plan.get("title", "Interactive Export")
@@ -245,7 +317,7 @@ def process_video_generation(
                 )
                 interactive_outline = build_manim_slides_outline(interactive_manifest)
             except Exception as export_error:
-                print(f"Warning: failed to build interactive export metadata: {export_error}")
+                logger.warning("Failed to build interactive export metadata: %s", export_error)
 
         generation_metadata = {
             "scene_plan": scene_plan,
@@ -259,8 +331,15 @@ def process_video_generation(
             "interactive_manifest": interactive_manifest,
             "interactive_outline": interactive_outline,
         }
-        try:
-            chat_id = _run_async(
+
+        # Charge usage and save the chat concurrently; both finish before
+        # "complete" so the published chat_id always names a stored document
+        # (the client keeps it as the history id). A failed save is logged and
+        # the video is still delivered without a chat_id; a failed charge
+        # still fails the job.
+        async def _persist_generation():
+            return await asyncio.gather(
+                increment_usage(clerk_id, resolution=resolution),
                 _save_chat_to_mongo(
                     clerk_id=clerk_id,
                     prompt=prompt,
@@ -269,26 +348,47 @@ def process_video_generation(
                     s3_key=s3_key,
                     code=code,
                     metadata=generation_metadata,
-                )
+                ),
+                return_exceptions=True,
             )
-        except Exception as db_error:
-            print(f"⚠️ Failed to save chat to MongoDB: {db_error}")
-        
-        # Increment usage with resolution-based cost
-        from .user_service import increment_usage
-        _run_async(increment_usage(clerk_id, resolution=resolution))
 
-        # Store successful generations for retrieval-augmented scene memory.
-        try:
-            from .scene_memory import store_scene_memory
+        usage_outcome, chat_outcome = _run_async(_persist_generation())
+        if isinstance(chat_outcome, Exception):
+            chat_id = None
+            logger.warning("⚠️ Failed to save chat to MongoDB: %s", chat_outcome)
+        else:
+            chat_id = chat_outcome
+        if isinstance(usage_outcome, Exception):
+            raise usage_outcome
+        chat_extra = {"chat_id": chat_id} if chat_id else {}
+
+        # Step 6: Complete. The snapshot key keeps this payload (code included)
+        # for late joiners and status polls, so it is the only copy in Redis.
+        report_progress(redis_conn, job_id, 6, "complete", "Video ready!",
+                      ttl=JOB_RESULT_TTL_SECONDS,
+                      video_url=video_url, code=code,
+                      scene_plan=scene_plan,
+                      style_pack=resolved_style_pack,
+                      quality_report=quality_report,
+                      voiceover_script=voiceover_script,
+                      voiceover_requested_mode=voiceover_requested_mode,
+                      voiceover_effective_mode=voiceover_effective_mode,
+                      voiceover_fallback_reason=voiceover_fallback_reason,
+                      export_mode=export_mode,
+                      interactive_manifest=interactive_manifest,
+                      interactive_outline=interactive_outline,
+                      **chat_extra)
 
-            quality_score = 0.0
-            if isinstance(quality_report, dict):
-                try:
-                    quality_score = float(quality_report.get("score", 0.0))
-                except (TypeError, ValueError):
-                    quality_score = 0.0
+        # Scene memory (for retrieval-augmented generation) trails the
+        # "complete" update; a failure is logged and never fails the job.
+        quality_score = 0.0
+        if isinstance(quality_report, dict):
+            try:
+                quality_score = float(quality_report.get("score", 0.0))
+            except (TypeError, ValueError):
+                quality_score = 0.0
 
+        try:
             _run_async(
                 store_scene_memory(
                     prompt=prompt,
@@ -306,65 +406,16 @@ def process_video_generation(
                 )
             )
         except Exception as memory_error:
-            print(f"Warning: failed to persist scene memory: {memory_error}")
-        
-        # Step 6: Complete
-        result = {
-            "step": 6,
-            "status": "complete",
-            "message": "Video ready!",
-            "video_url": video_url,
-            "code": code,
-            "chat_id": chat_id,
-            "scene_plan": scene_plan,
-            "style_pack": resolved_style_pack,
-            "quality_report": quality_report,
-            "voiceover_script": voiceover_script,
-            "voiceover_requested_mode": voiceover_requested_mode,
-            "voiceover_effective_mode": voiceover_effective_mode,
-            "voiceover_fallback_reason": voiceover_fallback_reason,
-            "export_mode": export_mode,
-            "interactive_manifest": interactive_manifest,
-            "interactive_outline": interactive_outline,
-        }
-        report_progress(redis_conn, job_id, 6, "complete", "Video ready!",
-                      video_url=video_url, code=code, chat_id=chat_id,
-                      scene_plan=scene_plan,
-                      style_pack=resolved_style_pack,
-                      quality_report=quality_report,
-                      voiceover_script=voiceover_script,
-                      voiceover_requested_mode=voiceover_requested_mode,
-                      voiceover_effective_mode=voiceover_effective_mode,
-                      voiceover_fallback_reason=voiceover_fallback_reason,
-                      export_mode=export_mode,
-                      interactive_manifest=interactive_manifest,
-                      interactive_outline=interactive_outline)
-        
-        # Also store the final result separately
-        redis_conn.set(
-            get_result_key(job_id),
-            json.dumps(result),
-            ex=3600
-        )
-        
-        return result
+            logger.warning("Failed to persist scene memory: %s", memory_error)
+
+        # RQ stores the return value with the job; keep it to the identifiers.
+        return {"video_url": video_url, "chat_id": chat_id}
             
     except Exception as e:
         error_msg = str(e)
-        print(f"❌ Job {job_id} failed: {error_msg}")
-        
-        error_result = {
-            "step": -1,
-            "status": "error",
-            "message": error_msg
-        }
-        report_progress(redis_conn, job_id, -1, "error", error_msg)
+        logger.error("❌ Job %s failed: %s", job_id, error_msg)
         
-        redis_conn.set(
-            get_result_key(job_id),
-            json.dumps(error_result),
-            ex=3600
-        )
+        report_progress(redis_conn, job_id, -1, "error", error_msg, ttl=JOB_RESULT_TTL_SECONDS)
         
         # Re-raise to mark job as failed in RQ
         raise
@@ -396,9 +447,9 @@ async def _save_chat_to_mongo(
         "s3_key": s3_key or "",
         "code": code,
         "metadata": metadata or {},
-        "created_at": datetime.utcnow()
+        "created_at": utc_now()
     }
     result = await chats_collection.insert_one(chat_doc)
     chat_id = str(result.inserted_id)
-    print(f"✅ Chat saved to MongoDB: {chat_id}")
+    logger.info("✅ Chat saved to MongoDB: %s", chat_id)
     return chat_id
@@ -1,8 +1,21 @@
 import asyncio
+import json
+
+import pytest
 
 from backend import llm_service
 
 
+@pytest.fixture(autouse=True)
+def _clear_generation_cache(monkeypatch):
+    monkeypatch.setattr(llm_service, "GENERATION_SHARED_CACHE", None)
+    llm_service.GENERATION_CACHE.clear()
+    llm_service._CIRCUIT_STATE.clear()
+    yield
+    llm_service.GENERATION_CACHE.clear()
+    llm_service._CIRCUIT_STATE.clear()
+
+
 VALID_MEDIUM_CODE = """from manim import *
 
 class GenScene(Scene):
@@ -57,6 +70,14 @@ class GenScene(Scene):
     assert cleaned.startswith("from manim import *")
 
 
+def test_sanitize_generated_code_handles_glued_closing_fence_and_clean_input():
+    fenced = "```python\nfrom manim import *\n\nclass GenScene(Scene):\n    def construct(self):\n        self.wait(1)```"
+    clean = "from manim import *\n\nclass GenScene(Scene):\n    def construct(self):\n        self.wait(1)"
+
+    assert llm_service.sanitize_generated_code(fenced) == clean
+    assert llm_service.sanitize_generated_code(clean) == clean
+
+
 def test_validate_code_detects_required_structure_errors():
     code = """class NotGenScene:
     pass
@@ -352,7 +373,7 @@ def test_invoke_with_resilience_does_not_retry_non_transient_error(monkeypatch):
 
 
 def test_repair_code_from_runtime_error_returns_valid_code(monkeypatch):
-    async def fake_invoke(prompt_template, payload, operation):
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
         return VALID_MEDIUM_CODE
 
     monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
@@ -370,7 +391,7 @@ def test_repair_code_from_runtime_error_returns_valid_code(monkeypatch):
 
 
 def test_repair_code_from_runtime_error_rejects_invalid_code(monkeypatch):
-    async def fake_invoke(prompt_template, payload, operation):
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
         return "class Broken: pass"
 
     monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
@@ -456,7 +477,7 @@ def test_infer_problem_scene_names_maps_issue_frames_to_scene_windows():
 
 
 def test_apply_scene_editor_layout_edits_returns_valid_code(monkeypatch):
-    async def fake_invoke(prompt_template, payload, operation):
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
         return VALID_MEDIUM_CODE
 
     monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
@@ -628,3 +649,796 @@ def test_generate_manim_code_voiceover_fallback_when_plugin_missing(monkeypatch)
     assert result["voiceover_effective_mode"] == "none"
     assert "manim-voiceover is not installed" in result["voiceover_fallback_reason"]
     assert captured_modes and captured_modes[0] == "none"
+
+
+def test_generate_manim_code_reuses_cached_result_for_reworded_prompt(monkeypatch):
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service.GENERATION_CACHE, "near_match", True)
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    first = asyncio.run(llm_service.generate_manim_code("Animate bubble sort", "Medium (15s)"))
+
+    status_log = []
+    second = asyncio.run(
+        llm_service.generate_manim_code(
+            "bubble sorts animation",
+            "Medium (15s)",
+            progress_callback=lambda status, message: status_log.append(status),
+        )
+    )
+    other_length = asyncio.run(llm_service.generate_manim_code("Animate bubble sort", "Short (5s)"))
+
+    assert second == first
+    assert "cache_hit" in status_log
+    assert other_length
+    assert calls["compose"] == 2
+
+
+def test_generate_manim_code_exact_cache_hit_skips_similarity_scan(monkeypatch):
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+    monkeypatch.setattr(llm_service.GENERATION_CACHE, "similarity_threshold", 2.0)
+
+    asyncio.run(llm_service.generate_manim_code("Explain circles", "Medium (15s)"))
+    asyncio.run(llm_service.generate_manim_code("  explain   CIRCLES ", "Medium (15s)"))
+    asyncio.run(llm_service.generate_manim_code("Explain circles!", "Medium (15s)"))
+
+    assert calls["compose"] == 2
+
+
+def test_generate_manim_code_reuses_bundle_from_shared_cache_after_fork(monkeypatch):
+    from backend.llm_cache import RedisBundleCache
+
+    class FakeRedis:
+        def __init__(self):
+            self.store = {}
+
+        def get(self, key):
+            return self.store.get(key)
+
+        def set(self, key, value, ex=None):
+            self.store[key] = value
+
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    fake = FakeRedis()
+    monkeypatch.setattr(llm_service, "GENERATION_SHARED_CACHE", RedisBundleCache(lambda: fake))
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    first = asyncio.run(llm_service.generate_manim_code("Explain circles", "Medium (15s)"))
+    # A new job process starts with an empty in-process cache.
+    llm_service.GENERATION_CACHE.clear()
+    second = asyncio.run(llm_service.generate_manim_code("explain  circles", "Medium (15s)"))
+
+    assert second == first
+    assert calls["compose"] == 1
+    assert len(fake.store) == 1
+
+
+def test_get_chain_reuses_runnable_per_template_and_model(monkeypatch):
+    class FakePrompt:
+        def __init__(self):
+            self.compositions = 0
+
+        def __or__(self, llm):
+            self.compositions += 1
+            return self
+
+    fake_llm = object()
+    monkeypatch.setattr(llm_service, "_get_llm_client", lambda provider, model_name: fake_llm)
+    prompt = FakePrompt()
+
+    first = llm_service._get_chain(prompt, "cerebras", "primary-model")
+    compositions_after_first = prompt.compositions
+    second = llm_service._get_chain(prompt, "cerebras", "primary-model")
+
+    assert first is second
+    assert prompt.compositions == compositions_after_first
+
+
+def test_generate_code_from_plan_streams_chunks_as_progress(monkeypatch):
+    class FakeStreamingChain:
+        async def astream(self, payload):
+            for chunk in ["```python\n", VALID_MEDIUM_CODE[:40], VALID_MEDIUM_CODE[40:], "\n```"]:
+                yield chunk
+
+        async def ainvoke(self, payload):
+            raise AssertionError("ainvoke should not be used when streaming")
+
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("cerebras", "primary-model")])
+    monkeypatch.setattr(llm_service, "STREAM_PROGRESS_INTERVAL_SECONDS", 0.0)
+    monkeypatch.setattr(
+        llm_service, "_get_chain", lambda prompt_template, provider, model_name, **kwargs: FakeStreamingChain()
+    )
+
+    status_log = []
+    result = asyncio.run(
+        llm_service.generate_code_from_plan(
+            prompt="Explain circles",
+            length="Medium (15s)",
+            scene_plan=VALID_SCENE_PLAN,
+            progress_callback=lambda status, message: status_log.append((status, message)),
+        )
+    )
+
+    assert result.startswith("from manim import *")
+    streamed = [message for status, message in status_log if status == "streaming_code"]
+    assert len(streamed) == 4
+    assert "characters" in streamed[-1]
+
+
+def test_generate_many_runs_lengths_concurrently(monkeypatch):
+    state = {"active": 0, "peak": 0}
+
+    async def fake_generate_manim_code(prompt: str, length: str, progress_callback=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return f"code for {length}"
+
+    monkeypatch.setattr(llm_service, "generate_manim_code", fake_generate_manim_code)
+
+    result = asyncio.run(
+        llm_service.generate_many("Explain circles", ["Short (5s)", "Medium (15s)", "Long (1m)"], max_concurrency=2)
+    )
+
+    assert result == ["code for Short (5s)", "code for Medium (15s)", "code for Long (1m)"]
+    assert state["peak"] == 2
+
+
+def test_every_video_length_has_a_length_profile():
+    from backend.models import VideoLength
+
+    profiles = llm_service.PROMPT_ASSETS["length_profiles"]["profiles"]
+    assert {item.value for item in VideoLength} == set(profiles)
+
+
+def test_generate_manim_code_coalesces_identical_inflight_requests(monkeypatch):
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        await asyncio.sleep(0.01)
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    status_log = []
+
+    async def run_both():
+        return await asyncio.gather(
+            llm_service.generate_manim_code("Explain circles", "Medium (15s)"),
+            llm_service.generate_manim_code(
+                "Explain circles",
+                "Medium (15s)",
+                progress_callback=lambda status, message: status_log.append(status),
+            ),
+        )
+
+    first, second = asyncio.run(run_both())
+
+    assert first == second
+    assert calls["compose"] == 1
+    assert "inflight_join" in status_log
+    assert llm_service._INFLIGHT_GENERATIONS == {}
+
+
+def test_generate_manim_code_skips_cache_above_temperature_ceiling(monkeypatch):
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "LLM_TEMPERATURE", 0.9)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    asyncio.run(llm_service.generate_manim_code("Explain circles", "Medium (15s)"))
+    asyncio.run(llm_service.generate_manim_code("Explain circles", "Medium (15s)"))
+
+    assert calls["compose"] == 2
+
+
+def test_generation_cache_uses_embedder_for_paraphrases():
+    from backend.generation_cache import GenerationCache
+
+    vectors = {
+        "pythagoras theorem": [1.0, 0.0, 0.1],
+        "the pythagorean theorem": [0.99, 0.0, 0.12],
+        "sine waves": [0.0, 1.0, 0.0],
+    }
+    cache = GenerationCache(embedder=lambda text: vectors[text], embedding_threshold=0.95, near_match=True)
+    cache.store("pythagoras theorem", "scope", {"code": "cached"})
+
+    hit = cache.lookup("the pythagorean theorem", "scope")
+    assert hit is not None and hit[0]["code"] == "cached"
+    assert cache.lookup("sine waves", "scope") is None
+    assert cache.lookup("the pythagorean theorem", "other-scope") is None
+    assert cache.lookup("pythagoras theorem", "scope") is not None
+    assert cache.stats == {"exact_hits": 1, "near_hits": 1, "misses": 2}
+
+
+def test_generate_manim_code_regeneration_skips_cached_result(monkeypatch):
+    calls = {"compose": 0}
+
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        calls["compose"] += 1
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    asyncio.run(llm_service.generate_manim_code_with_options("Explain circles", "Medium (15s)"))
+    asyncio.run(llm_service.generate_manim_code_with_options("Explain circles", "Medium (15s)", use_cache=False))
+    asyncio.run(llm_service.generate_manim_code_with_options("Explain circles", "Medium (15s)"))
+
+    assert calls["compose"] == 2
+    assert not llm_service.llm_cache_bypass.get()
+
+
+def test_generation_cache_is_exact_only_by_default():
+    from backend.generation_cache import GenerationCache
+
+    cache = GenerationCache()
+    cache.store("Animate bubble sort", "scope", {"code": "cached"})
+
+    assert cache.lookup("animate  bubble sort", "scope") is not None
+    assert cache.lookup("a bubble sort animation", "scope") is None
+    assert cache.stats == {"exact_hits": 1, "near_hits": 0, "misses": 1}
+
+
+def test_generation_cache_near_match_requires_same_numbers_and_order():
+    from backend.generation_cache import GenerationCache
+
+    cache = GenerationCache(near_match=True)
+    cache.store("derivative of sin x is cos x", "scope", {"code": "sin"})
+    cache.store("binary search finding 7", "scope", {"code": "seven"})
+    cache.store("gradient descent with learning rate 0.1", "scope", {"code": "lr"})
+
+    assert cache.lookup("derivative of cos x is sin x", "scope") is None
+    assert cache.lookup("binary search finding 11", "scope") is None
+    assert cache.lookup("gradient descent with learning rate 0.5", "scope") is None
+    hit = cache.lookup("show binary search finding 7", "scope")
+    assert hit is not None and hit[0]["code"] == "seven"
+
+
+def test_stream_manim_code_yields_chunks_then_result(monkeypatch):
+    async def fake_compose_scene_plan(prompt: str, length: str, **kwargs):
+        return VALID_SCENE_PLAN
+
+    async def fake_generate_code_from_plan(prompt: str, length: str, scene_plan, **kwargs):
+        kwargs["chunk_callback"](1, VALID_MEDIUM_CODE[:40])
+        kwargs["chunk_callback"](1, VALID_MEDIUM_CODE[40:])
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_MULTI_CANDIDATE_ENABLED", False)
+    monkeypatch.setattr(llm_service, "compose_scene_plan", fake_compose_scene_plan)
+    monkeypatch.setattr(llm_service, "generate_code_from_plan", fake_generate_code_from_plan)
+
+    async def collect():
+        return [event async for event in llm_service.stream_manim_code("Explain circles", "Medium (15s)")]
+
+    events = asyncio.run(collect())
+
+    chunks = [event["text"] for event in events if event["type"] == "code_chunk"]
+    assert "".join(chunks) == VALID_MEDIUM_CODE
+    assert any(event["type"] == "progress" for event in events)
+    assert events[-1]["type"] == "result"
+    assert events[-1]["bundle"]["code"].startswith("from manim import *")
+
+
+def test_generate_manim_code_batch_preserves_order_and_caps_concurrency(monkeypatch):
+    state = {"active": 0, "peak": 0}
+
+    async def fake_generate_manim_code(prompt: str, length: str, progress_callback=None):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        return f"{prompt}|{length}"
+
+    monkeypatch.setattr(llm_service, "LLM_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(llm_service, "generate_manim_code", fake_generate_manim_code)
+
+    items = [("circles", "Medium (15s)"), ("squares", "Long (1m)"), ("lines", "Medium (15s)")]
+    result = asyncio.run(llm_service.generate_manim_code_batch(items))
+
+    assert result == ["circles|Medium (15s)", "squares|Long (1m)", "lines|Medium (15s)"]
+    assert state["peak"] == 2
+
+
+def test_generate_manim_code_batch_can_return_per_item_errors(monkeypatch):
+    async def fake_generate_manim_code(prompt: str, length: str, progress_callback=None):
+        if prompt == "bad":
+            raise RuntimeError("provider down")
+        return prompt
+
+    monkeypatch.setattr(llm_service, "generate_manim_code", fake_generate_manim_code)
+    items = [("good", "Medium (15s)"), ("bad", "Medium (15s)")]
+
+    result = asyncio.run(llm_service.generate_manim_code_batch(items, return_exceptions=True))
+
+    assert result[0] == "good"
+    assert isinstance(result[1], RuntimeError)
+    with pytest.raises(RuntimeError):
+        asyncio.run(llm_service.generate_manim_code_batch(items))
+
+
+def test_llm_clients_share_one_http_pool(monkeypatch):
+    monkeypatch.setattr(llm_service, "groq_api_key", "test-groq-key")
+    monkeypatch.setattr(llm_service, "cerebras_api_key", "test-cerebras-key")
+    llm_service._get_llm_client.cache_clear()
+    try:
+        groq_client = llm_service._get_llm_client("groq", "groq-model")
+        cerebras_client = llm_service._get_llm_client("cerebras", "cerebras-model")
+        _, async_pool = llm_service._get_http_clients()
+
+        assert groq_client.http_async_client is async_pool
+        assert cerebras_client.http_async_client is async_pool
+        # Retries are owned by _invoke_with_resilience, not the provider SDKs.
+        assert groq_client.max_retries == 0
+        assert cerebras_client.max_retries == 0
+    finally:
+        asyncio.run(llm_service.close_http_clients())
+
+    assert llm_service._get_http_clients.cache_info().currsize == 0
+
+
+def test_generate_code_from_plan_uses_valid_draft(monkeypatch):
+    calls = []
+
+    async def fake_invoke(prompt_template, payload, operation, on_chunk=None, models=None, **kwargs):
+        calls.append(models)
+        return VALID_MEDIUM_CODE if models else "print('main model')"
+
+    monkeypatch.setattr(llm_service, "MANIM_DRAFT_MODEL_ENABLED", True)
+    monkeypatch.setattr(llm_service, "groq_api_key", "test-groq-key")
+    monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
+
+    result = asyncio.run(
+        llm_service.generate_code_from_plan("Explain circles", "Medium (15s)", VALID_SCENE_PLAN)
+    )
+
+    assert result.startswith("from manim import *")
+    assert calls == [[("groq", llm_service.MANIM_DRAFT_MODEL)]]
+
+
+def test_generate_code_from_plan_falls_back_when_draft_invalid(monkeypatch):
+    calls = []
+
+    async def fake_invoke(prompt_template, payload, operation, on_chunk=None, models=None, **kwargs):
+        calls.append(models)
+        return "print('draft')" if models else VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "MANIM_DRAFT_MODEL_ENABLED", True)
+    monkeypatch.setattr(llm_service, "groq_api_key", "test-groq-key")
+    monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
+
+    result = asyncio.run(
+        llm_service.generate_code_from_plan("Explain circles", "Medium (15s)", VALID_SCENE_PLAN)
+    )
+
+    assert result.startswith("from manim import *")
+    assert calls == [[("groq", llm_service.MANIM_DRAFT_MODEL)], None]
+
+
+def test_invoke_with_resilience_skips_model_with_open_circuit(monkeypatch):
+    class FakeLLM:
+        def __init__(self, fail: bool):
+            self.fail = fail
+            self.calls = 0
+
+    class FakePipe:
+        def __init__(self, llm):
+            self.llm = llm
+
+        def __or__(self, _parser):
+            return self
+
+        async def ainvoke(self, payload):
+            self.llm.calls += 1
+            if self.llm.fail:
+                raise RuntimeError("service unavailable")
+            return "ok"
+
+    class FakePrompt:
+        def __or__(self, llm):
+            return FakePipe(llm)
+
+    clients = {"flaky-model": FakeLLM(fail=True), "healthy-model": FakeLLM(fail=False)}
+
+    monkeypatch.setattr(
+        llm_service,
+        "MODEL_CANDIDATES",
+        [("groq", "flaky-model"), ("cerebras", "healthy-model")],
+    )
+    monkeypatch.setattr(llm_service, "LLM_RETRY_ATTEMPTS", 3)
+    monkeypatch.setattr(llm_service, "LLM_CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(llm_service, "LLM_CIRCUIT_RESET_SECONDS", 60.0)
+    monkeypatch.setattr(llm_service, "_get_llm_client", lambda provider, model_name: clients[model_name])
+    monkeypatch.setattr(llm_service, "_compute_retry_delay_seconds", lambda attempt: 0.0)
+    prompt = FakePrompt()
+
+    first = asyncio.run(llm_service._invoke_with_resilience(prompt, {}, operation="test"))
+    second = asyncio.run(llm_service._invoke_with_resilience(prompt, {}, operation="test"))
+
+    assert first == second == "ok"
+    assert clients["flaky-model"].calls == 2
+    assert clients["healthy-model"].calls == 2
+
+
+def test_retry_after_header_sets_retry_delay(monkeypatch):
+    class FakeResponse:
+        headers = {"retry-after": "3"}
+
+    class FakeRateLimit(Exception):
+        response = FakeResponse()
+
+    monkeypatch.setattr(llm_service, "LLM_RETRY_MAX_SECONDS", 12.0)
+    assert llm_service._retry_after_seconds(FakeRateLimit()) == 3.0
+    assert llm_service._retry_after_seconds(RuntimeError("boom")) is None
+
+
+def test_compose_scene_plan_requests_json_mode(monkeypatch):
+    import json
+
+    seen = {}
+
+    class FakeChain:
+        async def ainvoke(self, payload):
+            return json.dumps(VALID_SCENE_PLAN)
+
+    def fake_get_chain(prompt_template, provider, model_name, json_mode=False, **kwargs):
+        seen["json_mode"] = json_mode
+        return FakeChain()
+
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("cerebras", "primary-model")])
+    monkeypatch.setattr(llm_service, "_get_chain", fake_get_chain)
+
+    plan = asyncio.run(llm_service.compose_scene_plan("Explain circles", "Medium (15s)"))
+
+    assert plan["title"] == "Demo"
+    assert seen["json_mode"] is True
+
+
+def test_warm_up_llm_connection_hits_first_provider(monkeypatch):
+    requested = []
+
+    class FakeAsyncClient:
+        async def get(self, url, headers=None, timeout=None):
+            requested.append(url)
+
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("cerebras", "primary-model")])
+    monkeypatch.setattr(llm_service, "CEREBRAS_BASE_URL", "https://cerebras.example/v1")
+    monkeypatch.setattr(llm_service, "_get_http_clients", lambda: (None, FakeAsyncClient()))
+
+    assert asyncio.run(llm_service.warm_up_llm_connection()) is True
+    assert requested == ["https://cerebras.example/v1/models"]
+
+
+def test_code_generation_passes_length_sized_output_limits(monkeypatch):
+    seen = {}
+
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
+        seen.update(kwargs)
+        return VALID_MEDIUM_CODE
+
+    monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
+
+    asyncio.run(llm_service.generate_code_from_plan("Explain circles", "Long (1m)", VALID_SCENE_PLAN))
+
+    assert seen["max_tokens"] == llm_service.CODE_MAX_OUTPUT_TOKENS["Long (1m)"]
+    assert "\nif __name__" in seen["stop"]
+
+
+def test_invoke_with_resilience_fails_fast_without_providers(monkeypatch):
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [])
+
+    with pytest.raises(RuntimeError, match="no LLM provider is configured"):
+        asyncio.run(llm_service._invoke_with_resilience(object(), {}, operation="test"))
+
+
+def test_static_prompt_keeps_system_braces_literal():
+    prompt = llm_service._static_prompt("Use MathTex(r'\\frac{a}{b}') and {{ }}", "Topic: {prompt}")
+
+    system_message, human_message = prompt.invoke({"prompt": "fractions"})
+
+    assert system_message.content == "Use MathTex(r'\\frac{a}{b}') and {{ }}"
+    assert human_message.content == "Topic: fractions"
+
+
+def test_codegen_prompt_keeps_per_request_fields_after_shared_prefix():
+    def render(prompt_text: str):
+        payload = {
+            "prompt": prompt_text,
+            "length_name": "Medium (15s)",
+            "length_profile_json": llm_service._length_profile_json("Medium (15s)"),
+            "scene_plan_json": "{}",
+            "section_scope": "Full video.",
+            "style_pack_json": "{}",
+            "memory_context": "none",
+            "voiceover_script_json": "{}",
+            "voiceover_enabled": False,
+            "candidate_index": 1,
+            "candidate_total": 1,
+        }
+        return llm_service._GENERATE_CODE_PROMPT.invoke(payload)
+
+    first_system, first_human = render("Explain circles")
+    second_system, second_human = render("Explain squares")
+
+    # Provider prefix caches reuse the system message plus the per-length/style
+    # header; the user's prompt must come after it.
+    assert first_system is second_system
+    shared = first_human.content.split("User prompt:")[0]
+    assert second_human.content.startswith(shared)
+    assert "Explain" not in shared
+
+
+def test_stitch_section_code_merges_construct_bodies():
+    first = "from manim import *\n\nclass GenScene(Scene):\n    def construct(self):\n        a = Circle()\n        self.play(Create(a))\n"
+    second = "from manim import *\nimport numpy as np\n\nclass GenScene(Scene):\n    def construct(self):\n        b = Square()\n        self.play(Create(b))\n"
+
+    stitched = llm_service.stitch_section_code([first, second])
+
+    assert stitched.count("from manim import *") == 1
+    assert "import numpy as np" in stitched
+    assert stitched.count("class GenScene(Scene):") == 1
+    assert stitched.index("Circle()") < stitched.index("FadeOut") < stitched.index("Square()")
+    compile(stitched, "<stitched>", "exec")
+
+
+def test_stitch_section_code_rejects_fragments_with_helpers():
+    helper = "from manim import *\n\ndef helper():\n    return 1\n\nclass GenScene(Scene):\n    def construct(self):\n        self.wait(1)\n"
+
+    assert llm_service.stitch_section_code([helper, helper]) is None
+
+
+def test_generate_code_from_plan_generates_sections_in_parallel(monkeypatch):
+    import json
+
+    state = {"active": 0, "peak": 0, "scopes": []}
+
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
+        state["scopes"].append(payload["section_scope"])
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        scene_name = json.loads(payload["scene_plan_json"])["scenes"][0]["name"]
+        return (
+            "from manim import *\n\nclass GenScene(Scene):\n    def construct(self):\n"
+            f"        self.add(Text({scene_name!r}))\n        self.wait(1)\n"
+        )
+
+    plan = dict(VALID_SCENE_PLAN)
+    plan["scenes"] = [dict(VALID_SCENE_PLAN["scenes"][0], name=f"Scene {i}") for i in range(1, 4)]
+    monkeypatch.setattr(llm_service, "MANIM_PARALLEL_SECTIONS_ENABLED", True)
+    monkeypatch.setattr(llm_service, "MANIM_PARALLEL_SECTIONS_MIN_SCENES", 3)
+    monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
+
+    code = asyncio.run(llm_service.generate_code_from_plan("Explain circles", "Extended (5m)", plan))
+
+    assert state["peak"] == 3
+    assert all(scope.startswith("Section") for scope in state["scopes"])
+    assert code.index("Scene 1") < code.index("Scene 2") < code.index("Scene 3")
+
+
+def test_generate_code_from_plan_falls_back_when_a_section_fails(monkeypatch):
+    import json
+
+    state = {"scopes": [], "cancelled": 0}
+
+    async def fake_invoke(prompt_template, payload, operation, **kwargs):
+        scope = payload["section_scope"]
+        state["scopes"].append(scope)
+        if scope.startswith("Full video"):
+            return "from manim import *\n\nclass GenScene(Scene):\n    def construct(self):\n        self.wait(1)\n"
+        scene_name = json.loads(payload["scene_plan_json"])["scenes"][0]["name"]
+        if scene_name == "Scene 2":
+            raise TimeoutError("all providers timed out")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return "unreachable"
+
+    plan = dict(VALID_SCENE_PLAN)
+    plan["scenes"] = [dict(VALID_SCENE_PLAN["scenes"][0], name=f"Scene {i}") for i in range(1, 4)]
+    monkeypatch.setattr(llm_service, "MANIM_PARALLEL_SECTIONS_ENABLED", True)
+    monkeypatch.setattr(llm_service, "MANIM_PARALLEL_SECTIONS_MIN_SCENES", 3)
+    monkeypatch.setattr(llm_service, "_invoke_with_resilience", fake_invoke)
+
+    code = asyncio.run(llm_service.generate_code_from_plan("Explain circles", "Extended (5m)", plan))
+
+    assert "self.wait(1)" in code
+    assert state["cancelled"] == 2
+    assert state["scopes"][-1].startswith("Full video")
+
+
+def test_redis_llm_cache_round_trips_response_text():
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration
+
+    from backend.llm_cache import RedisLLMCache
+
+    class FakeRedis:
+        def __init__(self):
+            self.store = {}
+
+        def get(self, key):
+            return self.store.get(key)
+
+        def set(self, key, value, ex=None):
+            self.store[key] = value
+
+    fake = FakeRedis()
+    cache = RedisLLMCache(lambda: fake, ttl_seconds=60)
+
+    assert cache.lookup("prompt", "model-a") is None
+    cache.update("prompt", "model-a", [ChatGeneration(message=AIMessage(content="cached code"))])
+
+    hit = cache.lookup("prompt", "model-a")
+    assert hit is not None and hit[0].text == "cached code"
+    assert cache.lookup("prompt", "model-b") is None
+
+
+def test_fast_tier_routes_listed_lengths_to_fast_model_first(monkeypatch):
+    monkeypatch.setattr(llm_service, "groq_api_key", "test-groq-key")
+    monkeypatch.setattr(llm_service, "LLM_FAST_MODEL", "fast-model")
+    monkeypatch.setattr(llm_service, "LLM_FAST_TIER_LENGTHS", frozenset({"Medium (15s)"}))
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("groq", "quality-model")])
+
+    assert llm_service._models_for_length("Medium (15s)") == [("groq", "fast-model"), ("groq", "quality-model")]
+    assert llm_service._models_for_length("Long (1m)") is None
+
+
+def test_length_profiles_mapping_is_frozen_and_defaults_unknown_lengths():
+    with pytest.raises(TypeError):
+        llm_service._LENGTH_PROFILES["Medium"] = {}
+
+    assert llm_service.get_length_profile("no-such-length") is llm_service._DEFAULT_LENGTH_PROFILE
+    assert llm_service.get_length_profile("Medium") is llm_service.get_length_profile("Medium")
+
+
+def test_invoke_with_resilience_caps_in_flight_provider_calls(monkeypatch):
+    state = {"active": 0, "peak": 0}
+
+    class FakeChain:
+        async def ainvoke(self, payload):
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            return "ok"
+
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("groq", "primary-model")])
+    monkeypatch.setattr(llm_service, "LLM_MAX_INFLIGHT_REQUESTS", 2)
+    monkeypatch.setattr(llm_service, "_get_chain", lambda *args, **kwargs: FakeChain())
+
+    async def _run():
+        return await asyncio.gather(
+            *(llm_service._invoke_with_resilience(object(), {}, operation="test") for _ in range(6))
+        )
+
+    assert asyncio.run(_run()) == ["ok"] * 6
+    assert state["peak"] == 2
+
+
+def test_length_profile_json_sends_only_the_selected_compact_profile():
+    rendered = llm_service._length_profile_json("Long (1m)")
+
+    assert json.loads(rendered) == {
+        key: value
+        for key, value in llm_service.PROMPT_ASSETS["length_profiles"]["profiles"]["Long (1m)"].items()
+    }
+    assert "\n" not in rendered and '": ' not in rendered
+    assert "Medium" not in rendered and "length_name" not in rendered
+
+
+def test_prebuild_generation_chains_populates_the_chain_cache(monkeypatch):
+    monkeypatch.setattr(llm_service, "MODEL_CANDIDATES", [("groq", "groq-model")])
+    monkeypatch.setattr(llm_service, "groq_api_key", "test-groq-key")
+    monkeypatch.setattr(llm_service, "_CHAIN_CACHE", {})
+    llm_service._get_llm_client.cache_clear()
+    try:
+        assert llm_service.prebuild_generation_chains() == len(llm_service._LENGTH_PROFILES)
+        prebuilt = dict(llm_service._CHAIN_CACHE)
+        chain = llm_service._get_chain(
+            llm_service._GENERATE_CODE_PROMPT,
+            "groq",
+            "groq-model",
+            **llm_service._code_output_limits("Long (1m)"),
+        )
+
+        assert any(entry[2] is chain for entry in prebuilt.values())
+        assert len(llm_service._CHAIN_CACHE) == len(prebuilt)
+    finally:
+        asyncio.run(llm_service.close_http_clients())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_streaming_code_cleaner_matches_sanitized_code(chunk_size):
+    raw = (
+        "<think>draft: from manim import *\n</think>Here you go:\n```python\n"
+        + VALID_MEDIUM_CODE
+        + "\n```\nLet me know if you need changes."
+    )
+    cleaner = llm_service.StreamingCodeCleaner()
+
+    emitted = "".join(cleaner.feed(raw[i:i + chunk_size]) for i in range(0, len(raw), chunk_size))
+    emitted += cleaner.flush()
+
+    assert emitted == cleaner.text
+    assert emitted.strip() == VALID_MEDIUM_CODE.strip()
+
+
+def test_invoke_with_resilience_times_out_stalled_call_and_falls_back(monkeypatch):
+    class StalledChain:
+        async def ainvoke(self, payload):
+            await asyncio.sleep(10)
+
+    class FastChain:
+        async def ainvoke(self, payload):
+            return "fallback"
+
+    chains = {"stalled-model": StalledChain(), "fallback-model": FastChain()}
+    monkeypatch.setattr(
+        llm_service,
+        "MODEL_CANDIDATES",
+        [("groq", "stalled-model"), ("groq", "fallback-model")],
+    )
+    monkeypatch.setattr(llm_service, "LLM_RETRY_ATTEMPTS", 1)
+    monkeypatch.setattr(llm_service, "LLM_CALL_TIMEOUT_SECONDS", 0.01)
+    monkeypatch.setattr(
+        llm_service, "_get_chain", lambda prompt, provider, model_name, **kwargs: chains[model_name]
+    )
+
+    result = asyncio.run(llm_service._invoke_with_resilience(object(), {}, operation="test"))
+
+    assert result == "fallback"
@@ -1,4 +1,11 @@
-from backend.main import should_emit_progress
+import asyncio
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from backend import main
+from backend.main import AnimationRequest, should_emit_progress
 
 
 def test_should_emit_progress_first_event():
@@ -26,3 +33,251 @@ def test_should_emit_progress_when_message_changes_same_step():
     assert emit is True
     assert signature == (4, "repairing", "Repair attempt 1")
 
+
+
+def test_animation_request_normalizes_length_to_canonical_value():
+    request = AnimationRequest(prompt="Explain circles", length="Long (1m)")
+    assert request.length == "Long (1m)"
+    assert type(request.length) is str
+
+    with pytest.raises(ValidationError):
+        AnimationRequest(prompt="Explain circles", length="Forever (1h)")
+
+
+class _FakePubSub:
+    def __init__(self, payloads):
+        self.payloads = list(payloads)
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=0.0):
+        if self.payloads:
+            return {"type": "message", "data": json.dumps(self.payloads.pop(0))}
+        await asyncio.sleep(0)
+        return None
+
+
+class _FakeAsyncRedis:
+    def __init__(self, latest=None):
+        self.latest = latest
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return json.dumps(self.latest) if self.latest else None
+
+
+class _FakeJob:
+    def __init__(self, failed=False):
+        self.is_failed = failed
+        self.exc_info = "worker crashed" if failed else None
+        self.refreshes = 0
+
+    def refresh(self):
+        self.refreshes += 1
+
+
+def _collect(redis_conn, pubsub, job, timeout_seconds=5.0):
+    async def run():
+        return [
+            progress
+            async for progress in main.iter_job_progress(
+                redis_conn, pubsub, job, "job-1", timeout_seconds=timeout_seconds
+            )
+            if progress is not None
+        ]
+
+    return asyncio.run(run())
+
+
+def test_iter_job_progress_streams_published_updates_until_complete():
+    pubsub = _FakePubSub(
+        [
+            {"step": 1, "status": "analyzing", "message": "A"},
+            {"step": 1, "status": "analyzing", "message": "A"},
+            {"step": 6, "status": "complete", "message": "Done"},
+            {"step": 1, "status": "analyzing", "message": "never read"},
+        ]
+    )
+    redis_conn = _FakeAsyncRedis()
+    job = _FakeJob()
+
+    events = _collect(redis_conn, pubsub, job)
+
+    assert [event["status"] for event in events] == ["analyzing", "complete"]
+    assert redis_conn.gets == 0 and job.refreshes == 0
+
+
+def test_iter_job_progress_reports_failed_job_on_idle_tick(monkeypatch):
+    monkeypatch.setattr(main, "PROGRESS_IDLE_CHECK_SECONDS", 0.0)
+
+    events = _collect(_FakeAsyncRedis(), _FakePubSub([]), _FakeJob(failed=True))
+
+    assert events == [{"step": -1, "status": "error", "message": "worker crashed"}]
+
+
+def test_iter_job_progress_recovers_missed_update_from_progress_key(monkeypatch):
+    monkeypatch.setattr(main, "PROGRESS_IDLE_CHECK_SECONDS", 0.0)
+    redis_conn = _FakeAsyncRedis(latest={"step": 6, "status": "complete", "message": "Done"})
+
+    events = _collect(redis_conn, _FakePubSub([]), _FakeJob())
+
+    assert events == [{"step": 6, "status": "complete", "message": "Done"}]
+
+
+class _ExpiredJob(_FakeJob):
+    def refresh(self):
+        raise main.NoSuchJobError("gone")
+
+
+def test_iter_job_progress_stops_when_job_record_expired(monkeypatch):
+    monkeypatch.setattr(main, "PROGRESS_IDLE_CHECK_SECONDS", 0.0)
+
+    events = _collect(_FakeAsyncRedis(), _FakePubSub([]), _ExpiredJob())
+
+    assert events == [{"step": -1, "status": "error", "message": main.JOB_EXPIRED_MESSAGE}]
+
+
+def test_iter_job_progress_yields_keepalive_ticks_then_times_out(monkeypatch):
+    monkeypatch.setattr(main, "PROGRESS_IDLE_CHECK_SECONDS", 0.0)
+
+    async def run():
+        return [
+            progress
+            async for progress in main.iter_job_progress(
+                _FakeAsyncRedis(), _FakePubSub([]), _FakeJob(), "job-1", timeout_seconds=0.05
+            )
+        ]
+
+    events = asyncio.run(run())
+
+    assert events[0] is None
+    assert events[-1]["message"] == "Job timed out. Please try again."
+
+
+def test_sse_frame_encodes_one_data_event():
+    assert main.sse_frame({"step": 1, "message": "Vidéo prête"}) == (
+        'data: {"step":1,"message":"Vidéo prête"}\n\n'.encode("utf-8")
+    )
+
+
+class _FakeDedupeRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def delete(self, key):
+        self.store.pop(key, None)
+
+
+class _FakeSubscriber:
+    def __init__(self):
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+
+class _FakeQueue:
+    connection = object()
+
+    def __init__(self):
+        self.enqueued = []
+
+    def enqueue(self, func, args, job_id, **kwargs):
+        self.enqueued.append(job_id)
+        return _FakeJob()
+
+
+def test_enqueue_generation_job_joins_duplicate_submission(monkeypatch):
+    queue = _FakeQueue()
+    monkeypatch.setattr(main, "get_shared_queue", lambda name="default": queue)
+    monkeypatch.setattr(main.Job, "fetch", staticmethod(lambda job_id, connection: _FakeJob()))
+    redis_conn = _FakeDedupeRedis()
+    request = AnimationRequest(prompt="Explain circles")
+
+    async def submit():
+        pubsub = _FakeSubscriber()
+        _, job_id, joined = await main.enqueue_generation_job(redis_conn, pubsub, request, "user_1")
+        return job_id, joined, pubsub.channels
+
+    first_id, first_joined, _ = asyncio.run(submit())
+    second_id, second_joined, channels = asyncio.run(submit())
+
+    assert (first_joined, second_joined) == (False, True)
+    assert second_id == first_id
+    assert channels == [main.get_progress_channel(first_id)]
+    assert queue.enqueued == [first_id]
+
+
+def test_submission_fingerprint_depends_on_render_settings():
+    base = AnimationRequest(prompt="Explain circles")
+    other = AnimationRequest(prompt="Explain circles", resolution="1080p")
+    assert main.submission_fingerprint(base) == main.submission_fingerprint(AnimationRequest(prompt="Explain circles"))
+    assert main.submission_fingerprint(base) != main.submission_fingerprint(other)
+
+
+def test_chat_response_line_is_one_ndjson_record():
+    from datetime import datetime
+
+    chat = {"_id": "abc", "prompt": "Explain circles", "created_at": datetime(2024, 1, 2)}
+    line = main._chat_response_line(chat, "https://cdn/v.mp4")
+
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert json.loads(line) == {
+        "id": "abc",
+        "prompt": "Explain circles",
+        "length": "Medium (15s)",
+        "video_url": "https://cdn/v.mp4",
+        "code": "",
+        "created_at": "2024-01-02T00:00:00",
+    }
+
+
+class _FakeStatusRedis:
+    def __init__(self, values):
+        self.values = values
+
+    async def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+
+class _FakeStatusJob:
+    def __init__(self, status):
+        self.status = status
+
+    def get_status(self):
+        return self.status
+
+
+def _job_status(monkeypatch, job_status):
+    values = {main.get_owner_key("job-1"): "user_1"}
+    monkeypatch.setattr(main, "get_shared_async_redis", lambda: _FakeStatusRedis(values))
+    monkeypatch.setattr(main, "resolve_authenticated_clerk_id", lambda request, clerk_id: "user_1")
+    monkeypatch.setattr(main, "get_shared_queue", lambda name="default": _FakeQueue())
+
+    def fake_fetch(job_id, connection):
+        if job_status is None:
+            raise main.NoSuchJobError(job_id)
+        return _FakeStatusJob(job_status)
+
+    monkeypatch.setattr(main.Job, "fetch", staticmethod(fake_fetch))
+    return asyncio.run(main.get_job_status("job-1", request=None))
+
+
+def test_job_status_reports_queued_job_as_pending(monkeypatch):
+    assert _job_status(monkeypatch, main.JobStatus.QUEUED)["status"] == "pending"
+
+
+@pytest.mark.parametrize("job_status", [None, main.JobStatus.FINISHED])
+def test_job_status_reports_expired_result_as_gone(monkeypatch, job_status):
+    with pytest.raises(main.HTTPException) as excinfo:
+        _job_status(monkeypatch, job_status)
+
+    assert excinfo.value.status_code == 410
@@ -0,0 +1,332 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from pymongo import ReturnDocument
+
+from backend import user_service
+
+
+NOW = datetime(2024, 5, 20, 12, 0)
+NEXT_RESET = datetime(2024, 6, 1)
+
+# Semantic fake, not MongoDB: a tiny evaluator for exactly the aggregation
+# operators the user_service update pipelines use. It encodes our reading of
+# Mongo's rules (a missing field sorts before null, which sorts before numbers
+# and dates); the subtle cases are also pinned by pipeline-shape assertions
+# below and by the integration tests at the end, which run when
+# MONGODB_TEST_URI points at a real server.
+MISSING = object()
+
+
+def _rank(value):
+    if value is MISSING:
+        return 0
+    if value is None:
+        return 1
+    return 3 if isinstance(value, datetime) else 2
+
+
+def _compare(a, b):
+    ra, rb = _rank(a), _rank(b)
+    if ra != rb or ra < 2:
+        return (ra > rb) - (ra < rb)
+    return (a > b) - (a < b)
+
+
+def _bson_type(value):
+    if value is MISSING:
+        return "missing"
+    if value is None:
+        return "null"
+    return "date" if isinstance(value, datetime) else "other"
+
+
+def _truthy(value):
+    return value not in (MISSING, None, False, 0)
+
+
+_OPERATORS = {
+    "$ifNull": lambda a, b: a if a not in (MISSING, None) else b,
+    "$cond": lambda test, then, other: then if _truthy(test) else other,
+    "$and": lambda *values: all(_truthy(value) for value in values),
+    "$or": lambda *values: any(_truthy(value) for value in values),
+    "$eq": lambda a, b: _compare(a, b) == 0,
+    "$gt": lambda a, b: _compare(a, b) > 0,
+    "$gte": lambda a, b: _compare(a, b) >= 0,
+    "$lte": lambda a, b: _compare(a, b) <= 0,
+    "$add": lambda a, b: a + b,
+    "$subtract": lambda a, b: a - b,
+}
+
+
+def _eval(expr, doc):
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:], MISSING)
+    if not (isinstance(expr, dict) and len(expr) == 1 and next(iter(expr)).startswith("$")):
+        return expr
+
+    op, args = next(iter(expr.items()))
+    if op == "$type":
+        return _bson_type(_eval(args, doc))
+    return _OPERATORS[op](*(_eval(arg, doc) for arg in args))
+
+
+class FakeUsers:
+    def __init__(self, *docs):
+        self.docs = [dict(doc) for doc in docs]
+        self.pipelines = []
+
+    def _match(self, query):
+        return next((doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items())), None)
+
+    async def find_one(self, query, projection=None):
+        doc = self._match(query)
+        return dict(doc) if doc is not None else None
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def find_one_and_update(
+        self, query, pipeline, projection=None, upsert=False, return_document=ReturnDocument.BEFORE
+    ):
+        self.pipelines.append(pipeline)
+        doc = self._match(query)
+        before = dict(doc) if doc is not None else None
+        if doc is None:
+            if not upsert:
+                return None
+            doc = dict(query)
+            self.docs.append(doc)
+        for stage in pipeline:
+            ((op, fields),) = stage.items()
+            assert op == "$set"
+            # Every expression in a stage sees the stage's input document.
+            updates = {field: _eval(value, doc) for field, value in fields.items()}
+            for field, value in updates.items():
+                if value is MISSING:
+                    doc.pop(field, None)
+                else:
+                    doc[field] = value
+        result = dict(doc) if return_document == ReturnDocument.AFTER else before
+        if result is not None and projection:
+            result = {key: result[key] for key in projection if key in result}
+        return result
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = FakeUsers()
+
+    async def fake_get_users_collection():
+        return collection
+
+    monkeypatch.setattr(user_service, "get_users_collection", fake_get_users_collection)
+    monkeypatch.setattr(user_service, "utc_now", lambda: NOW)
+    return collection
+
+
+def test_load_user_creates_free_user_with_first_reset_date(users):
+    user = asyncio.run(user_service.load_user_for_generation("u1"))
+
+    assert user == {
+        "clerk_id": "u1",
+        "tier": "free",
+        "basic_credits": 0,
+        "monthly_count": 0,
+        "month_reset_date": NEXT_RESET,
+        "created_at": NOW,
+        "updated_at": NOW,
+    }
+    assert len(users.docs) == 1
+
+
+def test_load_user_resets_monthly_count_when_due(users):
+    created = datetime(2024, 1, 3)
+    users.docs.append(
+        {
+            "clerk_id": "u1",
+            "tier": "pro",
+            "basic_credits": 2,
+            "monthly_count": 7,
+            "month_reset_date": datetime(2024, 5, 1),
+            "created_at": created,
+            "updated_at": created,
+        }
+    )
+
+    user = asyncio.run(user_service.load_user_for_generation("u1"))
+
+    assert user["monthly_count"] == 0
+    assert user["month_reset_date"] == NEXT_RESET
+    assert user["updated_at"] == NOW
+    assert (user["tier"], user["basic_credits"], user["created_at"]) == ("pro", 2, created)
+
+
+def test_load_user_leaves_count_alone_before_reset_date(users):
+    original = {
+        "clerk_id": "u1",
+        "tier": "free",
+        "basic_credits": 0,
+        "monthly_count": 3,
+        "month_reset_date": datetime(2024, 6, 1),
+        "created_at": datetime(2024, 1, 3),
+        "updated_at": datetime(2024, 5, 2),
+    }
+    users.docs.append(dict(original))
+
+    assert asyncio.run(user_service.load_user_for_generation("u1")) == original
+
+
+def test_load_user_without_reset_date_keeps_its_usage(users):
+    users.docs.append({"clerk_id": "u1", "monthly_count": 4, "created_at": datetime(2024, 1, 3)})
+
+    user = asyncio.run(user_service.load_user_for_generation("u1"))
+
+    assert user["monthly_count"] == 4
+    assert "month_reset_date" not in user
+    assert "updated_at" not in user
+
+
+def test_load_user_with_null_reset_date_keeps_its_usage(users):
+    users.docs.append(
+        {"clerk_id": "u1", "monthly_count": 4, "month_reset_date": None, "created_at": datetime(2024, 1, 3)}
+    )
+
+    user = asyncio.run(user_service.load_user_for_generation("u1"))
+
+    assert user["monthly_count"] == 4
+    assert user["month_reset_date"] is None
+
+
+def test_load_user_pipeline_checks_field_types_before_comparing(users):
+    asyncio.run(user_service.load_user_for_generation("u1"))
+
+    ((stage,),) = users.pipelines
+    fields = stage["$set"]
+    # Missing and null sort before every date, so "$lte now" alone would reset
+    # users without a reset date; the reset must first require a real date.
+    reset_due = fields["monthly_count"]["$cond"][0]
+    assert reset_due == {
+        "$and": [
+            {"$eq": [{"$type": "$month_reset_date"}, "date"]},
+            {"$lte": ["$month_reset_date", NOW]},
+        ]
+    }
+    # New users are the upserted ones, which have no created_at yet.
+    is_new = {"$eq": [{"$type": "$created_at"}, "missing"]}
+    assert fields["month_reset_date"]["$cond"][0] == {"$or": [reset_due, is_new]}
+    assert fields["updated_at"]["$cond"][0] == {"$or": [reset_due, is_new]}
+
+
+def test_increment_usage_creates_unknown_user_and_counts_monthly(users):
+    assert asyncio.run(user_service.increment_usage("u1")) is True
+
+    (doc,) = users.docs
+    assert (doc["monthly_count"], doc["basic_credits"]) == (1, 0)
+
+
+def test_increment_usage_deducts_resolution_cost_from_credits(users):
+    users.docs.append({"clerk_id": "u1", "tier": "free", "basic_credits": 5, "monthly_count": 2})
+
+    assert asyncio.run(user_service.increment_usage("u1", resolution="4k")) is True
+
+    assert (users.docs[0]["basic_credits"], users.docs[0]["monthly_count"]) == (2.5, 2)
+
+
+def test_increment_usage_pro_credits_cost_one_at_any_resolution(users):
+    users.docs.append({"clerk_id": "u1", "tier": "pro", "basic_credits": 2, "monthly_count": 0})
+
+    assert asyncio.run(user_service.increment_usage("u1", resolution="4k")) is True
+
+    assert users.docs[0]["basic_credits"] == 1
+
+
+def test_increment_usage_refuses_when_credits_do_not_cover_cost(users):
+    users.docs.append({"clerk_id": "u1", "tier": "free", "basic_credits": 2, "monthly_count": 1})
+
+    assert asyncio.run(user_service.increment_usage("u1", resolution="4k")) is False
+
+    assert (users.docs[0]["basic_credits"], users.docs[0]["monthly_count"]) == (2, 1)
+
+
+def test_increment_usage_treats_missing_counters_as_zero(users):
+    users.docs.append({"clerk_id": "u1"})
+
+    assert asyncio.run(user_service.increment_usage("u1")) is True
+
+    assert (users.docs[0]["basic_credits"], users.docs[0]["monthly_count"]) == (0, 1)
+
+
+# Integration tests against a real server (the same pipelines, real semantics).
+MONGODB_TEST_URI = os.getenv("MONGODB_TEST_URI")
+requires_mongo = pytest.mark.skipif(not MONGODB_TEST_URI, reason="set MONGODB_TEST_URI to run against MongoDB")
+
+
+def _run_with_mongo(monkeypatch, scenario):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def run():
+        client = AsyncIOMotorClient(MONGODB_TEST_URI, tz_aware=False)
+        collection = client.get_default_database("prompt_to_animate_test")[f"users_{uuid.uuid4().hex}"]
+
+        async def real_get_users_collection():
+            return collection
+
+        monkeypatch.setattr(user_service, "get_users_collection", real_get_users_collection)
+        try:
+            await scenario(collection)
+        finally:
+            await collection.drop()
+            client.close()
+
+    monkeypatch.setattr(user_service, "utc_now", lambda: NOW)
+    asyncio.run(run())
+
+
+@requires_mongo
+@pytest.mark.parametrize("reset_date", [MISSING, None])
+def test_mongo_load_user_without_a_reset_date_keeps_its_usage(monkeypatch, reset_date):
+    async def scenario(collection):
+        doc = {"clerk_id": "u1", "monthly_count": 4, "created_at": datetime(2024, 1, 3)}
+        if reset_date is not MISSING:
+            doc["month_reset_date"] = reset_date
+        await collection.insert_one(doc)
+
+        user = await user_service.load_user_for_generation("u1")
+
+        assert user["monthly_count"] == 4
+        assert user.get("month_reset_date", MISSING) == reset_date
+
+    _run_with_mongo(monkeypatch, scenario)
+
+
+@requires_mongo
+def test_mongo_load_user_creates_and_resets(monkeypatch):
+    async def scenario(collection):
+        created = await user_service.load_user_for_generation("new")
+        assert (created["monthly_count"], created["month_reset_date"], created["created_at"]) == (0, NEXT_RESET, NOW)
+
+        await collection.insert_one(
+            {"clerk_id": "due", "monthly_count": 7, "month_reset_date": datetime(2024, 5, 1), "created_at": NOW}
+        )
+        reset = await user_service.load_user_for_generation("due")
+        assert (reset["monthly_count"], reset["month_reset_date"]) == (0, NEXT_RESET)
+
+    _run_with_mongo(monkeypatch, scenario)
+
+
+@requires_mongo
+def test_mongo_increment_usage_guards_credit_cost(monkeypatch):
+    async def scenario(collection):
+        await collection.insert_one({"clerk_id": "u1", "tier": "free", "basic_credits": 2, "monthly_count": 1})
+
+        assert await user_service.increment_usage("u1", resolution="4k") is False
+        assert await user_service.increment_usage("u1") is True
+
+        doc = await collection.find_one({"clerk_id": "u1"})
+        assert (doc["basic_credits"], doc["monthly_count"]) == (1, 1)
+
+    _run_with_mongo(monkeypatch, scenario)
@@ -7,9 +7,15 @@ Tiers:
 - Pro: 50 videos/month at any resolution, 1 credit each ($20/month)
 """
 
-from datetime import datetime, timedelta
+import logging
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from .database import get_database
+from .models import VideoLength
+
+logger = logging.getLogger(__name__)
 
 
 # Resolution credit costs for Basic tier
@@ -43,12 +49,12 @@ TIERS = {
 }
 
 # Length ordering used for server-side entitlement checks
-LENGTH_ORDER = [
-    "Medium (15s)",
-    "Long (1m)",
-    "Deep Dive (2m)",
-    "Extended (5m)",
-]
+LENGTH_ORDER = [item.value for item in VideoLength]
+
+
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime, matching what Mongo returns (tz_aware=False)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 
 async def get_users_collection():
@@ -67,7 +73,7 @@ async def get_or_create_user(clerk_id: str) -> Dict[str, Any]:
     
     if user is None:
         # Create new free user
-        now = datetime.utcnow()
+        now = utc_now()
         user = {
             "clerk_id": clerk_id,
             "tier": "free",
@@ -78,7 +84,7 @@ async def get_or_create_user(clerk_id: str) -> Dict[str, Any]:
             "updated_at": now
         }
         await users.insert_one(user)
-        print(f"✅ Created new user: {clerk_id}")
+        logger.info("✅ Created new user: %s", clerk_id)
     
     return user
 
@@ -95,32 +101,6 @@ def get_subscription_reset(from_date: datetime) -> datetime:
     return from_date + timedelta(days=30)
 
 
-async def check_and_reset_monthly(user: Dict[str, Any]) -> Dict[str, Any]:
-    """Reset monthly count if past reset date."""
-    now = datetime.utcnow()
-    reset_date = user.get("month_reset_date")
-    
-    if reset_date and now >= reset_date:
-        users = await get_users_collection()
-        new_reset = get_next_month_reset(now)
-        
-        await users.update_one(
-            {"clerk_id": user["clerk_id"]},
-            {
-                "$set": {
-                    "monthly_count": 0,
-                    "month_reset_date": new_reset,
-                    "updated_at": now
-                }
-            }
-        )
-        user["monthly_count"] = 0
-        user["month_reset_date"] = new_reset
-        print(f"🔄 Reset monthly count for user: {user['clerk_id']}")
-    
-    return user
-
-
 async def check_can_generate(clerk_id: str) -> Dict[str, Any]:
     """
     Check if user can generate a video.
@@ -144,6 +124,56 @@ def _is_length_allowed(requested_length: Optional[str], max_length: str) -> bool
     return _length_rank(requested_length) <= _length_rank(max_length)
 
 
+async def load_user_for_generation(clerk_id: str) -> Dict[str, Any]:
+    """
+    Fetch (or create) the user with the monthly reset applied.
+
+    One upserting pipeline update: a new user (inserted as just its clerk_id,
+    so without created_at) gets the free-tier defaults and a first reset date;
+    an existing user's monthly count is reset once their reset date has
+    passed. Users without a reset date are left without one. When nothing is
+    due the update is a no-op on the server.
+    """
+    users = await get_users_collection()
+    now = utc_now()
+    is_new = {"$eq": [{"$type": "$created_at"}, "missing"]}
+    # A missing/null date sorts before every date, so check the type first.
+    reset_due = {
+        "$and": [
+            {"$eq": [{"$type": "$month_reset_date"}, "date"]},
+            {"$lte": ["$month_reset_date", now]},
+        ]
+    }
+
+    try:
+        return await users.find_one_and_update(
+            {"clerk_id": clerk_id},
+            [
+                {
+                    "$set": {
+                        "tier": {"$ifNull": ["$tier", "free"]},
+                        "basic_credits": {"$ifNull": ["$basic_credits", 0]},
+                        "monthly_count": {"$cond": [reset_due, 0, {"$ifNull": ["$monthly_count", 0]}]},
+                        "month_reset_date": {
+                            "$cond": [
+                                {"$or": [reset_due, is_new]},
+                                get_next_month_reset(now),
+                                "$month_reset_date",
+                            ]
+                        },
+                        "created_at": {"$ifNull": ["$created_at", now]},
+                        "updated_at": {"$cond": [{"$or": [reset_due, is_new]}, now, "$updated_at"]},
+                    }
+                }
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # A concurrent request created the user first; its document is there now.
+        return await load_user_for_generation(clerk_id)
+
+
 async def check_can_generate_with_constraints(
     clerk_id: str,
     resolution: str = "720p",
@@ -158,9 +188,16 @@ async def check_can_generate_with_constraints(
     - allowed resolution by entitlement
     - max length by entitlement
     """
-    user = await get_or_create_user(clerk_id)
-    user = await check_and_reset_monthly(user)
+    user = await load_user_for_generation(clerk_id)
+    return evaluate_generation_entitlements(user, resolution=resolution, length=length)
 
+
+def evaluate_generation_entitlements(
+    user: Dict[str, Any],
+    resolution: str = "720p",
+    length: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Entitlement decision for an already-loaded user document (no I/O)."""
     tier = user.get("tier", "free")
     monthly_count = int(user.get("monthly_count", 0))
     basic_credits = float(user.get("basic_credits", 0))
@@ -270,53 +307,64 @@ async def increment_usage(clerk_id: str, resolution: str = "720p") -> bool:
     - Free tier: Always 1 from monthly count
     
     Uses basic credits first if available, otherwise monthly count.
+    The choice is made server-side in a single atomic update, so there is
+    no read-modify-write window and only one round trip.
     """
-    user = await get_or_create_user(clerk_id)
     users = await get_users_collection()
-    now = datetime.utcnow()
-    
-    tier = user.get("tier", "free")
-    basic_credits = user.get("basic_credits", 0)
-    
-    # Determine credit cost based on tier and resolution
-    if tier == "pro":
-        # Pro tier: All resolutions cost 1 credit
-        credit_cost = 1.0
-    else:
-        # Basic/Free tier: Use resolution cost table
-        credit_cost = RESOLUTION_COSTS.get(resolution, 1.0)
-    
-    # If user has basic credits, use those first (Basic tier with purchased credits)
-    if basic_credits > 0:
-        # Deduct based on resolution cost
-        new_credits = basic_credits - credit_cost
-        
-        # Ensure we don't go negative
-        if new_credits < 0:
-            print(f"⚠️ Not enough Basic credits for {resolution}. Has {basic_credits}, needs {credit_cost}")
-            return False
-        
-        await users.update_one(
-            {"clerk_id": clerk_id},
+    now = utc_now()
+    resolution_cost = RESOLUTION_COSTS.get(resolution, 1.0)
+
+    credits = {"$ifNull": ["$basic_credits", 0]}
+    # Pro tier: All resolutions cost 1 credit; Basic/Free: resolution cost table
+    credit_cost = {"$cond": [{"$eq": ["$tier", "pro"]}, 1.0, resolution_cost]}
+    uses_credits = {"$gt": [credits, 0]}
+    can_pay = {"$gte": [credits, credit_cost]}
+
+    before = await users.find_one_and_update(
+        {"clerk_id": clerk_id},
+        [
             {
                 "$set": {
-                    "basic_credits": new_credits,
-                    "updated_at": now
+                    # Deduct purchased credits when the user has them (and enough)
+                    "basic_credits": {
+                        "$cond": [
+                            {"$and": [uses_credits, can_pay]},
+                            {"$subtract": [credits, credit_cost]},
+                            credits,
+                        ]
+                    },
+                    # Otherwise count against the monthly allowance (Pro and Free tiers)
+                    "monthly_count": {
+                        "$cond": [
+                            uses_credits,
+                            {"$ifNull": ["$monthly_count", 0]},
+                            {"$add": [{"$ifNull": ["$monthly_count", 0]}, 1]},
+                        ]
+                    },
+                    "updated_at": now,
                 }
             }
-        )
-        print(f"💳 Used {credit_cost} Basic credit(s) for {resolution}, {new_credits} remaining")
-        return True
-    
-    # Otherwise increment monthly count (Pro and Free tiers)
-    await users.update_one(
-        {"clerk_id": clerk_id},
-        {
-            "$inc": {"monthly_count": 1},
-            "$set": {"updated_at": now}
-        }
+        ],
+        projection={"tier": 1, "basic_credits": 1},
+        return_document=ReturnDocument.BEFORE,
     )
-    print(f"📊 Incremented monthly count for {clerk_id} ({tier} tier, {resolution})")
+
+    if before is None:
+        # First generation for a user the entitlement check never saw.
+        await get_or_create_user(clerk_id)
+        return await increment_usage(clerk_id, resolution=resolution)
+
+    tier = before.get("tier", "free")
+    basic_credits = before.get("basic_credits", 0) or 0
+    if basic_credits > 0:
+        cost = 1.0 if tier == "pro" else resolution_cost
+        if basic_credits < cost:
+            logger.warning("⚠️ Not enough Basic credits for %s. Has %s, needs %s", resolution, basic_credits, cost)
+            return False
+        logger.info("💳 Used %s Basic credit(s) for %s, %s remaining", cost, resolution, basic_credits - cost)
+        return True
+
+    logger.info("📊 Incremented monthly count for %s (%s tier, %s)", clerk_id, tier, resolution)
     return True
 
 
@@ -329,10 +377,10 @@ async def add_basic_credits(clerk_id: str, credits: int = 5) -> bool:
         {"clerk_id": clerk_id},
         {
             "$inc": {"basic_credits": credits},
-            "$set": {"updated_at": datetime.utcnow()}
+            "$set": {"updated_at": utc_now()}
         }
     )
-    print(f"💰 Added {credits} Basic credits to {clerk_id}")
+    logger.info("💰 Added %s Basic credits to %s", credits, clerk_id)
     return True
 
 
@@ -340,7 +388,7 @@ async def set_pro_subscription(clerk_id: str, active: bool = True) -> bool:
     """Set or remove Pro subscription status."""
     user = await get_or_create_user(clerk_id)
     users = await get_users_collection()
-    now = datetime.utcnow()
+    now = utc_now()
     
     if active:
         await users.update_one(
@@ -354,7 +402,7 @@ async def set_pro_subscription(clerk_id: str, active: bool = True) -> bool:
                 }
             }
         )
-        print(f"⭐ Activated Pro subscription for {clerk_id}")
+        logger.info("⭐ Activated Pro subscription for %s", clerk_id)
     else:
         await users.update_one(
             {"clerk_id": clerk_id},
@@ -365,15 +413,14 @@ async def set_pro_subscription(clerk_id: str, active: bool = True) -> bool:
                 }
             }
         )
-        print(f"📉 Downgraded {clerk_id} to Free tier")
+        logger.info("📉 Downgraded %s to Free tier", clerk_id)
     
     return True
 
 
 async def get_user_usage(clerk_id: str) -> Dict[str, Any]:
     """Get user's current usage and tier info."""
-    user = await get_or_create_user(clerk_id)
-    user = await check_and_reset_monthly(user)
+    user = await load_user_for_generation(clerk_id)
     
     tier = user.get("tier", "free")
     monthly_count = user.get("monthly_count", 0)
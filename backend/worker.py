@@ -13,18 +13,19 @@ For Azure Container Apps:
 
 import os
 import sys
+import asyncio
+import time
 import logging
+import importlib
 from pathlib import Path
 
 # Ensure the project root is in the path for imports
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from dotenv import load_dotenv
-load_dotenv()
-
 from rq import Worker, Queue, SimpleWorker
 from rq.job import Job
+from rq.worker_pool import WorkerPool
 from backend.redis_utils import get_raw_redis_connection
 
 # Configure logging
@@ -37,6 +38,76 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Modules imported once in the parent so forked job processes inherit them
+# (LangChain, prompt assets, provider clients, boto3) instead of paying the
+# import and construction cost on every job.
+PRELOAD_MODULES = (
+    "backend.tasks",
+    "backend.llm_service",
+    "backend.manim_service",
+    "backend.s3_service",
+    "backend.user_service",
+    "backend.scene_memory",
+)
+
+
+class VideoWorker(Worker):
+    """Worker with this app's defaults, so pooled workers get them too."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("default_result_ttl", 300)
+        # The description repeats the full prompt for every job; the job id is logged anyway.
+        kwargs.setdefault("log_job_description", False)
+        super().__init__(*args, **kwargs)
+
+
+def worker_concurrency() -> int:
+    """Jobs run in parallel per container (WORKER_CONCURRENCY, default 1)."""
+    try:
+        return max(1, int(os.getenv("WORKER_CONCURRENCY", "1")))
+    except ValueError:
+        return 1
+
+
+def preload_job_modules():
+    """Import job dependencies before forking; failures fall back to lazy import."""
+    if os.getenv("RQ_PRELOAD_MODULES", "true").strip().lower() in {"0", "false", "no", "off"}:
+        return
+
+    started = time.perf_counter()
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not preload {module_name}: {e}")
+
+    # Clients are only constructed here; no request is made, so forked jobs
+    # never share an open connection.
+    llm_service = sys.modules.get("backend.llm_service")
+    if llm_service is not None:
+        llm_service.prebuild_llm_clients()
+        llm_service.prebuild_generation_chains()
+    logger.info(f"📦 Preloaded job modules in {time.perf_counter() - started:.2f}s")
+
+
+def install_uvloop():
+    """
+    Make uvloop the event loop policy for job processes.
+
+    Set in the parent before any loop exists; each forked job's
+    tasks._run_async then creates a uvloop loop. uvloop ships with
+    uvicorn[standard]; without it the default asyncio loop is kept.
+    """
+    if os.getenv("WORKER_UVLOOP", "true").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    try:
+        import uvloop
+    except ImportError:
+        logger.info("uvloop not installed; jobs use the default asyncio loop")
+        return
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("⚡ Using uvloop for job event loops")
+
 
 def run_worker():
     """
@@ -59,18 +130,32 @@ def run_worker():
         logger.error(f"❌ Failed to connect to Redis: {e}")
         sys.exit(1)
     
+    install_uvloop()
+    preload_job_modules()
+
     # Create queues to listen to
     queues = [Queue('default', connection=redis_conn)]
-    
+
+    # Jobs mostly wait on the LLM, Mongo and S3 (Manim renders in a subprocess),
+    # so one container can run several at once. Pool workers are forked from
+    # this process and share the preloaded modules copy-on-write.
+    concurrency = worker_concurrency()
+    if concurrency > 1 and os.name != "nt":
+        logger.info(f"👷 Starting {concurrency} pooled workers on queue: default")
+        pool = WorkerPool(queues, connection=redis_conn, num_workers=concurrency, worker_class=VideoWorker)
+        pool.start()
+        return
+
     # RQ's default Worker uses os.fork(), which is unavailable on Windows.
-    worker_cls = SimpleWorker if os.name == "nt" else Worker
+    worker_cls = SimpleWorker if os.name == "nt" else VideoWorker
 
     # Create worker with configuration
     worker = worker_cls(
         queues,
         connection=redis_conn,
         name=f"worker-{os.getpid()}",
-        log_job_description=True
+        default_result_ttl=300,
+        log_job_description=False,
     )
     
     logger.info(
@@ -2,7 +2,15 @@ import { Webhooks } from "@dodopayments/nextjs";
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
-async function notifyBackend(eventType: string, clerkId: string, productId?: string) {
+// Stable across redeliveries of one event, distinct for later events on the
+// same subscription (e.g. re-activation after a cancel).
+function eventIdOf(payload: any, id: string): string {
+    return `${id}:${payload.timestamp ?? ""}`;
+}
+
+// Throws when the backend did not apply the event, so this route answers with
+// an error and Dodo Payments redelivers the webhook instead of dropping it.
+async function notifyBackend(eventType: string, clerkId: string, productId?: string, eventId?: string) {
     try {
         const response = await fetch(`${API_BASE_URL}/webhook/payment`, {
             method: 'POST',
@@ -10,14 +18,19 @@ async function notifyBackend(eventType: string, clerkId: string, productId?: str
             body: JSON.stringify({
                 event_type: eventType,
                 clerk_id: clerkId,
-                product_id: productId
+                product_id: productId,
+                event_id: eventId
             })
         });
         const data = await response.json();
         console.log("Backend webhook response:", data);
+        if (!response.ok) {
+            throw new Error(`Backend webhook failed with status ${response.status}`);
+        }
         return data;
     } catch (error) {
         console.error("Failed to notify backend:", error);
+        throw error;
     }
 }
 
@@ -32,21 +45,21 @@ export const POST = Webhooks({
         const clerkId = (payload.data as any).metadata?.clerk_id;
         const productId = (payload.data as any).product_id;
         if (clerkId) {
-            await notifyBackend("payment_succeeded", clerkId, productId);
+            await notifyBackend("payment_succeeded", clerkId, productId, eventIdOf(payload, payload.data.payment_id));
         }
     },
     onSubscriptionActive: async (payload) => {
         console.log("Subscription activated:", payload.data.subscription_id);
         const clerkId = (payload.data as any).metadata?.clerk_id;
         if (clerkId) {
-            await notifyBackend("subscription_active", clerkId);
+            await notifyBackend("subscription_active", clerkId, undefined, eventIdOf(payload, payload.data.subscription_id));
         }
     },
     onSubscriptionCancelled: async (payload) => {
         console.log("Subscription cancelled:", payload.data.subscription_id);
         const clerkId = (payload.data as any).metadata?.clerk_id;
         if (clerkId) {
-            await notifyBackend("subscription_cancelled", clerkId);
+            await notifyBackend("subscription_cancelled", clerkId, undefined, eventIdOf(payload, payload.data.subscription_id));
         }
     },
 });